@@ -1,6 +1,6 @@
 import tkinter as tk
 from tkinter import ttk
-from tkinter import simpledialog, filedialog, messagebox, Text, font
+from tkinter import simpledialog, filedialog, messagebox, colorchooser, Text, font
 import paramiko
 import threading
 import queue
@@ -13,6 +13,22 @@ import re  # For stripping ANSI escape sequences
 import select  # For better handling of channel readiness
 from PIL import ImageTk, Image  # For image handling; install pillow if needed: pip install pillow
 import shutil  # For copying files
+import mmap  # For the large-log viewer
+import bisect
+import stat
+import collections
+import copy
+import fnmatch
+import hashlib
+import itertools
+import session_worker
+import scheduler
+from session_worker import clean_output, open_shell, connect_transport, describe_phases, exec_command, SessionWorker, worker_main
+
+# Session worker processes of a frozen build re-run the executable with this flag
+if '--session-worker' in sys.argv:
+    worker_main()
+    sys.exit()
 
 # Define base directory for user data (writable without admin)
 if os.name == 'nt':  # Windows
@@ -20,35 +36,475 @@ if os.name == 'nt':  # Windows
 else:
     base_dir = os.path.expanduser('~/.commandforge')  # Fallback for non-Windows
 os.makedirs(base_dir, exist_ok=True)
+session_worker.known_hosts_path = os.path.join(base_dir, 'known_hosts')  # Host keys kept between runs
+
+# Maximum number of exec-channel commands running at once per session
+EXEC_MAX_IN_FLIGHT = 8
+
+# Default per-step timeout (seconds) for macro waits
+MACRO_STEP_TIMEOUT = 30
+
+LEADING_FLAGS = re.compile(r'(?:\(\?[aiLmsux]+\))+')  # (?i) etc. at the start of a pattern
+
+def scoped_flags(pattern):
+    # A leading (?i) applies to a whole regex, and is an error once the pattern is
+    # one alternative of a combined regex; (?i:...) keeps it to the pattern itself
+    match = LEADING_FLAGS.match(pattern)
+    if not match:
+        return pattern
+    flags = ''.join(dict.fromkeys(re.sub(r'[()?]', '', match.group())))
+    return f'(?{flags}:{pattern[match.end():]})'
+
+# Matches a step's expect and abort patterns against streaming shell output.
+# All patterns are compiled into one alternation so each chunk is scanned once,
+# over a rolling window that keeps matches that span chunk boundaries. Like the
+# highlight rules, patterns can't use numbered backreferences (the macro editor
+# refuses them), since the named groups around each pattern renumber the rest.
+class StreamMatcher:
+    WINDOW = 8192
+
+    def __init__(self, expect, abort=()):
+        parts = [f'(?P<e{i}>{scoped_flags(p)})' for i, p in enumerate(expect)]
+        parts += [f'(?P<a{i}>{scoped_flags(p)})' for i, p in enumerate(abort)]
+        self.patterns = {f'e{i}': p for i, p in enumerate(expect)}
+        self.patterns.update({f'a{i}': p for i, p in enumerate(abort)})
+        self.regex = re.compile('|'.join(parts), re.MULTILINE)
+        self.window = ''
+        self.event = threading.Event()
+        self.result = None  # (kind, pattern) with kind 'expect', 'abort', 'closed' or 'cancelled'
+
+    def feed(self, text):
+        # Called from the reader thread with each sanitized chunk
+        if self.event.is_set():
+            return
+        self.window = (self.window + text)[-self.WINDOW:]
+        match = self.regex.search(self.window)
+        if match:
+            kind = 'expect' if match.lastgroup.startswith('e') else 'abort'
+            self.finish(kind, self.patterns[match.lastgroup])
+
+    def finish(self, kind, pattern=None):
+        if not self.event.is_set():
+            self.result = (kind, pattern)
+            self.event.set()
+
+    def wait(self, timeout):
+        self.event.wait(timeout)
+        return self.result
+
+NUMBERED_REFERENCE = re.compile(r'(?<!\\)(?:\\\\)*\\[1-9]|\(\?\(\d')  # \1 or (?(1)...) in a rule
+
+def literal_trie(words):
+    # Build a prefix-tree regex from literal strings, e.g. db-(?:01|02), which re
+    # scans far faster than a flat alternation of the same words
+    tree = {}
+    for word in words:
+        node = tree
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        alts = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not alts:
+            return ''
+        if '' in node:
+            return '(?:' + '|'.join(alts) + ')?'
+        return alts[0] if len(alts) == 1 else '(?:' + '|'.join(alts) + ')'
+    return build(tree)
+
+# User highlight and alert rules compiled into one combined regex, with literal
+# rules folded into prefix tries. The tries carry no groups (they defeat re's
+# literal-prefix scan), so literal matches are looked up afterwards; each regex
+# rule is its own named group (hl<index>), since a lookaround or \b can match in
+# the stream but not on the bare span. Rules with numbered backreferences are
+# skipped: the combined regex renumbers groups, so \1 would point elsewhere.
+# Rules look like {"pattern": "ERROR", "regex": false, "ignore_case": false,
+#                  "fg": "red", "bg": "", "bold": true, "notify": false}
+class HighlightRules:
+    def __init__(self, rules):
+        self.rules = rules
+        self.literals = {}  # {text: rule index} for case-sensitive literal rules
+        self.folded = {}  # {lowercased text: rule index} for case-insensitive literal rules
+        self.patterns = []  # [(rule index, compiled regex)] for regex rules
+        parts = []
+        for i, rule in enumerate(rules):
+            pattern = rule.get('pattern')
+            if not pattern:
+                continue
+            if rule.get('regex'):
+                if NUMBERED_REFERENCE.search(pattern):
+                    continue  # Refused by the rule editor; one saved before that never matches
+                self.patterns.append((i, re.compile(pattern, re.IGNORECASE if rule.get('ignore_case') else 0)))
+                scoped = scoped_flags(pattern)
+                parts.append(f'(?P<hl{i}>(?i:{scoped}))' if rule.get('ignore_case') else f'(?P<hl{i}>{scoped})')
+            elif rule.get('ignore_case'):
+                self.folded.setdefault(pattern.lower(), i)
+            else:
+                self.literals.setdefault(pattern, i)
+        if self.folded:
+            parts.insert(0, '(?i:' + literal_trie(self.folded) + ')')
+        if self.literals:
+            parts.insert(0, literal_trie(self.literals))
+        self.regex = re.compile('|'.join(parts)) if parts else None
+
+    def tag_for(self, match):
+        # Tag of the lowest-numbered rule matching the whole span, counting the
+        # regex rule that matched even if it can't match the bare span alone
+        matched = match.group()
+        candidates = [self.literals.get(matched), self.folded.get(matched.lower())]
+        if match.lastgroup:
+            candidates.append(int(match.lastgroup[2:]))
+        candidates += [i for i, regex in self.patterns if regex.fullmatch(matched)]
+        candidates = [i for i in candidates if i is not None]
+        return f"hl{min(candidates)}" if candidates else None
+
+    def rule_for(self, tag):
+        return self.rules[int(tag[2:])]
+
+# Applies highlight rules incrementally to one session's output stream. Only new
+# text is scanned, plus the unfinished last line carried over from earlier chunks,
+# so matches that cross chunk boundaries are still found. Matches are returned as
+# Text index ranges for batching into tag_add calls.
+class HighlightStream:
+    CARRY_LIMIT = 4096  # Longest unfinished line kept for rescanning
+
+    def __init__(self):
+        self.carry = []  # [(widget index, char offset, text)] segments of the unfinished line
+
+    def reset(self):
+        self.carry = []
+
+    def feed(self, rules, text, index):
+        # text was inserted into the widget at index; returns (ranges, alerts)
+        segments = self.carry + [(index, 0, text)]
+        starts = []
+        pos = 0
+        for seg in segments:
+            starts.append(pos)
+            pos += len(seg[2])
+        buffer = ''.join(seg[2] for seg in segments)
+        complete = buffer.rfind('\n') + 1  # Everything before this is finished lines
+        ranges, alerts = [], []
+        for match in rules.regex.finditer(buffer):
+            a, b = match.span()
+            if a == b:
+                continue
+            tag = rules.tag_for(match)
+            if tag is None:
+                continue
+            # A match spanning chunks is tagged piecewise in each chunk's widget range
+            for (base, offset, seg_text), seg_start in zip(segments, starts):
+                lo = max(a, seg_start)
+                hi = min(b, seg_start + len(seg_text))
+                if lo < hi:
+                    ranges.append((tag, f"{base}+{offset + lo - seg_start}c", f"{base}+{offset + hi - seg_start}c"))
+            # Alert once, when the line holding the match is complete and won't be rescanned
+            if b <= complete and rules.rule_for(tag).get('notify'):
+                alerts.append((rules.rule_for(tag), match.group()))
+        keep_from = max(complete, len(buffer) - self.CARRY_LIMIT)
+        self.carry = []
+        for (base, offset, seg_text), seg_start in zip(segments, starts):
+            if seg_start + len(seg_text) > keep_from:
+                cut = max(0, keep_from - seg_start)
+                self.carry.append((base, offset + cut, seg_text[cut:]))
+        return ranges, alerts
+
+# Timestamp headers the app writes into session logs, e.g. "[2024-05-01 09:30:00] Received:"
+LOG_TIMESTAMP = re.compile(rb'\[(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)\] (?:Received|Sent|Exec|Macro)')
+
+# Memory-mapped view of a (possibly multi-GB) log file. A background thread builds
+# a sparse index of (byte offset, newlines before offset) checkpoints, one per
+# CHUNK, so line lookups only scan within a single chunk. Nothing is read into
+# memory beyond the slices being examined.
+class LogIndex:
+    CHUNK = 1 << 20  # Bytes between index checkpoints
+    SEARCH_CHUNK = 8 << 20  # Bytes per regex search step
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.size = os.fstat(self.file.fileno()).st_size
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+        self.offsets = [0]  # Checkpoint byte offsets
+        self.counts = [0]  # Newlines before each checkpoint
+        self.indexed = 0  # Bytes covered by the index so far
+        self.closed = False
+        self.lock = threading.Lock()
+        threading.Thread(target=self._build, daemon=True).start()
+
+    def _build(self):
+        pos = 0
+        lines = 0
+        while pos < self.size:
+            with self.lock:
+                if self.closed:
+                    return
+                end = min(pos + self.CHUNK, self.size)
+                lines += self.mm[pos:end].count(b'\n')
+            self.offsets.append(end)
+            self.counts.append(lines)
+            self.indexed = end
+            pos = end
+
+    @property
+    def done(self):
+        return self.indexed >= self.size
+
+    @property
+    def total_lines(self):
+        # Lines in the file once indexing is done (a final line without newline counts)
+        if not self.done:
+            return None
+        return self.counts[-1] + (1 if self.size and self.mm[self.size - 1:self.size] != b'\n' else 0)
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            if self.size:
+                self.mm.close()
+            self.file.close()
+
+    def line_start(self, offset):
+        # Start of the line containing offset
+        if offset <= 0:
+            return 0
+        offset = min(offset, self.size)
+        return self.mm.rfind(b'\n', 0, offset) + 1
+
+    def next_line(self, offset):
+        end = self.mm.find(b'\n', offset)
+        return self.size if end == -1 else end + 1
+
+    def prev_line(self, offset):
+        return self.line_start(offset - 1) if offset > 0 else 0
+
+    def read_lines(self, offset, count):
+        # [(offset, decoded line)] for up to count lines starting at offset
+        lines = []
+        while offset < self.size and len(lines) < count:
+            end = self.next_line(offset)
+            lines.append((offset, self.mm[offset:end].rstrip(b'\r\n').decode('utf-8', errors='replace')))
+            offset = end
+        return lines
+
+    def line_offset(self, number):
+        # Byte offset of 0-based line number, or None if not indexed that far yet
+        if number <= 0:
+            return 0
+        i = bisect.bisect_left(self.counts, number) - 1
+        if i == len(self.counts) - 1 and not self.done:
+            return None
+        pos = self.offsets[i]
+        for _ in range(number - self.counts[i]):
+            pos = self.mm.find(b'\n', pos)
+            if pos == -1:
+                return None
+            pos += 1
+        return pos
+
+    def line_number(self, offset):
+        # 0-based line number at offset, or None if not indexed that far yet
+        if offset > self.indexed:
+            return None
+        i = bisect.bisect_right(self.offsets, offset) - 1
+        return self.counts[i] + self.mm[self.offsets[i]:offset].count(b'\n')
+
+    def next_timestamp(self, start, end, target=None):
+        # First (offset, datetime) of a timestamp header in [start, end), at or after target
+        pos = start
+        while pos < end:
+            stop = min(pos + self.SEARCH_CHUNK, end)
+            window = self.mm[pos:min(stop + 64, self.size)]  # Small overlap for headers crossing the step
+            for match in LOG_TIMESTAMP.finditer(window):
+                if pos + match.start() >= stop:
+                    break
+                stamp = datetime.strptime(match.group(1).decode(), '%Y-%m-%d %H:%M:%S')
+                if target is None or stamp >= target:
+                    return pos + match.start(), stamp
+            pos = stop
+        return None
+
+    def find_time(self, target):
+        # Offset of the first timestamp at or after target; headers are written in
+        # order, so binary search narrows the range before a short forward scan
+        lo, hi = 0, self.size
+        while hi - lo > self.CHUNK:
+            mid = (lo + hi) // 2
+            found = self.next_timestamp(mid, hi)
+            if found is not None and found[1] < target:
+                lo = found[0] + 1
+            else:
+                hi = mid
+        found = self.next_timestamp(lo, self.size, target)
+        return found[0] if found else None
+
+    def search(self, pattern, start, cancelled=None):
+        # Streaming regex search for a compiled bytes pattern from start; returns
+        # (start, end) of the first match or None. Steps end on line boundaries so
+        # matches within a line are never split across steps.
+        pos = start
+        while pos < self.size:
+            if cancelled is not None and cancelled.is_set():
+                return None
+            with self.lock:
+                if self.closed:
+                    return None
+                stop = min(pos + self.SEARCH_CHUNK, self.size)
+                if stop < self.size:
+                    line_end = self.mm.rfind(b'\n', pos, stop)
+                    stop = line_end + 1 if line_end != -1 else self.next_line(stop)
+                match = pattern.search(self.mm[pos:stop])
+            if match:
+                return pos + match.start(), pos + match.end()
+            pos = stop
+        return None
+
+def as_list(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+# Live performance counters, gauges and timings, keyed by (name, session label).
+# Every instrumentation site checks metrics.enabled first, so with metrics off the
+# cost is a single attribute lookup.
+class Metrics:
+    SAMPLES = 512  # Recent samples kept per timing for percentiles
+
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.counters = {}
+            self.gauges = {}
+            self.timings = {}
+
+    def count(self, name, amount=1, label=''):
+        with self.lock:
+            self.counters[(name, label)] = self.counters.get((name, label), 0) + amount
+
+    def gauge(self, name, value, label=''):
+        self.gauges[(name, label)] = value
+
+    def observe(self, name, seconds, label=''):
+        with self.lock:
+            timing = self.timings.get((name, label))
+            if timing is None:
+                timing = self.timings[(name, label)] = {'count': 0, 'total': 0.0, 'max': 0.0,
+                                                        'samples': collections.deque(maxlen=self.SAMPLES)}
+            timing['count'] += 1
+            timing['total'] += seconds
+            timing['max'] = max(timing['max'], seconds)
+            timing['samples'].append(seconds)
+
+    def forget(self, label):
+        # Drop a closed session's series
+        with self.lock:
+            for series in (self.counters, self.gauges, self.timings):
+                for key in [key for key in series if key[1] == label]:
+                    del series[key]
+
+    def snapshot(self, previous=None):
+        # Plain-dict view of all series; counter rates are per second since previous
+        now = time.monotonic()
+        with self.lock:
+            counters = dict(self.counters)
+            timings = {key: (t['count'], t['total'], t['max'], sorted(t['samples'])) for key, t in self.timings.items()}
+        rates = {}
+        if previous is not None and now > previous['time']:
+            for key, value in counters.items():
+                rates[key] = (value - previous['counters'].get(key, 0)) / (now - previous['time'])
+        summaries = {}
+        for key, (count, total, worst, samples) in timings.items():
+            summaries[key] = {'count': count, 'mean': total / count if count else 0.0, 'max': worst,
+                              'p50': samples[len(samples) // 2] if samples else 0.0,
+                              'p99': samples[min(len(samples) - 1, int(len(samples) * 0.99))] if samples else 0.0,
+                              'sum': total}
+        return {'time': now, 'counters': counters, 'rates': rates, 'gauges': dict(self.gauges), 'timings': summaries}
+
+    @staticmethod
+    def to_json(snapshot):
+        def series(values):
+            return [dict({'name': name, 'session': label}, **(value if isinstance(value, dict) else {'value': value}))
+                    for (name, label), value in sorted(values.items())]
+        return json.dumps({'timestamp': datetime.now().isoformat(timespec='seconds'),
+                           'counters': series(snapshot['counters']), 'rates': series(snapshot['rates']),
+                           'gauges': series(snapshot['gauges']), 'timings': series(snapshot['timings'])}, indent=1)
+
+    @staticmethod
+    def to_prometheus(snapshot):
+        lines = []
+        def labels(label, extra=''):
+            parts = ([f'session="{label}"'] if label else []) + ([extra] if extra else [])
+            return '{' + ','.join(parts) + '}' if parts else ''
+        def emit(kind, values, suffix=''):
+            seen = set()
+            for (name, label), value in sorted(values.items()):
+                metric = f'commandforge_{name}{suffix}'
+                if metric not in seen:
+                    lines.append(f'# TYPE {metric} {kind}')
+                    seen.add(metric)
+                if kind == 'summary':
+                    for quantile, key in (('0.5', 'p50'), ('0.99', 'p99')):
+                        extra = 'quantile="%s"' % quantile
+                        lines.append(f'{metric}{labels(label, extra)} {value[key]:.6f}')
+                    lines.append(f'{metric}_sum{labels(label)} {value["sum"]:.6f}')
+                    lines.append(f'{metric}_count{labels(label)} {value["count"]}')
+                else:
+                    lines.append(f'{metric}{labels(label)} {value}')
+        emit('counter', snapshot['counters'], '_total')
+        emit('gauge', snapshot['gauges'])
+        emit('summary', snapshot['timings'], '_seconds')
+        return '\n'.join(lines) + '\n'
+
+metrics = Metrics()
 
 # Class to manage a single SSH session
 class SSHSession:
-    def __init__(self, host, port, user, passw, output_text, log_path):
-        # Store connection details and UI elements
+    def __init__(self, host, port, user, passw, output_text, log_path, options=None):
+        self._init_state(host, port, user, passw, output_text, options)
+        
+        # Connect in timed phases and invoke an interactive shell with terminal type
+        self.ssh_transport, self.channel, self.phases = open_shell(host, port, user, passw, connect_options(self.options))
+        record_connect_phases(self.label, self.phases)
+        self.connected = True
+        
+        # Start reader thread to handle incoming output
+        self.reader_thread = threading.Thread(target=self._reader, daemon=True)
+        self.reader_thread.start()
+        
+        # Open log file for automatic saving
+        self.logfile = open(log_path, 'a', encoding='utf-8')
+
+    def _init_state(self, host, port, user, passw, output_text, options):
+        # Connection details, UI elements, queues and watchers; WorkerSession, which
+        # connects differently, sets up through here too. options are the saved
+        # profile's connection settings (auth method, key file)
         self.host = host
         self.port = port
         self.user = user
         self.passw = passw
+        self.options = options or {}
         self.output_text = output_text  # Tkinter Text widget for output
-        
-        # Set up SSH client
-        self.client = paramiko.SSHClient()
-        self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        self.client.connect(host, port=port, username=user, password=passw)
-        
-        # Invoke an interactive shell with terminal type
-        self.channel = self.client.invoke_shell(term='vt100', width=80, height=24)
-        self.connected = True
+        self.label = f"{user}@{host}:{port}"  # Session name in metrics
+        self.phases = {}
+        self.connected = False
         
         # Queue for thread-safe output handling
         self.output_queue = queue.Queue()
         
-        # Start reader thread to handle incoming output
-        self.reader_thread = threading.Thread(target=self._reader, daemon=True)
-        self.reader_thread.start()
+        # Queue for results of commands run on their own exec channels
+        self.exec_queue = queue.Queue()
+        self.exec_slots = threading.BoundedSemaphore(EXEC_MAX_IN_FLIGHT)
         
-        # Open log file for automatic saving
-        self.logfile = open(log_path, 'a')
+        # Stream matchers fed by the reader thread, and the running macro (one per session)
+        self.watchers = []
+        self.watchers_lock = threading.Lock()
+        self.macro_thread = None
+        self.macro_cancel = threading.Event()
 
     def _reader(self):
         # Thread loop to read from SSH channel continuously
@@ -59,52 +515,517 @@ class SSHSession:
                 data = self.channel.recv(4096)
                 if not data:
                     break
-                decoded = data.decode('utf-8', errors='replace')
-                # Strip OSC sequences (like title sets ending with \x07 or ST)
-                decoded = re.sub(r'\x1b\].*?(\x07|\x1b\\)', '', decoded)
-                # Strip other ANSI escape sequences
-                decoded = re.sub(r'\x1b(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])', '', decoded)
-                # Remove non-printable characters except \n, \t, \r
-                decoded = ''.join(c for c in decoded if c.isprintable() or c == '\n' or c == '\t' or c == '\r')
-                # Handle line endings: replace CRLF with LF, and standalone CR with LF
-                decoded = decoded.replace('\r\n', '\n').replace('\r', '\n')
+                timing = metrics.enabled
+                if timing:
+                    received = time.perf_counter()
+                decoded = clean_output(data.decode('utf-8', errors='replace'))
                 self.output_queue.put(decoded)
+                if timing:
+                    metrics.observe('reader_enqueue_latency', time.perf_counter() - received, self.label)
+                    metrics.count('session_bytes_in', len(data), self.label)
+                if self.watchers:
+                    with self.watchers_lock:
+                        for watcher in self.watchers:
+                            watcher.feed(decoded)
             if self.channel in e:
                 # Handle error if needed
                 break
         # If loop exits, connection is lost
         self.connected = False
+        with self.watchers_lock:
+            for watcher in self.watchers:
+                watcher.finish('closed')
         self.output_queue.put("\nConnection lost. Press Send (or Enter) to reconnect.\n")
 
     def send(self, cmd):
         # Handle reconnect if needed
         if not self.connected:
             try:
-                self.client = paramiko.SSHClient()
-                self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-                self.client.connect(self.host, port=self.port, username=self.user, password=self.passw)
-                self.channel = self.client.invoke_shell(term='vt100', width=80, height=24)
+                self.ssh_transport, self.channel, self.phases = open_shell(self.host, self.port, self.user, self.passw,
+                                                                           connect_options(self.options))
+                record_connect_phases(self.label, self.phases)
                 self.connected = True
                 self.reader_thread = threading.Thread(target=self._reader, daemon=True)
                 self.reader_thread.start()
-                self.output_queue.put("Reconnected.\n")
+                self.output_queue.put(f"Reconnected ({describe_phases(self.phases)}).\n")
             except Exception as e:
                 self.output_queue.put(f"Reconnect failed: {str(e)}\n")
                 return
         # Send the command to the SSH channel with CRLF for Windows compatibility
         self.channel.send(cmd + '\r\n')
+        if metrics.enabled:
+            metrics.count('session_bytes_out', len(cmd.encode('utf-8')) + 2, self.label)
+
+    def run_exec(self, cmd):
+        # Run a command on its own exec channel over the session's transport;
+        # several can be in flight at once and each result lands in exec_queue
+        threading.Thread(target=self._exec_worker, args=(cmd,), daemon=True).start()
+
+    def _exec_worker(self, cmd):
+        with self.exec_slots:
+            if self.connected:
+                result = exec_command(self.ssh_transport, cmd)
+            else:
+                result = not_connected_result(cmd)
+        self.exec_queue.put(result)
+
+    def run_macro(self, name, macro):
+        # Run a multi-step macro in its own thread; returns False if one is already running
+        if self.macro_thread and self.macro_thread.is_alive():
+            self.output_queue.put(f"\n[macro {name}] another macro is still running on this session.\n")
+            return False
+        self.macro_cancel.clear()
+        self.macro_thread = threading.Thread(target=self._macro_worker, args=(name, macro), daemon=True)
+        self.macro_thread.start()
+        return True
+
+    def _macro_worker(self, name, macro):
+        steps = macro.get('steps', [])
+        macro_abort = as_list(macro.get('abort'))
+        for number, step in enumerate(steps, 1):
+            if self.macro_cancel.is_set():
+                self.output_queue.put(f"\n[macro {name}] cancelled before step {number}/{len(steps)}.\n")
+                return
+            expect = as_list(step.get('expect'))
+            matcher = None
+            if expect:
+                try:
+                    matcher = StreamMatcher(expect, as_list(step.get('abort')) + macro_abort)
+                except re.error as e:
+                    self.output_queue.put(f"\n[macro {name}] step {number}: invalid pattern: {e}\n")
+                    return
+                # Register before sending so no output is missed
+                with self.watchers_lock:
+                    self.watchers.append(matcher)
+            try:
+                if 'send' in step:
+                    self.send(step['send'])
+                if matcher is None:
+                    self.macro_cancel.wait(step.get('delay', 0))
+                    continue
+                timeout = step.get('timeout', macro.get('timeout', MACRO_STEP_TIMEOUT))
+                result = matcher.wait(timeout)
+            except Exception as e:
+                self.output_queue.put(f"\n[macro {name}] failed at step {number}/{len(steps)}: {e}\n")
+                return
+            finally:
+                if matcher is not None:
+                    with self.watchers_lock:
+                        self.watchers.remove(matcher)
+            if result is None:
+                self.output_queue.put(f"\n[macro {name}] step {number}/{len(steps)} timed out after {timeout}s waiting for {expect}.\n")
+                return
+            kind, pattern = result
+            if kind == 'abort':
+                self.output_queue.put(f"\n[macro {name}] aborted at step {number}/{len(steps)}: matched {pattern!r}.\n")
+                return
+            if kind in ('closed', 'cancelled'):
+                self.output_queue.put(f"\n[macro {name}] stopped at step {number}/{len(steps)}: {kind}.\n")
+                return
+        self.output_queue.put(f"\n[macro {name}] completed {len(steps)} steps.\n")
+
+    def cancel_macro(self):
+        self.macro_cancel.set()
+        with self.watchers_lock:
+            for watcher in self.watchers:
+                watcher.finish('cancelled')
 
     def interrupt(self):
-        # Send Ctrl+C interrupt if connected
+        # Send Ctrl+C interrupt if connected, and stop any running macro
+        self.cancel_macro()
         if self.connected:
             self.channel.send('\x03')
 
+    def transport(self):
+        # Transport for side channels such as the SFTP panel
+        return self.ssh_transport
+
     def close(self):
         # Clean up resources
         if self.connected:
-            self.client.close()
+            self.ssh_transport.close()
+        self.logfile.close()
+
+def record_connect_phases(label, phases):
+    # Handshake phase timings (dns, tcp, kex, host_key, auth, shell) as connect_* metrics
+    if metrics.enabled:
+        for phase, seconds in phases.items():
+            metrics.observe(f'connect_{phase}', seconds, label)
+
+def not_connected_result(cmd):
+    return {'cmd': cmd, 'started': datetime.now(), 'stdout': '', 'stderr': '',
+            'exit_code': None, 'duration': 0.0, 'error': "Not connected"}
+
+# Optional multi-process mode: sessions are spread over up to this many worker
+# processes (session_worker.py), which do the SSH crypto, decoding and sanitizing.
+# 0 keeps every session in the GUI process. Set from Settings > Session Workers.
+WORKER_CONNECT_TIMEOUT = 60
+session_workers = []  # Live SessionWorker handles
+session_workers_lock = threading.Lock()  # Sessions may connect from several threads at once
+worker_sessions = {}  # {session id: WorkerSession}
+worker_session_ids = itertools.count(1)
+
+def worker_process_count():
+    return settings.get('worker_processes', 0)
+
+def session_worker_for(chain=None):
+    # Sessions behind a jump chain go where that chain's bastion is already pooled;
+    # otherwise start another worker while under the limit, else use the least loaded
+    with session_workers_lock:
+        live = [worker for worker in session_workers if worker.alive()]
+        pooled = [worker for worker in live if chain and chain in worker.chains]
+        if pooled:
+            return pooled[0]
+        if len(live) < worker_process_count():
+            worker = SessionWorker(dispatch_worker_message, session_worker_exited)
+            session_workers.append(worker)
+        else:
+            worker = min(live, key=lambda worker: len(worker.sessions))
+        if chain:
+            worker.chains.add(chain)
+        return worker
+
+def dispatch_worker_message(message):
+    # Runs on a worker handle's reader thread
+    session = worker_sessions.get(message[1])
+    if session is not None:
+        session.deliver(message)
+
+def session_worker_exited(worker):
+    # A worker stopped or crashed: only its own sessions are affected
+    with session_workers_lock:  # Runs on the worker's reader thread, racing session_worker_for
+        if worker in session_workers:
+            session_workers.remove(worker)
+    for sid in list(worker.sessions):
+        session = worker_sessions.get(sid)
+        if session is not None:
+            session.worker_lost(worker.process.returncode)
+
+# SSHSession whose connection lives in a worker process. It keeps the same queues,
+# watchers and macro engine as SSHSession (those run here, fed by the worker's
+# output), and forwards sends, interrupts and exec commands to the worker.
+class WorkerSession(SSHSession):
+    def __init__(self, host, port, user, passw, output_text, log_path, options=None):
+        self._init_state(host, port, user, passw, output_text, options)  # Not SSHSession.__init__, which connects
+        self.side_transport = None  # GUI-side connection, only opened for the SFTP panel and port forwards
+        self.side_lock = threading.Lock()  # Forwards may ask for it from several threads at once
+        self.pending_execs = {}  # {request id: (threading.Event, cmd)}
+        self.exec_ids = itertools.count(1)
+        self.sid = next(worker_session_ids)
+        self.worker = None
+        self.opened = threading.Event()
+        self.open_error = None
+        worker_sessions[self.sid] = self
+        try:
+            self._open()
+        except Exception:
+            worker_sessions.pop(self.sid, None)
+            raise
+        self.logfile = open(log_path, 'a', encoding='utf-8')
+
+    def _open(self):
+        # Ask a worker to connect this session and wait for the answer
+        options = connect_options(self.options)
+        if self.worker is None or not self.worker.alive():
+            self.worker = session_worker_for(tuple(as_list(self.options.get('jump'))))
+        self.worker.sessions.add(self.sid)
+        self.opened.clear()
+        self.open_error = None
+        self.worker.request('open', self.sid, self.host, self.port, self.user, self.passw, options)
+        if not self.opened.wait(WORKER_CONNECT_TIMEOUT):
+            raise paramiko.SSHException("Timed out waiting for the session worker")
+        if self.open_error is not None:
+            raise paramiko.SSHException(self.open_error)
+        self.connected = True
+
+    def deliver(self, message):
+        # Called on the worker handle's reader thread, in place of SSHSession._reader
+        kind = message[0]
+        if kind == 'output':
+            decoded, size, received = message[2:]
+            self.output_queue.put(decoded)
+            if metrics.enabled:
+                # Includes the trip through the worker pipe
+                metrics.observe('reader_enqueue_latency', max(0.0, time.time() - received), self.label)
+                metrics.count('session_bytes_in', size, self.label)
+            if self.watchers:
+                with self.watchers_lock:
+                    for watcher in self.watchers:
+                        watcher.feed(decoded)
+        elif kind == 'opened':
+            self.phases = message[2]
+            record_connect_phases(self.label, self.phases)
+            self.opened.set()
+        elif kind == 'error':
+            self.open_error = message[2]
+            self.opened.set()
+        elif kind == 'lost':
+            self._lost("\nConnection lost. Press Send (or Enter) to reconnect.\n")
+        elif kind == 'exec_result':
+            request, result = message[2:]
+            self.exec_queue.put(result)
+            pending = self.pending_execs.pop(request, None)
+            if pending is not None:
+                pending[0].set()
+
+    def worker_lost(self, returncode):
+        if not self.opened.is_set():
+            self.open_error = f"Session worker exited with code {returncode}"
+            self.opened.set()
+        for request in list(self.pending_execs):
+            pending = self.pending_execs.pop(request, None)
+            if pending is not None:
+                done, cmd = pending
+                self.exec_queue.put(dict(not_connected_result(cmd), error="Session worker exited"))
+                done.set()
+        if self.connected:
+            self._lost(f"\nSession worker exited (code {returncode}). Press Send (or Enter) to reconnect.\n")
+
+    def _lost(self, text):
+        self.connected = False
+        with self.watchers_lock:
+            for watcher in self.watchers:
+                watcher.finish('closed')
+        self.output_queue.put(text)
+
+    def send(self, cmd):
+        if not self.connected:
+            try:
+                self._open()
+                self.output_queue.put(f"Reconnected ({describe_phases(self.phases)}).\n")
+            except Exception as e:
+                self.output_queue.put(f"Reconnect failed: {str(e)}\n")
+                return
+        try:
+            self.worker.request('send', self.sid, cmd + '\r\n')
+        except OSError:
+            return  # The worker's exit is reported through worker_lost
+        if metrics.enabled:
+            metrics.count('session_bytes_out', len(cmd.encode('utf-8')) + 2, self.label)
+
+    def _exec_worker(self, cmd):
+        with self.exec_slots:
+            if not self.connected:
+                self.exec_queue.put(not_connected_result(cmd))
+                return
+            request = next(self.exec_ids)
+            done = threading.Event()
+            self.pending_execs[request] = (done, cmd)
+            try:
+                self.worker.request('exec', self.sid, request, cmd)
+            except OSError:
+                if self.pending_execs.pop(request, None) is not None:
+                    self.exec_queue.put(dict(not_connected_result(cmd), error="Session worker exited"))
+                done.set()
+            done.wait()
+
+    def interrupt(self):
+        self.cancel_macro()
+        if self.connected:
+            try:
+                self.worker.request('send', self.sid, '\x03')
+            except OSError:
+                pass
+
+    def transport(self):
+        # The shell lives in the worker, so side channels get their own connection
+        with self.side_lock:
+            if self.side_transport is None or not self.side_transport.is_active():
+                self.side_transport, phases = connect_transport(self.host, self.port, self.user, self.passw,
+                                                                connect_options(self.options))
+            return self.side_transport
+
+    def close(self):
+        worker_sessions.pop(self.sid, None)
+        if self.worker is not None:
+            self.worker.sessions.discard(self.sid)
+            try:
+                self.worker.request('close', self.sid)
+            except OSError:
+                pass
+        self.connected = False
+        if self.side_transport is not None:
+            self.side_transport.close()
         self.logfile.close()
 
+# SFTP transfer tuning: parallel transfers per session, request size, and how
+# far ahead pipelined reads run (bytes requested before earlier replies are read)
+SFTP_WORKERS = 4
+SFTP_BLOCK = 32768
+SFTP_READ_AHEAD = 8 << 20
+
+# Parallel, pipelined SFTP transfers over an existing session transport. Each worker
+# thread opens its own SFTP channel on the transport so transfers don't serialize
+# behind one channel. Partial data goes to "<name>.part" files so an interrupted
+# transfer resumes from where it stopped when queued again.
+class SFTPTransfers:
+    def __init__(self, transport, workers=SFTP_WORKERS):
+        self.transport = transport
+        self.workers = workers
+        self.browser = paramiko.SFTPClient.from_transport(transport)  # For listings
+        self.jobs = queue.Queue()
+        self.transfers = []  # Progress dicts, read by the panel
+        self.closed = False
+        for _ in range(workers):
+            threading.Thread(target=self._worker, daemon=True).start()
+
+    def download(self, remote_path, local_path):
+        return self._queue('download', remote_path, local_path)
+
+    def upload(self, local_path, remote_path):
+        return self._queue('upload', local_path, remote_path)
+
+    def retry(self, transfer):
+        # Re-queue a failed or cancelled transfer; it resumes from its .part file. A
+        # failed folder walk isn't a transfer and may have queued part of its files,
+        # so it is left for the user to start again
+        if transfer['direction'] == 'walk':
+            return
+        if transfer['status'] in ('failed', 'cancelled'):
+            transfer.update(status='queued', error=None, cancel=False)
+            self.jobs.put(transfer)
+
+    def _queue(self, direction, src, dest):
+        transfer = {'direction': direction, 'src': src, 'dest': dest, 'size': None, 'done': 0,
+                    'resumed': 0, 'status': 'queued', 'error': None, 'cancel': False,
+                    'started': None, 'finished': None}
+        self.transfers.append(transfer)
+        self.jobs.put(transfer)
+        return transfer
+
+    def _worker(self):
+        sftp = None
+        while not self.closed:
+            transfer = self.jobs.get()
+            if transfer is None or self.closed:
+                break
+            if transfer['cancel']:
+                transfer['status'] = 'cancelled'
+                continue
+            transfer.update(status='running', started=time.monotonic(), finished=None)
+            try:
+                if sftp is None:
+                    sftp = paramiko.SFTPClient.from_transport(self.transport)
+                if transfer['direction'] == 'download':
+                    self._download(sftp, transfer)
+                else:
+                    self._upload(sftp, transfer)
+                transfer['status'] = 'done'
+            except InterruptedError:
+                transfer['status'] = 'cancelled'
+            except Exception as e:
+                transfer.update(status='failed', error=str(e))
+                if not self.transport.is_active():
+                    sftp = None
+            transfer['finished'] = time.monotonic()
+        if sftp is not None:
+            try:
+                sftp.close()
+            except (EOFError, OSError, paramiko.SSHException):
+                pass  # Transport already gone
+
+    def _download(self, sftp, transfer):
+        part = transfer['dest'] + '.part'
+        size = sftp.stat(transfer['src']).st_size
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        if offset > size:
+            offset = 0
+        transfer.update(size=size, done=offset, resumed=offset)
+        with sftp.open(transfer['src'], 'rb') as remote_file, open(part, 'ab' if offset else 'wb') as local_file:
+            pos = offset
+            while pos < size:
+                # readv pipelines every block request in the batch before reading replies
+                batch_end = min(size, pos + SFTP_READ_AHEAD)
+                blocks = [(o, min(SFTP_BLOCK, batch_end - o)) for o in range(pos, batch_end, SFTP_BLOCK)]
+                for data in remote_file.readv(blocks):
+                    local_file.write(data)
+                    transfer['done'] += len(data)
+                if transfer['cancel']:
+                    raise InterruptedError()
+                pos = batch_end
+        os.replace(part, transfer['dest'])
+
+    def _upload(self, sftp, transfer):
+        part = transfer['dest'] + '.part'
+        size = os.path.getsize(transfer['src'])
+        try:
+            offset = sftp.stat(part).st_size
+        except IOError:
+            offset = 0
+        if offset > size:
+            offset = 0
+        transfer.update(size=size, done=offset, resumed=offset)
+        with open(transfer['src'], 'rb') as local_file, sftp.open(part, 'r+b' if offset else 'wb') as remote_file:
+            # Pipelined writes don't wait for each ack; errors surface at close
+            remote_file.set_pipelined(True)
+            local_file.seek(offset)
+            remote_file.seek(offset)
+            while True:
+                data = local_file.read(SFTP_READ_AHEAD // 8)
+                if not data:
+                    break
+                remote_file.write(data)
+                transfer['done'] += len(data)
+                if transfer['cancel']:
+                    raise InterruptedError()
+        try:
+            sftp.posix_rename(part, transfer['dest'])
+        except IOError:
+            # Servers without posix-rename refuse to replace an existing file
+            try:
+                sftp.remove(transfer['dest'])
+            except IOError:
+                pass
+            sftp.rename(part, transfer['dest'])
+
+    def queue_download_tree(self, remote_dir, local_dir):
+        # Walk a remote directory in the background and queue every file in it
+        def walk(sftp, remote, local):
+            os.makedirs(local, exist_ok=True)
+            for attr in sftp.listdir_attr(remote):
+                remote_path = remote.rstrip('/') + '/' + attr.filename
+                local_path = os.path.join(local, attr.filename)
+                if stat.S_ISDIR(attr.st_mode or 0):
+                    walk(sftp, remote_path, local_path)
+                else:
+                    self.download(remote_path, local_path)
+        threading.Thread(target=self._walk, args=(walk, remote_dir, local_dir), daemon=True).start()
+
+    def queue_upload_tree(self, local_dir, remote_dir):
+        # Walk a local directory in the background, creating remote folders and queueing files
+        def walk(sftp, local, remote):
+            try:
+                sftp.mkdir(remote)
+            except IOError:
+                pass  # Already exists
+            for entry in os.scandir(local):
+                remote_path = remote.rstrip('/') + '/' + entry.name
+                if entry.is_dir():
+                    walk(sftp, entry.path, remote_path)
+                else:
+                    self.upload(entry.path, remote_path)
+        threading.Thread(target=self._walk, args=(walk, local_dir, remote_dir), daemon=True).start()
+
+    def _walk(self, walk, src, dest):
+        try:
+            sftp = paramiko.SFTPClient.from_transport(self.transport)
+            try:
+                walk(sftp, src, dest)
+            finally:
+                sftp.close()
+        except Exception as e:
+            self.transfers.append({'direction': 'walk', 'src': src, 'dest': dest, 'size': None, 'done': 0,
+                                   'resumed': 0, 'status': 'failed', 'error': str(e), 'cancel': False,
+                                   'started': None, 'finished': None})
+
+    def close(self):
+        self.closed = True
+        for transfer in self.transfers:
+            transfer['cancel'] = True
+        for _ in range(self.workers):
+            self.jobs.put(None)
+        self.browser.close()
+
 # Main application setup
 root = tk.Tk()
 root.title("Command Forge")
@@ -113,8 +1034,11 @@ root.geometry("1200x600")  # Increased width for reference pane
 if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
     icon_path = os.path.join(sys._MEIPASS, 'command_forge.ico')
 else:
-    icon_path = 'command_forge.ico'
-root.iconbitmap(icon_path)
+    icon_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'command_forge.ico')
+try:
+    root.iconbitmap(icon_path)
+except tk.TclError:
+    pass  # .ico icons are only supported on Windows
 
 # Theme settings
 themes = {
@@ -145,8 +1069,9 @@ themes = {
 }
 current_theme = 'light'  # Default
 
-# Load theme preference if exists
+# Load theme preference and other settings if they exist
 settings_path = os.path.join(base_dir, 'settings.json')
+settings = {}
 try:
     with open(settings_path, 'r') as f:
         settings = json.load(f)
@@ -154,53 +1079,64 @@ try:
 except FileNotFoundError:
     pass
 
-def apply_theme(widget, theme):
-    if isinstance(widget, tk.Tk) or isinstance(widget, tk.Toplevel):
-        widget.config(bg=themes[theme]['bg'])
-    elif isinstance(widget, (tk.Frame, ttk.Frame)):
-        widget.config(bg=themes[theme]['bg'])
-    elif isinstance(widget, (tk.Label, ttk.Label)):
-        widget.config(bg=themes[theme]['bg'], fg=themes[theme]['fg'])
-    elif isinstance(widget, (tk.Button, ttk.Button)):
-        if 'Interrupt' in widget.cget('text'):
-            widget.config(bg=themes[theme]['interrupt_bg'], fg=themes[theme]['interrupt_fg'])
-        else:
-            widget.config(bg=themes[theme]['button_bg'], fg=themes[theme]['button_fg'])
-    elif isinstance(widget, tk.Entry):
-        widget.config(bg=themes[theme]['text_bg'], fg=themes[theme]['fg'], insertbackground=themes[theme]['fg'])
-    elif isinstance(widget, Text):
-        widget.config(bg=themes[theme]['text_bg'], fg=themes[theme]['text_fg'], insertbackground=themes[theme]['fg'])
-    elif isinstance(widget, tk.Listbox):
-        widget.config(bg=themes[theme]['text_bg'], fg=themes[theme]['fg'])
-    elif isinstance(widget, tk.Checkbutton):
-        widget.config(bg=themes[theme]['bg'], fg=themes[theme]['fg'], selectcolor=themes[theme]['check_select'], activebackground=themes[theme]['bg'], activeforeground=themes[theme]['fg'])
-    elif isinstance(widget, ttk.Combobox):
-        widget.config(background=themes[theme]['text_bg'], foreground=themes[theme]['fg'])
-    elif isinstance(widget, ttk.Notebook):
-        style = ttk.Style()
-        style.theme_use('default')
-        style.configure("TNotebook", background=themes[theme]['notebook_bg'])
-        style.configure("TNotebook.Tab", background=themes[theme]['button_bg'], foreground=themes[theme]['button_fg'])
-        style.map("TNotebook.Tab", background=[("selected", themes[theme]['bg'])],
-                  foreground=[("selected", themes[theme]['fg'])])
-    # Recurse for children
-    for child in widget.winfo_children():
-        apply_theme(child, theme)
+def save_settings():
+    with open(settings_path, 'w') as f:
+        json.dump(settings, f)
+
+# Theming: classic widgets take their colours from the Tk option database and ttk
+# widgets from named styles, so widgets and dialogs are themed as they are built.
+# A switch rewrites both, then recolours the classic widgets that already exist
+# from the option database in a single Tcl pass (retheme below).
+THEME_OPTIONS = (  # (option database pattern, themes key)
+    ('*Toplevel.background', 'bg'),
+    ('*Frame.background', 'bg'),
+    ('*Label.background', 'bg'), ('*Label.foreground', 'fg'),
+    ('*Button.background', 'button_bg'), ('*Button.foreground', 'button_fg'),
+    ('*interrupt.background', 'interrupt_bg'), ('*interrupt.foreground', 'interrupt_fg'),  # Buttons named 'interrupt'
+    ('*Entry.background', 'text_bg'), ('*Entry.foreground', 'fg'), ('*Entry.insertBackground', 'fg'),
+    ('*Text.background', 'text_bg'), ('*Text.foreground', 'text_fg'), ('*Text.insertBackground', 'fg'),
+    ('*Listbox.background', 'text_bg'), ('*Listbox.foreground', 'fg'),
+)
+for toggle in ('Checkbutton', 'Radiobutton'):
+    THEME_OPTIONS += ((f'*{toggle}.background', 'bg'), (f'*{toggle}.foreground', 'fg'),
+                      (f'*{toggle}.selectColor', 'check_select'),
+                      (f'*{toggle}.activeBackground', 'bg'), (f'*{toggle}.activeForeground', 'fg'))
+
+root.tk.eval('''
+proc retheme {w} {
+    foreach {name class} {background Background foreground Foreground insertBackground Foreground
+                          selectColor Background activeBackground Foreground activeForeground Background} {
+        set value [option get $w $name $class]
+        if {$value ne ""} {catch {$w configure -[string tolower $name] $value}}
+    }
+    foreach child [winfo children $w] {retheme $child}
+}
+''')
+style = ttk.Style()
+style.theme_use('default')  # Native themes ignore most colour settings
+
+def set_theme(theme):
+    colors = themes[theme]
+    for pattern, key in THEME_OPTIONS:
+        root.option_add(pattern, colors[key])
+    style.configure('.', background=colors['bg'], foreground=colors['fg'], fieldbackground=colors['text_bg'],
+                    insertcolor=colors['fg'])
+    style.configure('Treeview', background=colors['text_bg'], foreground=colors['text_fg'])
+    style.configure('TNotebook', background=colors['notebook_bg'])
+    style.configure('TNotebook.Tab', background=colors['button_bg'], foreground=colors['button_fg'])
+    style.map('TNotebook.Tab', background=[('selected', colors['bg'])], foreground=[('selected', colors['fg'])])
+    style.map('TCombobox', fieldbackground=[('readonly', colors['text_bg'])], foreground=[('readonly', colors['fg'])])
+    root.config(bg=colors['bg'])
+    root.tk.call('retheme', '.')  # Every existing window, Toplevels included
 
 def switch_theme(new_theme):
     global current_theme
     current_theme = new_theme
-    with open(settings_path, 'w') as f:
-        json.dump({'theme': new_theme}, f)
-    apply_theme(root, new_theme)
-    # Apply to all open Toplevel windows
-    for win in root.winfo_children():
-        if isinstance(win, tk.Toplevel):
-            apply_theme(win, new_theme)
-    # Apply to session tabs
-    for tab in session_notebook.tabs():
-        frame = root.nametowidget(tab)
-        apply_theme(frame, new_theme)
+    settings['theme'] = new_theme
+    save_settings()
+    set_theme(new_theme)
+
+set_theme(current_theme)
 
 # PanedWindow for main content (left) and reference (right)
 paned = tk.PanedWindow(root, orient=tk.HORIZONTAL, sashrelief=tk.RAISED)
@@ -258,38 +1194,206 @@ session_notebook.pack(fill='both', expand=True)
 # Create images directory if not exists
 os.makedirs(os.path.join(base_dir, 'images'), exist_ok=True)
 
-# Load custom commands from JSON
-commands_path = os.path.join(base_dir, 'commands.json')
-def load_commands():
-    global commands
+# Custom command entries are either a plain string typed into the shell, or a
+# dict with a mode, e.g. {"cmd": "uptime", "mode": "exec"} to run the command
+# on its own exec channel with captured stdout, stderr and exit code, or a macro:
+# {"mode": "macro", "abort": ["[Ee]rror"], "steps": [
+#     {"send": "sudo -i", "expect": ["[Pp]assword:"], "timeout": 10},
+#     {"send": "systemctl restart app", "expect": ["# $"], "abort": ["failed"]}]}
+def command_mode(entry):
+    return entry.get('mode', 'shell') if isinstance(entry, dict) else 'shell'
+
+def command_text(entry):
+    if command_mode(entry) == 'macro':
+        return f"{len(entry.get('steps', []))} step macro"
+    return entry.get('cmd', '') if isinstance(entry, dict) else entry
+
+def make_command_entry(cmd, mode):
+    return {'cmd': cmd, 'mode': mode} if mode != 'shell' else cmd
+
+# Commands come in two layers: an optional read-only team file
+# (settings['team_commands_path']) under the personal file (commands.json, or
+# settings['commands_path'] to share one between instances). Per category the
+# personal commands are laid over the team's; null for a command or a category in
+# the personal file hides the team's, and a personal "reference" replaces theirs.
+# Where the order differs from the team's, the personal file also keeps an "order"
+# list of command names in the category, and a top-level "__order__" list of
+# categories; names not listed keep their place after the listed ones.
+# Both files are re-read when they change on disk, and the notebook is brought up
+# to date one category at a time.
+commands_path = settings.get('commands_path') or os.path.join(base_dir, 'commands.json')
+team_commands_path = settings.get('team_commands_path')
+COMMANDS_CHECK_MS = 3000  # The files are stat()ed this often, and whenever the app gains focus
+commands = {}  # The merged, live model: {category: {'commands': {...}, 'reference': {...}}}
+team_commands = {}  # The team layer as last read
+personal_commands = {}  # The personal layer as last read or written, the base for merging saves
+commands_files = {}  # {path: (mtime_ns, size, sha1)} as last read or written
+category_frames = {}  # {category: its frame in commands_notebook}
+shown_commands = {}  # {category: the data its frame was last built from}
+CATEGORY_ORDER = '__order__'  # Personal file key holding the category order
+
+def ordered(items, order):
+    # items (a dict) with the names in order first, then the rest as they were
+    listed = [name for name in dict.fromkeys(order or []) if name in items]
+    return {name: items[name] for name in listed + [name for name in items if name not in listed]}
+
+def normalize_category(data):
+    # Older files keep a category's commands directly under its name
+    if not isinstance(data, dict):
+        data = {}
+    return {'commands': data.get('commands', data if 'reference' not in data else {}),
+            'reference': data.get('reference', {'text': '', 'images': []})}
+
+def merge_commands(team, personal):
+    merged = {category: normalize_category(data) for category, data in team.items()}
+    for category, data in personal.items():
+        if category == CATEGORY_ORDER:
+            continue
+        if data is None:
+            merged.pop(category, None)
+            continue
+        layer = normalize_category(data)
+        base = merged.get(category, normalize_category({}))
+        category_commands = dict(base['commands'])
+        for name, cmd in layer['commands'].items():
+            if cmd is None:
+                category_commands.pop(name, None)
+            else:
+                category_commands[name] = cmd
+        reference = layer['reference'] if 'reference' in data else base['reference']
+        merged[category] = {'commands': ordered(category_commands, data.get('order')), 'reference': reference}
+    merged = ordered(merged, personal.get(CATEGORY_ORDER))
+    return copy.deepcopy(merged)  # Edits to the live model must not reach the team layer
+
+def personal_layer(merged, team):
+    # What the personal file must hold so that merge_commands(team, it) == merged
+    personal = {}
+    for category, data in merged.items():
+        if category not in team:
+            personal[category] = data
+            continue
+        base = normalize_category(team[category])
+        changed = {name: cmd for name, cmd in data['commands'].items() if base['commands'].get(name) != cmd}
+        changed.update({name: None for name in base['commands'] if name not in data['commands']})
+        if changed or data['reference'] != base['reference']:
+            personal[category] = {'commands': changed}
+            if data['reference'] != base['reference']:
+                personal[category]['reference'] = data['reference']
+    personal.update({category: None for category in team if category not in merged})
+    # Orders are only written where merging wouldn't give them back by itself
+    unordered = merge_commands(team, personal)
+    for category, data in merged.items():
+        if list(unordered[category]['commands']) != list(data['commands']):
+            personal.setdefault(category, {'commands': {}})['order'] = list(data['commands'])
+    if list(unordered) != list(merged):
+        personal[CATEGORY_ORDER] = list(merged)
+    return personal
+
+def read_commands_file(path):
+    # Parsed contents ({} if missing), or None if the file isn't valid JSON (e.g. half written)
     try:
-        with open(commands_path, 'r') as f:
-            commands = json.load(f)
+        with open(path, 'rb') as f:
+            data = f.read()
+        file_stat = os.stat(path)
     except FileNotFoundError:
-        commands = {}  # If file missing, start empty
-    # Ensure structure
-    for cat in commands:
-        commands[cat] = {'commands': commands[cat].get('commands', commands[cat] if isinstance(commands[cat], dict) else {}),
-                         'reference': commands[cat].get('reference', {'text': '', 'images': []})}
-    rebuild_commands_notebook()
+        return {}
+    commands_files[path] = (file_stat.st_mtime_ns, file_stat.st_size, hashlib.sha1(data).hexdigest())
+    try:
+        parsed = json.loads(data)
+    except ValueError:
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+def commands_file_changed(path):
+    # A stat() in the usual case; the content hash is only taken when mtime or size moved,
+    # so saves that didn't change anything (or our own writes) don't trigger a reload
+    try:
+        file_stat = os.stat(path)
+    except OSError:
+        return False
+    known = commands_files.get(path)
+    if known is not None and known[:2] == (file_stat.st_mtime_ns, file_stat.st_size):
+        return False
+    try:
+        with open(path, 'rb') as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+    except OSError:
+        return False
+    if known is not None and known[2] == digest:
+        commands_files[path] = (file_stat.st_mtime_ns, file_stat.st_size, digest)
+        return False
+    return True
+
+def load_commands():
+    global team_commands, personal_commands
+    personal = read_commands_file(commands_path)
+    team = read_commands_file(team_commands_path) if team_commands_path else {}
+    if personal is None or team is None:
+        return  # Mid-write or broken; keep what is shown until the file changes again
+    team_commands = team
+    personal_commands = personal
+    merged = merge_commands(team, personal)
+    # Updated in place, so open dialogs keep editing the live model
+    commands.clear()
+    commands.update(merged)
+    sync_commands_notebook()
+
+def check_commands_files(event=None):
+    if any(commands_file_changed(path) for path in (commands_path, team_commands_path) if path):
+        load_commands()
+    if event is None:
+        root.after(COMMANDS_CHECK_MS, check_commands_files)
+
+def sync_commands_notebook():
+    # Bring the notebook in line with commands: new categories get a tab, removed ones
+    # lose theirs, moved ones are reinserted, and only changed categories touch buttons
+    for category in list(category_frames):
+        if category not in commands:
+            category_frames.pop(category).destroy()
+            shown_commands.pop(category, None)
+    selected = commands_notebook.select()
+    for index, (category, data) in enumerate(commands.items()):
+        frame = category_frames.get(category)
+        if frame is None:
+            frame = tk.Frame(commands_notebook)
+            frame.buttons = []
+            frame.bind("<Configure>", wrap_buttons)
+            category_frames[category] = frame
+            commands_notebook.insert(index if index < commands_notebook.index('end') else 'end', frame, text=category)
+        elif commands_notebook.index(frame) != index:
+            commands_notebook.insert(index, frame)
+        shown = shown_commands.get(category)
+        # Compared with their order too, since == on dicts ignores it
+        same_commands = shown is not None and list(shown['commands'].items()) == list(data['commands'].items())
+        if same_commands and shown == data:
+            continue
+        if not same_commands:
+            # Buttons whose name is unchanged are kept and just get the new command
+            old_buttons = {btn.command_name: btn for btn in frame.buttons}
+            frame.buttons = []
+            for btn_name, cmd in data['commands'].items():
+                btn = old_buttons.pop(btn_name, None) or tk.Button(frame, text=btn_name)
+                btn.config(command=lambda n=btn_name, c=cmd: custom_command_clicked(n, c))
+                btn.command_name = btn_name
+                frame.buttons.append(btn)
+            for btn in old_buttons.values():
+                btn.destroy()
+            layout_buttons(frame, frame.winfo_width())
+        shown_commands[category] = copy.deepcopy(data)
+        if selected and root.nametowidget(selected) is frame:
+            update_reference(None)
 
 def rebuild_commands_notebook():
-    for i in range(commands_notebook.index("end")):
-        commands_notebook.forget(0)
-    for category, data in commands.items():
-        cat_frame = tk.Frame(commands_notebook)
-        cat_frame.pack(fill='both', expand=True)
-        cat_frame.buttons = []
-        for btn_name, cmd in data.get('commands', {}).items():
-            btn = tk.Button(cat_frame, text=btn_name, command=lambda c=cmd: (send_custom_command(c) if auto_send_var.get() else insert_custom_command(c)))
-            cat_frame.buttons.append(btn)
-        commands_notebook.add(cat_frame, text=category)
-        cat_frame.bind("<Configure>", wrap_buttons)
-    commands_notebook.bind("<<NotebookTabChanged>>", update_reference)
+    for frame in category_frames.values():
+        frame.destroy()
+    category_frames.clear()
+    shown_commands.clear()
+    sync_commands_notebook()
 
 def wrap_buttons(event):
-    frame = event.widget
-    width = event.width
+    layout_buttons(event.widget, event.width)
+
+def layout_buttons(frame, width):
     row = 0
     col = 0
     current_x = 0
@@ -308,6 +1412,9 @@ def update_reference(event):
     selected_tab = commands_notebook.select()
     if not selected_tab:
         return
+    timing = metrics.enabled
+    if timing:
+        render_start = time.perf_counter()
     category = commands_notebook.tab(selected_tab, "text")
     reference = commands.get(category, {}).get('reference', {'text': '', 'images': []})
     reference_text.delete('1.0', tk.END)
@@ -337,13 +1444,75 @@ def update_reference(event):
             reference_images.append(photo)  # Keep reference
         except Exception as e:
             reference_text.insert(tk.END, f"[Error loading image: {str(e)}]\n")
+    if timing:
+        metrics.observe('update_reference_render', time.perf_counter() - render_start)
 
+commands_notebook.bind("<<NotebookTabChanged>>", update_reference)
 load_commands()
+root.after(COMMANDS_CHECK_MS, check_commands_files)
+root.bind('<FocusIn>', check_commands_files, add='+')  # Edits made in another window show up on return
 
 # Dictionary to map tab frames to SSHSession objects, entries, and histories
 sessions = {}
 entries = {}
 histories = {}  # {frame: {'list': [], 'index': -1}}
+results_panels = {}  # {frame: Treeview of exec-channel results}
+highlight_streams = {}  # {frame: HighlightStream}
+sftp_panels = {}  # {frame: SFTP panel Toplevel}
+connecting = {}  # {frame: True} for tabs still connecting in the background
+connected_queue = queue.Queue()  # (frame, session, error) from background connects
+connect_slots = threading.BoundedSemaphore(settings.get('connect_limit', 8))  # Concurrent background connects
+port_forwards = {}  # {frame: [session_worker.Forward]}, started from the profile's "forwards"
+forward_pump = session_worker.ForwardPump(settings.get('forward_buffer_kb', 64) * 1024)  # Pumps every forward
+
+# Load highlight and alert rules for session output
+highlights_path = os.path.join(base_dir, 'highlights.json')
+try:
+    with open(highlights_path, 'r') as f:
+        highlight_rules = HighlightRules(json.load(f))
+except FileNotFoundError:
+    highlight_rules = HighlightRules([])
+highlight_bold_font = font.Font(font='TkFixedFont')
+highlight_bold_font.configure(weight='bold')
+last_alert_times = {}  # {rule pattern: time of last alert}, to throttle alert floods
+ALERT_THROTTLE = 5  # Seconds between alerts for the same rule
+
+def configure_highlight_tags(text_widget):
+    # (Re)create one tag per rule on an output widget
+    for tag in text_widget.tag_names():
+        if tag.startswith('hl'):
+            text_widget.tag_delete(tag)
+    for i, rule in enumerate(highlight_rules.rules):
+        text_widget.tag_config(f'hl{i}', foreground=rule.get('fg', ''), background=rule.get('bg', ''),
+                               font=highlight_bold_font if rule.get('bold') else '')
+
+def set_highlight_rules(rules):
+    global highlight_rules
+    highlight_rules = HighlightRules(rules)
+    with open(highlights_path, 'w') as f:
+        json.dump(rules, f)
+    for frame, session in sessions.items():
+        configure_highlight_tags(session.output_text)
+        highlight_streams[frame].reset()
+
+def show_alert(session, rule, matched):
+    # Desktop notification: a small always-on-top toast in the screen corner
+    now = time.monotonic()
+    if now - last_alert_times.get(rule['pattern'], -ALERT_THROTTLE) < ALERT_THROTTLE:
+        return
+    last_alert_times[rule['pattern']] = now
+    root.bell()
+    toast = tk.Toplevel(root)
+    toast.overrideredirect(True)
+    toast.attributes('-topmost', True)
+    tk.Label(toast, text=f"{session.user}@{session.host}", font=("Arial", 10, "bold")).pack(anchor='w', padx=10, pady=(8, 0))
+    tk.Label(toast, text=matched[:200], wraplength=300, justify='left').pack(anchor='w', padx=10, pady=(0, 8))
+    toast.update_idletasks()
+    x = toast.winfo_screenwidth() - toast.winfo_reqwidth() - 20
+    y = toast.winfo_screenheight() - toast.winfo_reqheight() - 60
+    toast.geometry(f"+{x}+{y}")
+    toast.bind('<Button-1>', lambda e: toast.destroy())
+    toast.after(6000, toast.destroy)
 
 def insert_custom_command(cmd):
     # Get the current active tab and insert command into its input box
@@ -356,7 +1525,14 @@ def insert_custom_command(cmd):
         ent.delete(0, tk.END)
         ent.insert(0, cmd)
 
-def send_custom_command(cmd):
+def custom_command_clicked(name, entry):
+    # Macros always run; other commands are sent or inserted depending on auto-send
+    if command_mode(entry) == 'macro' or auto_send_var.get():
+        send_custom_command(entry, name)
+    else:
+        insert_custom_command(command_text(entry))
+
+def send_custom_command(entry, name=None):
     # Get the current active tab and send command to its session
     current_tab = session_notebook.select()
     if not current_tab:
@@ -364,25 +1540,128 @@ def send_custom_command(cmd):
     frame = root.nametowidget(current_tab)
     session = sessions.get(frame)
     if session:
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        session.output_text.insert(tk.END, f"[{timestamp}] Sent: {cmd}\n")
-        session.output_text.see(tk.END)
+        cmd = command_text(entry)
+        if command_mode(entry) == 'macro':
+            echo_line(session, f"Macro: {name}")
+            session.run_macro(name, entry)
+            return
+        if command_mode(entry) == 'exec':
+            echo_line(session, f"Exec: {cmd}")
+            session.run_exec(cmd)
+            return
+        echo_line(session, f"Sent: {cmd}")
         session.send(cmd)
 
+def echo_line(session, line):
+    # Show a timestamped note in the session output and mirror it to the log
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    session.output_text.insert(tk.END, f"[{timestamp}] {line}\n")
+    session.output_text.follow = True  # Sending resumes auto-scroll after a restored scroll position
+    session.output_text.see(tk.END)
+    session.logfile.write(f"[{timestamp}] {line}\n")
+    session.logfile.flush()
+
+def show_exec_result(frame, session, result):
+    # Add a finished exec-channel command to the tab's results panel
+    tree = results_panels.get(frame)
+    if tree is None:
+        return
+    if not tree.winfo_manager():
+        tree.pack(fill='x', before=tree.input_frame)
+    status = result['error'] or str(result['exit_code'])
+    iid = tree.insert('', 0, text=result['cmd'],
+                      values=(status, f"{result['duration']:.2f}s", result['started'].strftime('%H:%M:%S')))
+    tree.results[iid] = result
+    # Stamped with the time it is written, so log timestamps never go backwards (LogIndex.find_time bisects them)
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    summary = (f"[{timestamp}] Exec finished: {result['cmd']} (started {result['started'].strftime('%H:%M:%S')}, "
+               f"exit {status}, {result['duration']:.2f}s)\n")
+    session.output_text.insert(tk.END, summary)
+    session.output_text.see(tk.END)
+    session.logfile.write(summary + result['stdout'] + result['stderr'])
+    session.logfile.flush()
+
+def open_exec_result(tree):
+    # Show the captured stdout and stderr of the selected exec result
+    selected = tree.selection()
+    if not selected:
+        return
+    result = tree.results[selected[0]]
+    win = tk.Toplevel(root)
+    win.title(f"Exec: {result['cmd']}")
+    win.geometry("700x400")
+    status = result['error'] or result['exit_code']
+    tk.Label(win, text=f"Exit: {status}    Duration: {result['duration']:.3f}s    Started: {result['started'].strftime('%Y-%m-%d %H:%M:%S')}").pack(anchor='w')
+    out_text = Text(win, wrap='char')
+    out_text.pack(fill='both', expand=True)
+    out_text.tag_config('stderr', foreground='red')
+    out_text.insert(tk.END, result['stdout'])
+    out_text.insert(tk.END, result['stderr'], 'stderr')
+
 # Function to process output queues for all sessions (called repeatedly)
 def process_queues():
-    for session in sessions.values():
+    try:
+        drain_queues()
+    finally:
+        root.after(100, process_queues)  # Schedule next check, even if a handler raised
+
+def drain_queues():
+    timing = metrics.enabled
+    if timing:
+        tick_start = time.perf_counter()
+        backlog = 0
+    # Register sessions whose background connect finished
+    try:
+        while True:
+            frame, session, error = connected_queue.get_nowait()
+            if connecting.pop(frame, None) is None:
+                if session:
+                    session.close()  # The tab was closed while connecting
+                continue
+            finish_session(frame, session, error)
+    except queue.Empty:
+        pass
+    for frame, session in sessions.items():
+        tag_ranges = {}  # {tag: [start, end, start, end, ...]} applied in one call per tag
+        if timing:
+            depth = session.output_queue.qsize()
+            backlog += depth
+            metrics.gauge('output_queue_depth', depth, session.label)
         try:
             while True:
                 output = session.output_queue.get_nowait()
                 timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                session.output_text.insert(tk.END, f"[{timestamp}] Received:\n{output}")
-                session.output_text.see(tk.END)  # Auto-scroll to end
-                session.logfile.write(output)  # Auto-save to log
+                if highlight_rules.regex is None:
+                    session.output_text.insert(tk.END, f"[{timestamp}] Received:\n{output}")
+                else:
+                    session.output_text.insert(tk.END, f"[{timestamp}] Received:\n")
+                    start = session.output_text.index('end-1c')
+                    session.output_text.insert(tk.END, output)
+                    ranges, alerts = highlight_streams[frame].feed(highlight_rules, output, start)
+                    for tag, a, b in ranges:
+                        tag_ranges.setdefault(tag, []).extend((a, b))
+                    for rule, matched in alerts:
+                        show_alert(session, rule, matched)
+                if session.output_text.follow:
+                    session.output_text.see(tk.END)  # Auto-scroll to end
+                if timing:
+                    log_start = time.perf_counter()
+                session.logfile.write(f"[{timestamp}] Received:\n{output}")  # Auto-save to log
                 session.logfile.flush()
+                if timing:
+                    metrics.observe('log_write', time.perf_counter() - log_start, session.label)
+        except queue.Empty:
+            pass
+        for tag, indices in tag_ranges.items():
+            session.output_text.tag_add(tag, *indices)
+        try:
+            while True:
+                show_exec_result(frame, session, session.exec_queue.get_nowait())
         except queue.Empty:
             pass
-    root.after(100, process_queues)  # Schedule next check
+    if timing:
+        metrics.observe('process_queues_tick', time.perf_counter() - tick_start)
+        metrics.gauge('process_queues_backlog', backlog)
 
 # Start processing queues
 process_queues()
@@ -396,6 +1675,129 @@ try:
 except FileNotFoundError:
     pass
 
+# Per-profile connection settings kept in connections.json next to host/user/password:
+#   "auth": "password" (default), "key" or "agent"; "key_file": private key for "key"
+#   link tuning: "compression": true, "ciphers" / "kex": preferred algorithm names,
+#   "window_size" / "max_packet_size": channel sizes in bytes, "keepalive": seconds
+#   "jump": name of a saved connection to tunnel through, or a list of names for a chain
+#   "forwards": port forwards started with the session, e.g. ["L 5432:db:5432", "R 9000:localhost:3000"]
+PROFILE_OPTIONS = ('auth', 'key_file', 'compression', 'ciphers', 'kex', 'window_size', 'max_packet_size', 'keepalive',
+                   'jump', 'forwards')
+
+def profile_options(conn):
+    return {key: conn[key] for key in PROFILE_OPTIONS if conn.get(key)}
+
+def jump_chain(conn, seen=()):
+    # The hops to reach conn: each named jump host, preceded by its own jump chain
+    chain = []
+    for name in as_list(conn.get('jump')):
+        hop = next((saved for saved in saved_connections if saved.get('name') == name), None)
+        if hop is None:
+            raise paramiko.SSHException(f"Unknown jump host: {name}")
+        if name in seen:
+            raise paramiko.SSHException(f"Jump host loop through {name}")
+        chain += jump_chain(hop, seen + (name,))
+        chain.append({'host': hop['host'], 'port': hop.get('port', 22), 'user': hop['user'],
+                      'password': hop.get('password', ''),
+                      'options': {key: value for key, value in profile_options(hop).items() if key != 'jump'}})
+    return chain
+
+def connect_options(options):
+    # Profile options as session_worker takes them, with jump host names resolved to hops
+    if not options.get('jump'):
+        return options
+    return dict(options, jump=jump_chain(options))
+
+def add_auth_fields(dialog, conn, row):
+    # Auth method and key file rows for the connection dialogs; returns a function
+    # that copies the chosen values into a connection dict
+    tk.Label(dialog, text="Auth:").grid(row=row, column=0, padx=5, pady=5)
+    auth_box = ttk.Combobox(dialog, values=('password', 'key', 'agent'), state='readonly', width=17)
+    auth_box.grid(row=row, column=1, padx=5, pady=5)
+    auth_box.set(conn.get('auth', 'password'))
+    tk.Label(dialog, text="Key File:").grid(row=row + 1, column=0, padx=5, pady=5)
+    key_entry = tk.Entry(dialog)
+    key_entry.grid(row=row + 1, column=1, padx=5, pady=5)
+    key_entry.insert(0, conn.get('key_file', ''))
+
+    def browse():
+        path = filedialog.askopenfilename(parent=dialog, title="Private Key")
+        if path:
+            key_entry.delete(0, tk.END)
+            key_entry.insert(0, path)
+    tk.Button(dialog, text="Browse", command=browse).grid(row=row + 1, column=2, padx=5, pady=5)
+    tk.Label(dialog, text="Jump Via:").grid(row=row + 2, column=0, padx=5, pady=5)
+    jump_entry = tk.Entry(dialog)  # Saved connection names, comma-separated for a chain
+    jump_entry.grid(row=row + 2, column=1, padx=5, pady=5)
+    jump_entry.insert(0, ', '.join(as_list(conn.get('jump'))))
+
+    def apply(target):
+        target['auth'] = auth_box.get()
+        if key_entry.get():
+            target['key_file'] = key_entry.get()
+        else:
+            target.pop('key_file', None)
+        jump = [name.strip() for name in jump_entry.get().split(',') if name.strip()]
+        if len(jump) > 1:
+            target['jump'] = jump
+        elif jump:
+            target['jump'] = jump[0]
+        else:
+            target.pop('jump', None)
+    return apply
+
+def add_link_fields(dialog, conn, row):
+    # Link tuning rows (see PROFILE_OPTIONS); blank fields keep paramiko's defaults.
+    # Returns a function that copies the values into a connection dict
+    compression_var = tk.BooleanVar(value=bool(conn.get('compression')))
+    tk.Checkbutton(dialog, text="Compression", variable=compression_var).grid(row=row, column=0, columnspan=2, pady=5)
+    fields = {}
+    for offset, (key, label, value) in enumerate((
+            ('ciphers', "Ciphers:", ', '.join(conn.get('ciphers', []))),
+            ('kex', "Key Exchange:", ', '.join(conn.get('kex', []))),
+            ('window_size', "Window (KB):", conn['window_size'] // 1024 if conn.get('window_size') else ''),
+            ('max_packet_size', "Max Packet (KB):", conn['max_packet_size'] // 1024 if conn.get('max_packet_size') else ''),
+            ('keepalive', "Keepalive (s):", conn.get('keepalive', '')),
+            ('forwards', "Forwards:", '; '.join(conn.get('forwards', [])))), 1):
+        tk.Label(dialog, text=label).grid(row=row + offset, column=0, padx=5, pady=5)
+        fields[key] = tk.Entry(dialog)
+        fields[key].grid(row=row + offset, column=1, padx=5, pady=5)
+        fields[key].insert(0, str(value))
+
+    def apply(target):
+        values = {'compression': compression_var.get()}
+        for key in ('ciphers', 'kex'):
+            values[key] = [name.strip() for name in fields[key].get().split(',') if name.strip()]
+        values['forwards'] = []
+        for spec in fields['forwards'].get().split(';'):
+            try:
+                session_worker.parse_forward(spec)
+                values['forwards'].append(spec.strip())
+            except ValueError as e:
+                if spec.strip():
+                    messagebox.showwarning("Forwards", f"{str(e)}; skipped.", parent=dialog)
+        for key, scale in (('window_size', 1024), ('max_packet_size', 1024), ('keepalive', 1)):
+            text = fields[key].get().strip()
+            values[key] = int(text) * scale if text.isdigit() else None
+        for key, value in values.items():
+            if value:
+                target[key] = value
+            else:
+                target.pop(key, None)
+    return apply
+
+def format_link_report(report):
+    lines = [f"Round trip: {report['rtt'] * 1000:.1f} ms", ""]
+    for run in report['runs']:
+        if run.get('error'):
+            lines.append(f"{run['name']:<14} failed: {run['error']}")
+        else:
+            lines.append(f"{run['name']:<14} {run['mb_per_s']:7.2f} MB/s  ({run['cipher']}, {run['compression']}, "
+                         f"kex {run['phases']['kex'] * 1000:.0f} ms)")
+    lines += ["", "Suggested settings:"]
+    lines += [f"  {key}: {value}" for key, value in report['suggested'].items() if key in PROFILE_OPTIONS]
+    return '\n'.join(lines)
+
 # Function to add a new SSH session tab
 def add_new_session(host=None, user=None, port=None, name=None, passw=None):
     if passw is None:
@@ -404,7 +1806,6 @@ def add_new_session(host=None, user=None, port=None, name=None, passw=None):
         dialog.title("New Connection")
         dialog.geometry("300x300")
         dialog.grab_set()  # Make modal
-        apply_theme(dialog, current_theme)
 
         tk.Label(dialog, text="Name (optional):").grid(row=0, column=0, padx=5, pady=5)
         name_entry = tk.Entry(dialog)
@@ -468,7 +1869,11 @@ def add_new_session(host=None, user=None, port=None, name=None, passw=None):
     else:
         create_session(host, port or 22, user, passw, name)
 
-def create_session(host, port, user, passw, name=None):
+def create_session(host, port, user, passw, name=None, background=False, scrollback=None, options=None):
+    # With background=True the tab appears at once and connects in a worker thread
+    # (at most connect_slots at a time); scrollback=(log path, lines from end) preloads
+    # the tail of an earlier log, as when restoring a workspace; options are the saved
+    # profile's connection settings
     # Create logs directory if needed
     logs_dir = os.path.join(base_dir, 'logs')
     os.makedirs(logs_dir, exist_ok=True)
@@ -482,6 +1887,7 @@ def create_session(host, port, user, passw, name=None):
     scrollbar.pack(side='right', fill='y')
     output_text = tk.Text(frame, wrap='char', yscrollcommand=scrollbar.set)
     output_text.pack(fill='both', expand=True)
+    output_text.follow = True  # Auto-scroll to new output
     scrollbar.config(command=output_text.yview)
 
     # Input and buttons frame
@@ -499,15 +1905,32 @@ def create_session(host, port, user, passw, name=None):
     buttons_frame = tk.Frame(input_frame)
     buttons_frame.pack(fill='x')
 
-    def send_command(ent, frm):
+    # Results panel for exec-channel commands, packed above the input on first result
+    results_tree = ttk.Treeview(frame, columns=('exit', 'duration', 'started'), height=4)
+    results_tree.heading('#0', text='Exec Command')
+    results_tree.heading('exit', text='Exit')
+    results_tree.heading('duration', text='Duration')
+    results_tree.heading('started', text='Started')
+    results_tree.column('exit', width=80, stretch=False)
+    results_tree.column('duration', width=80, stretch=False)
+    results_tree.column('started', width=80, stretch=False)
+    results_tree.results = {}
+    results_tree.input_frame = input_frame
+    results_tree.bind('<Double-1>', lambda e: open_exec_result(results_tree))
+
+    def send_command(ent, frm, mode='shell'):
         cmd = ent.get()
         if not cmd:
             return
-        session = sessions[frm]
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        output_text.insert(tk.END, f"[{timestamp}] Sent: {cmd}\n")
-        output_text.see(tk.END)
-        session.send(cmd)  # Reconnect if needed and send
+        session = sessions.get(frm)
+        if session is None:
+            return  # Still connecting, or the connection failed
+        if mode == 'exec':
+            echo_line(session, f"Exec: {cmd}")
+            session.run_exec(cmd)  # Runs on its own channel, result goes to the panel
+        else:
+            echo_line(session, f"Sent: {cmd}")
+            session.send(cmd)  # Reconnect if needed and send
         # Add to history
         hist = histories[frm]
         hist['list'].append(cmd)
@@ -518,13 +1941,22 @@ def create_session(host, port, user, passw, name=None):
     send_btn = tk.Button(buttons_frame, text="Send", command=lambda: send_command(entry, frame))
     send_btn.pack(side='left')
 
+    # Exec button runs the input on a separate exec channel
+    exec_btn = tk.Button(buttons_frame, text="Exec", command=lambda: send_command(entry, frame, 'exec'))
+    exec_btn.pack(side='left')
+
     # Interrupt (Ctrl+C) button
-    interrupt_btn = tk.Button(buttons_frame, text="Interrupt (Ctrl+C)", bg=themes[current_theme]['interrupt_bg'], fg=themes[current_theme]['interrupt_fg'],
-                              command=lambda: sessions[frame].interrupt())
+    interrupt_btn = tk.Button(buttons_frame, name='interrupt', text="Interrupt (Ctrl+C)",
+                              command=lambda: frame in sessions and sessions[frame].interrupt())
     interrupt_btn.pack(side='left')
 
     # Clear output button
-    clear_btn = tk.Button(buttons_frame, text="Clear Output", command=lambda: output_text.delete('1.0', tk.END))
+    def clear_output():
+        output_text.delete('1.0', tk.END)
+        if frame in highlight_streams:
+            highlight_streams[frame].reset()
+
+    clear_btn = tk.Button(buttons_frame, text="Clear Output", command=clear_output)
     clear_btn.pack(side='left')
 
     # Manual save log button
@@ -537,6 +1969,10 @@ def create_session(host, port, user, passw, name=None):
             with open(file, 'w') as f:
                 f.write(text_widget.get('1.0', tk.END))
 
+    # SFTP panel button
+    sftp_btn = tk.Button(buttons_frame, text="SFTP", command=lambda: open_sftp_panel(frame))
+    sftp_btn.pack(side='left')
+
     # Close tab button
     close_btn = tk.Button(buttons_frame, text="Close", command=lambda: close_session(frame))
     close_btn.pack(side='left')
@@ -544,17 +1980,64 @@ def create_session(host, port, user, passw, name=None):
     # Set tab title
     tab_title = name if name else f"{user}@{host}:{port}"
     session_notebook.add(frame, text=tab_title)
+    frame.connection = dict(options or {}, name=name, host=host, port=port, user=user, password=passw)
+    frame.log_path = log_path
+    frame.output_text = output_text
+    frame.entry = entry
+    frame.results_tree = results_tree
+    if scrollback is not None:
+        restore_scrollback(output_text, *scrollback)
 
     # Create and store session, entry, history
-    try:
-        session = SSHSession(host, port, user, passw, output_text, log_path)
-        sessions[frame] = session
-        entries[frame] = entry
-        histories[frame] = {'list': [], 'index': -1}
-        output_text.insert(tk.END, "Connected.\n")
-    except Exception as e:
-        output_text.insert(tk.END, f"Connection failed: {str(e)}\n")
-    apply_theme(frame, current_theme)
+    session_class = WorkerSession if worker_process_count() > 0 else SSHSession
+    if background:
+        output_text.insert(tk.END, "Connecting...\n")
+        connecting[frame] = True
+        threading.Thread(target=connect_in_background, daemon=True,
+                         args=(frame, session_class, host, port, user, passw, output_text, log_path, options)).start()
+    else:
+        try:
+            finish_session(frame, session_class(host, port, user, passw, output_text, log_path, options), None)
+        except Exception as e:
+            finish_session(frame, None, e)
+    return frame
+
+def connect_in_background(frame, session_class, *args):
+    with connect_slots:
+        if frame not in connecting:
+            return  # Tab closed while waiting for a slot
+        try:
+            session, error = session_class(*args), None
+        except Exception as e:
+            session, error = None, e
+    connected_queue.put((frame, session, error))
+
+def finish_session(frame, session, error):
+    # Register a connected session with its tab; always runs on the Tk thread
+    if error is not None:
+        frame.output_text.insert(tk.END, f"Connection failed: {str(error)}\n")
+        return
+    sessions[frame] = session
+    entries[frame] = frame.entry
+    histories[frame] = {'list': [], 'index': -1}
+    results_panels[frame] = frame.results_tree
+    highlight_streams[frame] = HighlightStream()
+    configure_highlight_tags(frame.output_text)
+    frame.output_text.insert(tk.END, f"Connected in {sum(session.phases.values()):.2f} s ({describe_phases(session.phases)}).\n")
+    start_port_forwards(frame, session)
+    if frame.output_text.follow:
+        frame.output_text.see(tk.END)
+
+def start_port_forwards(frame, session):
+    # Forwards run over the session's transport (a side connection for worker sessions)
+    for spec in frame.connection.get('forwards', []):
+        try:
+            forward = forward_pump.add(spec, session.transport)
+        except (ValueError, OSError) as e:
+            frame.output_text.insert(tk.END, f"Forward {spec} not started: {str(e)}\n")
+            continue
+        port_forwards.setdefault(frame, []).append(forward)
+        frame.output_text.insert(tk.END, f"Forwarding {spec}\n")
 
 def history_up(ent, frm):
     hist = histories[frm]
@@ -575,9 +2058,19 @@ def history_down(ent, frm):
 
 def close_session(frame):
     # Close session and remove tab
+    connecting.pop(frame, None)
     session = sessions.pop(frame, None)
     entries.pop(frame, None)
     histories.pop(frame, None)
+    results_panels.pop(frame, None)
+    highlight_streams.pop(frame, None)
+    if session:
+        metrics.forget(session.label)
+    panel = sftp_panels.pop(frame, None)
+    if panel is not None and panel.winfo_exists():
+        panel.close()
+    for forward in port_forwards.pop(frame, []):
+        forward_pump.remove(forward)
     if session:
         session.close()
     session_notebook.forget(frame)
@@ -610,7 +2103,6 @@ def connect_to_saved():
     dialog = tk.Toplevel(root)
     dialog.title("Connect to Saved")
     dialog.grab_set()
-    apply_theme(dialog, current_theme)
     tk.Label(dialog, text="Select Connection:").pack(padx=10, pady=5)
     choices = [c.get('name', f"{c['user']}@{c['host']}:{c.get('port', 22)}") for c in saved_connections]
     combobox = ttk.Combobox(dialog, values=choices, state="readonly")
@@ -621,11 +2113,140 @@ def connect_to_saved():
         if idx != -1:
             conn = saved_connections[idx]
             dialog.destroy()
-            create_session(conn['host'], conn.get('port', 22), conn['user'], conn['password'], conn.get('name'))
+            create_session(conn['host'], conn.get('port', 22), conn['user'], conn['password'], conn.get('name'),
+                           options=profile_options(conn))
     tk.Button(dialog, text="Connect", command=connect).pack(pady=10)
     dialog.protocol("WM_DELETE_WINDOW", dialog.destroy)
     root.wait_window(dialog)
 
+# Workspace: the open tabs in order (tab name, connection, log and scroll position),
+# the selected tab and the selected command category. Saved on exit and restored
+# on startup, when every tab reappears at once and reconnects in the background.
+# Passwords are never written: a tab opened from a saved connection records its
+# name and takes the password from connections.json, and for any other tab the
+# password is asked for on restore.
+workspace_path = os.path.join(base_dir, 'workspace.json')
+WORKSPACE_SCROLLBACK = 256 * 1024  # Bytes of each tab's previous log shown again on restore
+
+def saved_profile(connection):
+    # The saved connection a tab was opened from, if it still exists
+    return next((conn for conn in saved_connections
+                 if connection.get('name') and conn.get('name') == connection['name']
+                 and (conn['host'], conn.get('port', 22), conn['user']) ==
+                 (connection['host'], connection.get('port', 22), connection['user'])), None)
+
+def save_workspace(quiet=False):
+    tabs = []
+    selected = session_notebook.select()
+    for tab in session_notebook.tabs():
+        frame = root.nametowidget(tab)
+        if not hasattr(frame, 'connection'):
+            continue
+        # Scroll position as lines from the end, so it survives the restored log being trimmed
+        top, bottom = frame.output_text.yview()
+        lines = int(frame.output_text.index('end-1c').split('.')[0])
+        lines_from_end = 0 if bottom >= 1.0 else lines - int(top * lines)
+        connection = {key: value for key, value in frame.connection.items() if key != 'password'}
+        profile = saved_profile(frame.connection)
+        if profile is not None:
+            connection['profile'] = profile['name']
+        tabs.append(dict(connection, title=session_notebook.tab(tab, 'text'), log=frame.log_path,
+                         lines_from_end=lines_from_end, selected=(tab == selected)))
+    category = commands_notebook.select()
+    workspace = {'tabs': tabs, 'category': commands_notebook.tab(category, 'text') if category else None}
+    try:
+        with open(workspace_path + '.tmp', 'w') as f:
+            json.dump(workspace, f, indent=1)
+        os.replace(workspace_path + '.tmp', workspace_path)
+    except OSError as e:
+        if not quiet:
+            messagebox.showerror("Workspace", f"Cannot save workspace: {str(e)}")
+        return
+    if not quiet:
+        messagebox.showinfo("Workspace", f"Saved {len(tabs)} tabs.")
+
+def restore_workspace():
+    try:
+        with open(workspace_path, 'r') as f:
+            workspace = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return
+    for tab in commands_notebook.tabs():
+        if commands_notebook.tab(tab, 'text') == workspace.get('category'):
+            commands_notebook.select(tab)
+    # The selected tab connects first; the rest queue for connect_slots in tab order
+    saved = workspace.get('tabs', [])
+    order = sorted(range(len(saved)), key=lambda i: not saved[i].get('selected'))
+    # Tabs already open (e.g. restoring again from the File menu) aren't opened twice
+    open_tabs = {}  # {(host, port, user, title): number of such tabs open}
+    for tab_id in session_notebook.tabs():
+        frame = root.nametowidget(tab_id)
+        if hasattr(frame, 'connection'):
+            key = (frame.connection['host'], frame.connection.get('port', 22), frame.connection['user'],
+                   session_notebook.tab(tab_id, 'text'))
+            open_tabs[key] = open_tabs.get(key, 0) + 1
+    frames = {}
+    asked = {}  # {(host, port, user): password}, asked once for tabs sharing a login
+    for i in order:
+        tab = saved[i]
+        key = (tab['host'], tab.get('port', 22), tab['user'], tab.get('title'))
+        if open_tabs.get(key):
+            open_tabs[key] -= 1
+            continue
+        conn = next((conn for conn in saved_connections if conn.get('name') == tab.get('profile')), None)
+        if conn is None:
+            conn = tab
+            if 'password' not in tab and tab.get('auth', 'password') == 'password':
+                login = (tab['host'], tab.get('port', 22), tab['user'])
+                if login not in asked:
+                    asked[login] = simpledialog.askstring(
+                        "Restore Workspace", f"Password for {tab['user']}@{tab['host']}:{tab.get('port', 22)}:",
+                        show='*', parent=root)
+                if asked[login] is None:
+                    continue  # Cancelled; the tab is not restored
+                conn = dict(tab, password=asked[login])
+        frames[i] = create_session(conn['host'], conn.get('port', 22), conn['user'], conn.get('password', ''),
+                                   conn.get('name'), background=True,
+                                   scrollback=(tab.get('log'), tab.get('lines_from_end', 0)),
+                                   options=profile_options(conn))
+        session_notebook.tab(frames[i], text=tab.get('title') or session_notebook.tab(frames[i], 'text'))
+    for i in sorted(frames):
+        session_notebook.insert('end', frames[i])  # Back into saved order
+        if saved[i].get('selected'):
+            session_notebook.select(frames[i])
+
+def restore_scrollback(output_text, log_path, lines_from_end):
+    # Show the tail of a tab's previous log, scrolled to where it was left
+    if not log_path:
+        return
+    try:
+        with open(log_path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(max(0, size - WORKSPACE_SCROLLBACK))
+            data = f.read()
+    except OSError:
+        return
+    if size > WORKSPACE_SCROLLBACK:
+        data = data[data.find(b'\n') + 1:]  # Start on a whole line
+    output_text.insert(tk.END, data.decode('utf-8', errors='replace'))
+    if lines_from_end:
+        lines = int(output_text.index('end-1c').split('.')[0])
+        output_text.yview(f"{max(1, lines - lines_from_end)}.0")
+        output_text.follow = False  # Until the user sends something
+    else:
+        output_text.see(tk.END)
+
+def set_restore_workspace():
+    settings['restore_workspace'] = restore_workspace_var.get()
+    save_settings()
+
+def exit_app():
+    if restore_workspace_var.get():
+        save_workspace(quiet=True)
+    command_scheduler.stop()
+    root.quit()
+
 def manage_saved_connections():
     if not saved_connections:
         messagebox.showwarning("No Saved", "No saved connections to manage.")
@@ -633,7 +2254,6 @@ def manage_saved_connections():
     manage_win = tk.Toplevel(root)
     manage_win.title("Manage Saved Connections")
     manage_win.geometry("400x300")
-    apply_theme(manage_win, current_theme)
 
     listbox = tk.Listbox(manage_win)
     listbox.pack(fill='both', expand=True)
@@ -656,7 +2276,6 @@ def manage_saved_connections():
             dialog = tk.Toplevel(manage_win)
             dialog.title("Edit Connection")
             dialog.grab_set()
-            apply_theme(dialog, current_theme)
 
             tk.Label(dialog, text="Host:").grid(row=0, column=0, padx=5, pady=5)
             host_entry = tk.Entry(dialog)
@@ -682,6 +2301,8 @@ def manage_saved_connections():
             passw_entry = tk.Entry(dialog, show='*')
             passw_entry.grid(row=4, column=1, padx=5, pady=5)
             passw_entry.insert(0, conn['password'])
+            apply_auth = add_auth_fields(dialog, conn, 5)
+            apply_link = add_link_fields(dialog, conn, 8)
 
             def save_edit():
                 saved_connections[idx]['host'] = host_entry.get()
@@ -689,12 +2310,14 @@ def manage_saved_connections():
                 saved_connections[idx]['user'] = user_entry.get()
                 saved_connections[idx]['name'] = name_entry.get()
                 saved_connections[idx]['password'] = passw_entry.get()
+                apply_auth(saved_connections[idx])
+                apply_link(saved_connections[idx])
                 with open(connections_path, 'w') as f:
                     json.dump(saved_connections, f)
                 refresh_list()
                 dialog.destroy()
 
-            tk.Button(dialog, text="Save", command=save_edit).grid(row=5, column=0, columnspan=2, pady=10)
+            tk.Button(dialog, text="Save", command=save_edit).grid(row=15, column=0, columnspan=2, pady=10)
             dialog.protocol("WM_DELETE_WINDOW", dialog.destroy)
 
     tk.Button(btn_frame, text="Edit Selected", command=edit_selected).pack(side='left')
@@ -708,7 +2331,6 @@ def manage_saved_connections():
             dialog = tk.Toplevel(manage_win)
             dialog.title("Copy Connection")
             dialog.grab_set()
-            apply_theme(dialog, current_theme)
 
             tk.Label(dialog, text="Host:").grid(row=0, column=0, padx=5, pady=5)
             host_entry = tk.Entry(dialog)
@@ -734,22 +2356,26 @@ def manage_saved_connections():
             passw_entry = tk.Entry(dialog, show='*')
             passw_entry.grid(row=4, column=1, padx=5, pady=5)
             passw_entry.insert(0, conn['password'])
+            apply_auth = add_auth_fields(dialog, conn, 5)
+            apply_link = add_link_fields(dialog, conn, 8)
 
             def save_copy():
-                new_conn = {
+                new_conn = dict(conn, **{
                     'host': host_entry.get(),
                     'port': int(port_entry.get()),
                     'user': user_entry.get(),
                     'name': name_entry.get(),
                     'password': passw_entry.get()
-                }
+                })
+                apply_auth(new_conn)
+                apply_link(new_conn)
                 saved_connections.append(new_conn)
                 with open(connections_path, 'w') as f:
                     json.dump(saved_connections, f)
                 refresh_list()
                 dialog.destroy()
 
-            tk.Button(dialog, text="Save Copy", command=save_copy).grid(row=5, column=0, columnspan=2, pady=10)
+            tk.Button(dialog, text="Save Copy", command=save_copy).grid(row=15, column=0, columnspan=2, pady=10)
             dialog.protocol("WM_DELETE_WINDOW", dialog.destroy)
 
     tk.Button(btn_frame, text="Copy Selected", command=copy_selected).pack(side='left')
@@ -792,16 +2418,74 @@ def manage_saved_connections():
 
     tk.Button(btn_frame, text="Move Down", command=move_down).pack(side='left')
 
+    def measure_selected():
+        # Probe the link on fresh connections in a thread; results can be applied to the profile
+        selected = listbox.curselection()
+        if not selected:
+            return
+        idx = selected[0]
+        conn = saved_connections[idx]
+        window = tk.Toplevel(manage_win)
+        window.title(f"Measure Link - {conn.get('name') or conn['host']}")
+        report_text = tk.Text(window, width=80, height=14)
+        report_text.pack(fill='both', expand=True)
+        report_text.insert(tk.END, "Measuring round trip...\n")
+        apply_btn = tk.Button(window, text="Apply Suggested", state='disabled')
+        apply_btn.pack(pady=5)
+        updates = queue.Queue()
+
+        def probe():
+            try:
+                report = session_worker.measure_link(conn['host'], conn.get('port', 22), conn['user'], conn['password'],
+                                                     connect_options(profile_options(conn)),
+                                                     progress=lambda name: updates.put(('progress', name)))
+                updates.put(('done', report))
+            except Exception as e:
+                updates.put(('error', str(e)))
+        threading.Thread(target=probe, daemon=True).start()
+
+        def apply_suggested(report):
+            for key in PROFILE_OPTIONS:
+                if key in report['suggested']:
+                    conn[key] = report['suggested'][key]
+            with open(connections_path, 'w') as f:
+                json.dump(saved_connections, f)
+            apply_btn.config(state='disabled', text="Applied")
+
+        def poll():
+            if not window.winfo_exists():
+                return
+            try:
+                while True:
+                    kind, value = updates.get_nowait()
+                    if kind == 'progress':
+                        report_text.insert(tk.END, f"Measuring throughput: {value}...\n")
+                    elif kind == 'error':
+                        report_text.insert(tk.END, f"Measurement failed: {value}\n")
+                        return
+                    else:
+                        report_text.delete('1.0', tk.END)
+                        report_text.insert(tk.END, format_link_report(value))
+                        apply_btn.config(state='normal', command=lambda: apply_suggested(value))
+                        return
+            except queue.Empty:
+                pass
+            window.after(200, poll)
+        poll()
+
+    tk.Button(btn_frame, text="Measure Link", command=measure_selected).pack(side='left')
+
 def open_settings():
     settings_win = tk.Toplevel(root)
     settings_win.title("Settings - Manage Commands")
     settings_win.geometry("600x400")
-    apply_theme(settings_win, current_theme)
 
     # Treeview for categories and commands
-    tree = ttk.Treeview(settings_win, columns=('Command',), show='tree headings')
+    tree = ttk.Treeview(settings_win, columns=('Command', 'Mode'), show='tree headings')
     tree.heading('#0', text='Tab/Button')
     tree.heading('Command', text='Command')
+    tree.heading('Mode', text='Mode')
+    tree.column('Mode', width=60, stretch=False)
     tree.pack(fill='both', expand=True)
 
     # Populate tree
@@ -812,7 +2496,7 @@ def open_settings():
         for cat in commands:
             cat_id = tree.insert('', 'end', text=cat)
             for name, cmd in commands[cat].get('commands', {}).items():
-                tree.insert(cat_id, 'end', text=name, values=(cmd,))
+                tree.insert(cat_id, 'end', text=name, values=(command_text(cmd), command_mode(cmd)))
         # Re-expand previously open categories
         for cat_id in tree.get_children():
             if tree.item(cat_id)['text'] in open_cats:
@@ -858,11 +2542,17 @@ def open_settings():
             if parent:  # Command
                 cat = tree.item(parent)['text']
                 old_name = tree.item(item)['text']
+                old_entry = commands[cat]['commands'][old_name]
+                if command_mode(old_entry) == 'macro':
+                    edit_macro(cat, old_name)
+                    return
                 new_name = simpledialog.askstring("Edit Name", "New button name:", initialvalue=old_name)
-                new_cmd = simpledialog.askstring("Edit Command", "New command:", initialvalue=tree.item(item)['values'][0])
+                new_cmd = simpledialog.askstring("Edit Command", "New command:", initialvalue=command_text(old_entry))
                 if new_name and new_cmd:
+                    use_exec = messagebox.askyesno("Command Mode", "Run this command on its own exec channel (separate stdout/stderr and exit code)?",
+                                                   default='yes' if command_mode(old_entry) == 'exec' else 'no')
                     del commands[cat]['commands'][old_name]
-                    commands[cat]['commands'][new_name] = new_cmd
+                    commands[cat]['commands'][new_name] = make_command_entry(new_cmd, 'exec' if use_exec else 'shell')
             else:  # Category
                 cat = tree.item(item)['text']
                 new_cat = simpledialog.askstring("Edit Category", "New category name:", initialvalue=cat)
@@ -882,12 +2572,64 @@ def open_settings():
                 name = simpledialog.askstring("Add Command", "Button name:")
                 cmd = simpledialog.askstring("Add Command", "Command:")
                 if name and cmd:
-                    commands[cat]['commands'][name] = cmd
+                    use_exec = messagebox.askyesno("Command Mode", "Run this command on its own exec channel (separate stdout/stderr and exit code)?", default='no')
+                    commands[cat]['commands'][name] = make_command_entry(cmd, 'exec' if use_exec else 'shell')
                     save_commands()
                     populate_tree()
 
     tk.Button(btn_frame, text="Add Command to Selected Category", command=add_command).pack(side='left')
 
+    def edit_macro(cat, old_name=None):
+        # Edit a macro's steps as JSON; patterns are validated before saving
+        macro = commands[cat]['commands'][old_name] if old_name else {'mode': 'macro', 'steps': [], 'abort': []}
+        macro_win = tk.Toplevel(settings_win)
+        macro_win.title("Edit Macro" if old_name else "Add Macro")
+        macro_win.geometry("500x400")
+        tk.Label(macro_win, text="Button name:").pack(anchor='w')
+        name_entry = tk.Entry(macro_win)
+        name_entry.pack(fill='x')
+        name_entry.insert(0, old_name or '')
+        tk.Label(macro_win, text="Abort patterns for every step (regex, one per line):").pack(anchor='w')
+        abort_entry = Text(macro_win, height=3)
+        abort_entry.pack(fill='x')
+        abort_entry.insert('1.0', '\n'.join(as_list(macro.get('abort'))))
+        tk.Label(macro_win, text='Steps (JSON list of {"send", "expect", "abort", "timeout", "delay"}):').pack(anchor='w')
+        steps_entry = Text(macro_win, height=12)
+        steps_entry.pack(fill='both', expand=True)
+        steps_entry.insert('1.0', json.dumps(macro.get('steps', []), indent=2))
+        def save_macro():
+            name = name_entry.get()
+            abort = [line for line in abort_entry.get('1.0', tk.END).splitlines() if line.strip()]
+            try:
+                steps = json.loads(steps_entry.get('1.0', tk.END))
+                if not isinstance(steps, list) or not all(isinstance(step, dict) for step in steps):
+                    raise ValueError("steps must be a list of objects")
+                for step in steps:
+                    patterns = as_list(step.get('expect')) + as_list(step.get('abort')) + abort
+                    if any(NUMBERED_REFERENCE.search(pattern) for pattern in patterns):
+                        raise re.error("Numbered backreferences are not supported; use (?P<name>...) and (?P=name).")
+                    StreamMatcher(as_list(step.get('expect')), as_list(step.get('abort')) + abort)
+            except (ValueError, re.error) as e:
+                messagebox.showwarning("Invalid Macro", str(e), parent=macro_win)
+                return
+            if not name:
+                messagebox.showwarning("Invalid Macro", "A button name is required.", parent=macro_win)
+                return
+            if old_name:
+                del commands[cat]['commands'][old_name]
+            commands[cat]['commands'][name] = {'mode': 'macro', 'abort': abort, 'steps': steps}
+            save_commands()
+            populate_tree()
+            macro_win.destroy()
+        tk.Button(macro_win, text="Save Macro", command=save_macro).pack()
+
+    def add_macro():
+        selected = tree.selection()
+        if selected and not tree.parent(selected[0]):  # Category selected
+            edit_macro(tree.item(selected[0])['text'])
+
+    tk.Button(btn_frame, text="Add Macro to Selected Category", command=add_macro).pack(side='left')
+
     def edit_reference():
         selected = tree.selection()
         if selected:
@@ -898,7 +2640,6 @@ def open_settings():
                 # Single window for edit
                 ref_win = tk.Toplevel(settings_win)
                 ref_win.title("Edit Reference for " + cat)
-                apply_theme(ref_win, current_theme)
                 # Text
                 tk.Label(ref_win, text="Reference Text (use **bold**, *italic*):").pack(anchor='w')
                 text_entry = Text(ref_win, wrap='word', height=10)
@@ -1000,10 +2741,865 @@ def open_settings():
 
     tk.Button(btn_frame, text="Move Down", command=move_down).pack(side='left')
 
+def open_highlight_rules():
+    rules = [dict(rule) for rule in highlight_rules.rules]
+    rules_win = tk.Toplevel(root)
+    rules_win.title("Highlight and Alert Rules")
+    rules_win.geometry("700x350")
+
+    tree = ttk.Treeview(rules_win, columns=('regex', 'case', 'fg', 'bg', 'bold', 'notify'), show='tree headings')
+    tree.heading('#0', text='Pattern')
+    for col, title in (('regex', 'Regex'), ('case', 'Ignore Case'), ('fg', 'Color'), ('bg', 'Background'), ('bold', 'Bold'), ('notify', 'Notify')):
+        tree.heading(col, text=title)
+        tree.column(col, width=80, stretch=False)
+    tree.pack(fill='both', expand=True)
+
+    def refresh_list():
+        tree.delete(*tree.get_children())
+        for rule in rules:
+            tree.insert('', 'end', text=rule['pattern'], values=(
+                'yes' if rule.get('regex') else '', 'yes' if rule.get('ignore_case') else '',
+                rule.get('fg', ''), rule.get('bg', ''),
+                'yes' if rule.get('bold') else '', 'yes' if rule.get('notify') else ''))
+    refresh_list()
+
+    def edit_rule(idx=None):
+        rule = rules[idx] if idx is not None else {'pattern': '', 'fg': 'red'}
+        dialog = tk.Toplevel(rules_win)
+        dialog.title("Edit Rule" if idx is not None else "Add Rule")
+        dialog.grab_set()
+
+        tk.Label(dialog, text="Pattern:").grid(row=0, column=0, padx=5, pady=5, sticky='w')
+        pattern_entry = tk.Entry(dialog, width=40)
+        pattern_entry.grid(row=0, column=1, columnspan=2, padx=5, pady=5)
+        pattern_entry.insert(0, rule['pattern'])
+
+        color_entries = {}
+        for row, (key, label) in enumerate((('fg', "Color:"), ('bg', "Background:")), 1):
+            tk.Label(dialog, text=label).grid(row=row, column=0, padx=5, pady=5, sticky='w')
+            color_entry = tk.Entry(dialog)
+            color_entry.grid(row=row, column=1, padx=5, pady=5, sticky='w')
+            color_entry.insert(0, rule.get(key, ''))
+            def pick(e=color_entry):
+                color = colorchooser.askcolor(parent=dialog)[1]
+                if color:
+                    e.delete(0, tk.END)
+                    e.insert(0, color)
+            tk.Button(dialog, text="Pick...", command=pick).grid(row=row, column=2, padx=5, pady=5)
+            color_entries[key] = color_entry
+
+        flag_vars = {}
+        for row, (key, label) in enumerate((('regex', "Regular expression"), ('ignore_case', "Ignore case"),
+                                            ('bold', "Bold"), ('notify', "Desktop notification on match")), 3):
+            flag_vars[key] = tk.BooleanVar(value=bool(rule.get(key)))
+            tk.Checkbutton(dialog, text=label, variable=flag_vars[key]).grid(row=row, column=0, columnspan=3, padx=5, sticky='w')
+
+        def save_rule():
+            new_rule = {'pattern': pattern_entry.get(),
+                        'fg': color_entries['fg'].get(), 'bg': color_entries['bg'].get()}
+            new_rule.update({key: var.get() for key, var in flag_vars.items()})
+            try:
+                if new_rule['regex'] and NUMBERED_REFERENCE.search(new_rule['pattern']):
+                    raise re.error("Numbered backreferences are not supported; use (?P<name>...) and (?P=name).")
+                # Checked with the other rules too, since they share one regex
+                HighlightRules([new_rule] + [rule for i, rule in enumerate(rules) if i != idx])
+                for key in ('fg', 'bg'):
+                    if new_rule[key]:
+                        dialog.winfo_rgb(new_rule[key])
+            except (re.error, tk.TclError) as e:
+                messagebox.showwarning("Invalid Rule", str(e), parent=dialog)
+                return
+            if not new_rule['pattern']:
+                messagebox.showwarning("Invalid Rule", "A pattern is required.", parent=dialog)
+                return
+            if idx is None:
+                rules.append(new_rule)
+            else:
+                rules[idx] = new_rule
+            set_highlight_rules(rules)
+            refresh_list()
+            dialog.destroy()
+
+        tk.Button(dialog, text="Save", command=save_rule).grid(row=7, column=0, columnspan=3, pady=10)
+
+    btn_frame = tk.Frame(rules_win)
+    btn_frame.pack(fill='x')
+
+    def edit_selected():
+        selected = tree.selection()
+        if selected:
+            edit_rule(tree.index(selected[0]))
+
+    def delete_selected():
+        selected = tree.selection()
+        if selected:
+            del rules[tree.index(selected[0])]
+            set_highlight_rules(rules)
+            refresh_list()
+
+    tk.Button(btn_frame, text="Add Rule", command=edit_rule).pack(side='left')
+    tk.Button(btn_frame, text="Edit Selected", command=edit_selected).pack(side='left')
+    tk.Button(btn_frame, text="Delete Selected", command=delete_selected).pack(side='left')
+    tree.bind('<Double-1>', lambda e: edit_selected())
+
+def format_rate(bytes_per_second):
+    for unit in ('B/s', 'KB/s', 'MB/s'):
+        if bytes_per_second < 1024:
+            return f"{bytes_per_second:.1f} {unit}"
+        bytes_per_second /= 1024
+    return f"{bytes_per_second:.1f} GB/s"
+
+def open_sftp_panel(frame):
+    # One SFTP panel per session, sharing the session's SSH transport
+    session = sessions.get(frame)
+    if not session or not session.connected:
+        messagebox.showwarning("SFTP", "The session is not connected.")
+        return
+    panel = sftp_panels.get(frame)
+    if panel is not None and panel.winfo_exists():
+        panel.deiconify()
+        panel.lift()
+        return
+    try:
+        transfers = SFTPTransfers(session.transport())
+    except Exception as e:
+        messagebox.showerror("SFTP", f"Cannot start SFTP: {str(e)}")
+        return
+    panel = tk.Toplevel(root)
+    panel.title(f"SFTP - {session.user}@{session.host}")
+    panel.geometry("800x600")
+    sftp_panels[frame] = panel
+    state = {'cwd': transfers.browser.normalize('.'), 'last_bytes': 0, 'last_time': time.monotonic()}
+
+    path_frame = tk.Frame(panel)
+    path_frame.pack(fill='x')
+    tk.Label(path_frame, text="Remote folder:").pack(side='left')
+    path_entry = tk.Entry(path_frame)
+    path_entry.pack(side='left', fill='x', expand=True)
+
+    files_tree = ttk.Treeview(panel, columns=('size', 'modified'), height=12)
+    files_tree.heading('#0', text='Name')
+    files_tree.heading('size', text='Size')
+    files_tree.heading('modified', text='Modified')
+    files_tree.column('size', width=100, stretch=False)
+    files_tree.column('modified', width=140, stretch=False)
+    files_tree.pack(fill='both', expand=True)
+
+    def list_folder(path):
+        try:
+            path = transfers.browser.normalize(path)
+            entries = sorted(transfers.browser.listdir_attr(path), key=lambda a: (not stat.S_ISDIR(a.st_mode or 0), a.filename))
+        except Exception as e:
+            messagebox.showwarning("SFTP", f"Cannot list {path}: {str(e)}", parent=panel)
+            return
+        state['cwd'] = path
+        path_entry.delete(0, tk.END)
+        path_entry.insert(0, path)
+        files_tree.delete(*files_tree.get_children())
+        files_tree.is_dir = {}
+        for attr in entries:
+            is_dir = stat.S_ISDIR(attr.st_mode or 0)
+            iid = files_tree.insert('', 'end', text=attr.filename + ('/' if is_dir else ''), values=(
+                '' if is_dir else f"{attr.st_size:,}", datetime.fromtimestamp(attr.st_mtime or 0).strftime('%Y-%m-%d %H:%M')))
+            files_tree.is_dir[iid] = attr.filename
+
+    def remote_join(name):
+        return state['cwd'].rstrip('/') + '/' + name
+
+    def open_selected(event=None):
+        selected = files_tree.selection()
+        if selected and files_tree.item(selected[0])['text'].endswith('/'):
+            list_folder(remote_join(files_tree.is_dir[selected[0]]))
+
+    def download_selected():
+        selected = files_tree.selection()
+        if not selected:
+            return
+        local_dir = filedialog.askdirectory(parent=panel, title="Download to folder")
+        if not local_dir:
+            return
+        for iid in selected:
+            name = files_tree.is_dir[iid]
+            if files_tree.item(iid)['text'].endswith('/'):
+                transfers.queue_download_tree(remote_join(name), os.path.join(local_dir, name))
+            else:
+                transfers.download(remote_join(name), os.path.join(local_dir, name))
+
+    def upload_files():
+        for path in filedialog.askopenfilenames(parent=panel, title="Upload files"):
+            transfers.upload(path, remote_join(os.path.basename(path)))
+
+    def upload_folder():
+        path = filedialog.askdirectory(parent=panel, title="Upload folder")
+        if path:
+            transfers.queue_upload_tree(path, remote_join(os.path.basename(path.rstrip('/\\'))))
+
+    path_entry.bind('<Return>', lambda e: list_folder(path_entry.get()))
+    files_tree.bind('<Double-1>', open_selected)
+
+    btn_frame = tk.Frame(panel)
+    btn_frame.pack(fill='x')
+    tk.Button(btn_frame, text="Up", command=lambda: list_folder(state['cwd'].rstrip('/').rsplit('/', 1)[0] or '/')).pack(side='left')
+    tk.Button(btn_frame, text="Refresh", command=lambda: list_folder(state['cwd'])).pack(side='left')
+    tk.Button(btn_frame, text="Download Selected", command=download_selected).pack(side='left')
+    tk.Button(btn_frame, text="Upload Files", command=upload_files).pack(side='left')
+    tk.Button(btn_frame, text="Upload Folder", command=upload_folder).pack(side='left')
+
+    transfers_tree = ttk.Treeview(panel, columns=('direction', 'progress', 'rate', 'status'), height=8)
+    transfers_tree.heading('#0', text='File')
+    for col, title, width in (('direction', 'Direction', 80), ('progress', 'Progress', 160), ('rate', 'Rate', 90), ('status', 'Status', 160)):
+        transfers_tree.heading(col, text=title)
+        transfers_tree.column(col, width=width, stretch=False)
+    transfers_tree.pack(fill='both', expand=True)
+
+    transfer_frame = tk.Frame(panel)
+    transfer_frame.pack(fill='x')
+    throughput_label = tk.Label(transfer_frame, text="")
+    throughput_label.pack(side='right')
+
+    def selected_transfers():
+        return [transfers.transfers[transfers_tree.index(iid)] for iid in transfers_tree.selection()]
+
+    def cancel_selected():
+        for transfer in selected_transfers():
+            transfer['cancel'] = True
+
+    def resume_selected():
+        for transfer in selected_transfers():
+            transfers.retry(transfer)
+
+    tk.Button(transfer_frame, text="Cancel Selected", command=cancel_selected).pack(side='left')
+    tk.Button(transfer_frame, text="Resume Selected", command=resume_selected).pack(side='left')
+
+    def refresh_transfers():
+        # Update progress rows in place and the aggregate throughput twice a second
+        if not panel.winfo_exists():
+            return
+        rows = transfers_tree.get_children()
+        now = time.monotonic()
+        for i, transfer in enumerate(list(transfers.transfers)):
+            size = transfer['size']
+            progress = f"{transfer['done']:,} / {size:,}" if size is not None else f"{transfer['done']:,}"
+            if size:
+                progress = f"{transfer['done'] * 100 // size}%  " + progress
+            rate = ''
+            if transfer['started'] and transfer['status'] in ('running', 'done'):
+                elapsed = (transfer['finished'] or now) - transfer['started']
+                rate = format_rate((transfer['done'] - transfer['resumed']) / max(elapsed, 1e-6))
+            status = transfer['status'] + (f": {transfer['error']}" if transfer['error'] else '')
+            values = (transfer['direction'], progress, rate, status)
+            if i < len(rows):
+                transfers_tree.item(rows[i], values=values)
+            else:
+                transfers_tree.insert('', 'end', text=os.path.basename(transfer['src']), values=values)
+        total = sum(transfer['done'] for transfer in transfers.transfers)
+        elapsed = now - state['last_time']
+        active = sum(1 for transfer in transfers.transfers if transfer['status'] == 'running')
+        throughput_label.config(text=f"{active} active    {format_rate(max(total - state['last_bytes'], 0) / max(elapsed, 1e-6))}")
+        state['last_bytes'], state['last_time'] = total, now
+        panel.after(500, refresh_transfers)
+
+    def close_panel():
+        transfers.close()
+        sftp_panels.pop(frame, None)
+        panel.destroy()
+
+    panel.close = close_panel
+    panel.protocol("WM_DELETE_WINDOW", close_panel)
+    list_folder(state['cwd'])
+    refresh_transfers()
+
+def open_log_viewer(path=None):
+    # Lazy viewer for large logs: only the visible window of lines is rendered
+    if path is None:
+        logs_dir = os.path.join(base_dir, 'logs')
+        os.makedirs(logs_dir, exist_ok=True)
+        path = filedialog.askopenfilename(initialdir=logs_dir, filetypes=[("Log files", "*.log"), ("All files", "*.*")])
+        if not path:
+            return
+    try:
+        index = LogIndex(path)
+    except OSError as e:
+        messagebox.showerror("Log Viewer", f"Cannot open log: {str(e)}")
+        return
+    viewer = tk.Toplevel(root)
+    viewer.title(f"Log Viewer - {os.path.basename(path)}")
+    viewer.geometry("1000x600")
+    state = {'top': 0, 'rows': 40, 'match': None, 'search': None}
+
+    toolbar = tk.Frame(viewer)
+    toolbar.pack(fill='x')
+    tk.Label(toolbar, text="Line:").pack(side='left')
+    line_entry = tk.Entry(toolbar, width=10)
+    line_entry.pack(side='left')
+    tk.Label(toolbar, text="Time (YYYY-MM-DD HH:MM:SS):").pack(side='left')
+    time_entry = tk.Entry(toolbar, width=20)
+    time_entry.pack(side='left')
+    tk.Label(toolbar, text="Search (regex):").pack(side='left')
+    search_entry = tk.Entry(toolbar, width=25)
+    search_entry.pack(side='left')
+    ignore_case_var = tk.BooleanVar(value=True)
+    tk.Checkbutton(toolbar, text="Ignore case", variable=ignore_case_var).pack(side='left')
+
+    status_label = tk.Label(viewer, anchor='w')
+    status_label.pack(side='bottom', fill='x')
+    scrollbar = tk.Scrollbar(viewer)
+    scrollbar.pack(side='right', fill='y')
+    view_text = Text(viewer, wrap='none')
+    view_text.pack(fill='both', expand=True)
+    view_text.tag_config('match', background='yellow', foreground='black')
+    line_height = font.Font(font=view_text['font']).metrics('linespace')
+
+    def render():
+        lines = index.read_lines(state['top'], state['rows'])
+        view_text.config(state='normal')
+        view_text.delete('1.0', tk.END)
+        view_text.insert('1.0', '\n'.join(line for offset, line in lines))
+        if state['match'] and lines:
+            # Highlight a search hit if it falls inside the visible window
+            start, end = state['match']
+            for row, (offset, line) in enumerate(lines, 1):
+                line_end = index.next_line(offset)
+                if offset <= start < line_end:
+                    col = len(index.mm[offset:start].decode('utf-8', errors='replace'))
+                    width = len(index.mm[start:min(end, line_end)].decode('utf-8', errors='replace'))
+                    view_text.tag_add('match', f"{row}.{col}", f"{row}.{col + width}")
+                    break
+        view_text.config(state='disabled')
+        bottom = index.next_line(lines[-1][0]) if lines else index.size
+        size = max(index.size, 1)
+        scrollbar.set(state['top'] / size, bottom / size)
+        update_status()
+
+    def update_status():
+        line = index.line_number(state['top'])
+        where = f"Line {line + 1:,}" if line is not None else f"Offset {state['top']:,}"
+        total = index.total_lines
+        if total is None:
+            progress = f"indexing {index.indexed * 100 // max(index.size, 1)}%"
+        else:
+            progress = f"{total:,} lines"
+        status_label.config(text=f"{where}    {progress}    {index.size / (1024 * 1024):,.1f} MB    {state.get('message', '')}")
+
+    def poll_index():
+        # Refresh the status line until the background index is complete
+        if not viewer.winfo_exists():
+            return
+        update_status()
+        if not index.done:
+            viewer.after(500, poll_index)
+
+    def move_lines(count):
+        top = state['top']
+        step = index.next_line if count > 0 else index.prev_line
+        for _ in range(abs(count)):
+            new_top = step(top)
+            if new_top >= index.size:
+                break
+            top = new_top
+        state['top'] = top
+        render()
+
+    def go_to_end():
+        top = index.size
+        for _ in range(state['rows']):
+            top = index.prev_line(top)
+        state['top'] = index.line_start(top)
+        render()
+
+    def on_scroll(*args):
+        if args[0] == 'moveto':
+            state['top'] = index.line_start(int(float(args[1]) * index.size))
+            render()
+        elif args[0] == 'scroll':
+            amount = int(args[1])
+            move_lines(amount * (state['rows'] - 1) if args[2] == 'pages' else amount)
+    scrollbar.config(command=on_scroll)
+
+    def on_configure(event):
+        rows = max(1, event.height // line_height)
+        if rows != state['rows']:
+            state['rows'] = rows
+            render()
+    view_text.bind('<Configure>', on_configure)
+    view_text.bind('<MouseWheel>', lambda e: move_lines(-3 if e.delta > 0 else 3))
+    view_text.bind('<Button-4>', lambda e: move_lines(-3))
+    view_text.bind('<Button-5>', lambda e: move_lines(3))
+    for key, handler in (('<Up>', lambda e: move_lines(-1)), ('<Down>', lambda e: move_lines(1)),
+                         ('<Prior>', lambda e: move_lines(-(state['rows'] - 1))), ('<Next>', lambda e: move_lines(state['rows'] - 1)),
+                         ('<Control-Home>', lambda e: (state.update(top=0), render())), ('<Control-End>', lambda e: go_to_end())):
+        viewer.bind(key, handler)
+
+    def go_to_line():
+        try:
+            number = int(line_entry.get().replace(',', ''))
+        except ValueError:
+            return
+        offset = index.line_offset(number - 1)
+        if offset is None:
+            state['message'] = "Line not indexed yet" if not index.done else "Past end of file"
+            update_status()
+            return
+        state['top'] = offset
+        state['message'] = ''
+        render()
+
+    def go_to_time():
+        try:
+            target = datetime.strptime(time_entry.get().strip(), '%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            messagebox.showwarning("Log Viewer", "Use the format YYYY-MM-DD HH:MM:SS", parent=viewer)
+            return
+        offset = index.find_time(target)
+        state['message'] = '' if offset is not None else "No timestamp at or after that time"
+        if offset is not None:
+            state['top'] = index.line_start(offset)
+        render()
+
+    def find_next():
+        # Search runs in a thread over the mapped file; results are polled from Tk
+        if state['search'] is not None:
+            state['search']['cancelled'].set()
+        try:
+            pattern = re.compile(search_entry.get().encode('utf-8'), re.IGNORECASE if ignore_case_var.get() else 0)
+        except re.error as e:
+            messagebox.showwarning("Log Viewer", f"Invalid pattern: {str(e)}", parent=viewer)
+            return
+        start = state['match'][1] if state['match'] and state['match'][0] >= state['top'] else state['top']
+        search = {'cancelled': threading.Event(), 'result': None, 'finished': False}
+        state['search'] = search
+        def run():
+            search['result'] = index.search(pattern, start, search['cancelled'])
+            search['finished'] = True
+        threading.Thread(target=run, daemon=True).start()
+        state['message'] = "Searching..."
+        update_status()
+        poll_search(search)
+
+    def poll_search(search):
+        if not viewer.winfo_exists() or search['cancelled'].is_set():
+            return
+        if not search['finished']:
+            viewer.after(100, poll_search, search)
+            return
+        state['search'] = None
+        if search['result'] is None:
+            state['message'] = "No more matches"
+            update_status()
+            return
+        state['match'] = search['result']
+        state['message'] = ''
+        state['top'] = index.line_start(search['result'][0])
+        render()
+
+    tk.Button(toolbar, text="Go to Line", command=go_to_line).pack(side='left')
+    tk.Button(toolbar, text="Go to Time", command=go_to_time).pack(side='left')
+    tk.Button(toolbar, text="Find Next", command=find_next).pack(side='left')
+    line_entry.bind('<Return>', lambda e: go_to_line())
+    time_entry.bind('<Return>', lambda e: go_to_time())
+    search_entry.bind('<Return>', lambda e: find_next())
+
+    def close_viewer():
+        if state['search'] is not None:
+            state['search']['cancelled'].set()
+        index.close()
+        viewer.destroy()
+    viewer.protocol("WM_DELETE_WINDOW", close_viewer)
+    view_text.tag_config('match', background='yellow', foreground='black')
+    render()
+    poll_index()
+
+# Metrics export: periodically written under base_dir while metrics are enabled
+METRICS_EXPORT_INTERVAL = 10000  # ms
+metrics_export_state = {'previous': None, 'scheduled': False}
+
+def export_metrics():
+    metrics_export_state['scheduled'] = False
+    if not metrics.enabled:
+        return
+    snapshot = metrics.snapshot(metrics_export_state['previous'])
+    metrics_export_state['previous'] = snapshot
+    if settings.get('metrics_format', 'json') == 'prometheus':
+        path, content = os.path.join(base_dir, 'metrics.prom'), Metrics.to_prometheus(snapshot)
+    else:
+        path, content = os.path.join(base_dir, 'metrics.json'), Metrics.to_json(snapshot)
+    try:
+        # Write then rename so scrapers never read a half-written file
+        with open(path + '.tmp', 'w') as f:
+            f.write(content)
+        os.replace(path + '.tmp', path)
+    except OSError:
+        pass
+    schedule_metrics_export()
+
+def schedule_metrics_export():
+    if metrics.enabled and not metrics_export_state['scheduled']:
+        metrics_export_state['scheduled'] = True
+        root.after(METRICS_EXPORT_INTERVAL, export_metrics)
+
+def set_metrics_enabled(enabled):
+    metrics.enabled = enabled
+    settings['metrics'] = enabled
+    save_settings()
+    if enabled:
+        metrics_export_state['previous'] = None
+        schedule_metrics_export()
+
+def open_metrics_overlay():
+    # Debug overlay listing every series, refreshed once a second
+    overlay = tk.Toplevel(root)
+    overlay.title("Performance Metrics")
+    overlay.geometry("760x480")
+    top_frame = tk.Frame(overlay)
+    top_frame.pack(fill='x')
+    enabled_var = tk.BooleanVar(value=metrics.enabled)
+    tk.Checkbutton(top_frame, text="Collect metrics", variable=enabled_var,
+                   command=lambda: (set_metrics_enabled(enabled_var.get()), metrics_var.set(enabled_var.get()))).pack(side='left')
+    tk.Label(top_frame, text="Export format:").pack(side='left')
+    format_var = tk.StringVar(value=settings.get('metrics_format', 'json'))
+    def set_format():
+        settings['metrics_format'] = format_var.get()
+        save_settings()
+    for value, label in (('json', "JSON"), ('prometheus', "Prometheus")):
+        tk.Radiobutton(top_frame, text=label, value=value, variable=format_var, command=set_format).pack(side='left')
+    tk.Button(top_frame, text="Reset", command=metrics.reset).pack(side='left')
+    overlay_text = Text(overlay, wrap='none', font='TkFixedFont')
+    overlay_text.pack(fill='both', expand=True)
+    state = {'previous': metrics.snapshot()}
+
+    def refresh():
+        if not overlay.winfo_exists():
+            return
+        snapshot = metrics.snapshot(state['previous'])
+        state['previous'] = snapshot
+        lines = [] if metrics.enabled else ["Metrics collection is off.", ""]
+        lines.append(f"{'Session':<32}{'In/s':>12}{'Out/s':>12}{'Queue':>8}{'Reader p50':>12}{'Reader p99':>12}")
+        labels = sorted({label for (name, label) in list(snapshot['counters']) + list(snapshot['gauges']) if label})
+        for label in labels:
+            reader = snapshot['timings'].get(('reader_enqueue_latency', label), {'p50': 0.0, 'p99': 0.0})
+            lines.append(f"{label[:31]:<32}{format_rate(snapshot['rates'].get(('session_bytes_in', label), 0)):>12}"
+                         f"{format_rate(snapshot['rates'].get(('session_bytes_out', label), 0)):>12}"
+                         f"{snapshot['gauges'].get(('output_queue_depth', label), 0):>8}"
+                         f"{reader['p50'] * 1000:>10.2f}ms{reader['p99'] * 1000:>10.2f}ms")
+        lines += ['', f"{'Timing':<32}{'Count':>8}{'Mean':>12}{'p50':>12}{'p99':>12}{'Max':>12}"]
+        for (name, label), t in sorted(snapshot['timings'].items()):
+            if label and name == 'reader_enqueue_latency':
+                continue
+            lines.append(f"{(name + (' ' + label if label else ''))[:31]:<32}{t['count']:>8}"
+                         + ''.join(f"{t[key] * 1000:>10.2f}ms" for key in ('mean', 'p50', 'p99', 'max')))
+        lines.append('')
+        lines.append(f"process_queues backlog: {snapshot['gauges'].get(('process_queues_backlog', ''), 0)}")
+        overlay_text.delete('1.0', tk.END)
+        overlay_text.insert('1.0', '\n'.join(lines))
+        overlay.after(1000, refresh)
+
+    refresh()
+
+def open_port_forwards():
+    # Live list of every tab's forwards: connections and throughput, refreshed once a second
+    window = tk.Toplevel(root)
+    window.title("Port Forwards")
+    window.geometry("900x300")
+    forwards_text = Text(window, wrap='none', font='TkFixedFont')
+    forwards_text.pack(fill='both', expand=True)
+    state = {'previous': {}, 'time': time.monotonic()}
+
+    def refresh():
+        if not window.winfo_exists():
+            return
+        now = time.monotonic()
+        elapsed = max(now - state['time'], 1e-6)
+        previous, state['previous'], state['time'] = state['previous'], {}, now
+        lines = [f"{'Tab':<20}{'Forward':<36}{'Port':>7}{'Active':>8}{'Total':>8}{'Failed':>8}{'In/s':>12}{'Out/s':>12}"]
+        for frame, forwards in list(port_forwards.items()):
+            tab = session_notebook.tab(frame, 'text') if frame.winfo_exists() else ''
+            for forward in forwards:
+                stats = forward.stats()
+                state['previous'][forward] = stats
+                last = previous.get(forward, stats)
+                lines.append(f"{tab[:19]:<20}{stats['spec'][:35]:<36}{stats['port']:>7}{stats['active']:>8}"
+                             f"{stats['total']:>8}{stats['failed']:>8}"
+                             f"{format_rate((stats['bytes_in'] - last['bytes_in']) / elapsed):>12}"
+                             f"{format_rate((stats['bytes_out'] - last['bytes_out']) / elapsed):>12}")
+                if stats['error']:
+                    lines.append(f"{'':<20}  {stats['error']}")
+        if len(lines) == 1:
+            lines.append("No forwards. Add them to a saved connection (Forwards: L 8080:host:80; R ...).")
+        forwards_text.delete('1.0', tk.END)
+        forwards_text.insert('1.0', '\n'.join(lines))
+        window.after(1000, refresh)
+
+    refresh()
+
+# Scheduled commands (scheduler.py): schedules live in schedules.json, results in
+# schedule_results/ under the app data folder. Targets are saved connection names
+# or patterns such as "db-*", resolved each time a schedule fires.
+schedules_path = os.path.join(base_dir, 'schedules.json')
+SCHEDULE_RESULTS_SHOWN = 50  # Results per host in the results view
+schedules = []
+try:
+    with open(schedules_path, 'r') as f:
+        schedules = json.load(f)
+except FileNotFoundError:
+    pass
+
+def resolve_schedule_targets(schedule):
+    # A target whose options don't resolve (e.g. an unknown jump host) gets an
+    # 'error' instead, so it shows up as a failed run and the rest still run
+    targets = []
+    for conn in saved_connections:
+        name = conn.get('name') or conn['host']
+        if any(fnmatch.fnmatchcase(name, pattern) for pattern in schedule.get('targets', [])):
+            target = {'host': conn['host'], 'port': conn.get('port', 22), 'user': conn['user'],
+                      'password': conn.get('password', ''), 'options': {}}
+            try:
+                target['options'] = connect_options(profile_options(conn))
+            except paramiko.SSHException as e:
+                target['error'] = f"{name}: {e}"
+            targets.append(target)
+    return targets
+
+def borrow_session_transport(target):
+    # An open tab to the same host runs scheduled commands on its own connection
+    for session in list(sessions.values()):
+        if (not isinstance(session, WorkerSession) and session.connected
+                and (session.host, session.port, session.user) == (target['host'], target['port'], target['user'])):
+            return session.ssh_transport
+    return None
+
+result_store = scheduler.ResultStore(os.path.join(base_dir, 'schedule_results'),
+                                     settings.get('schedule_retention_months', 12))
+command_scheduler = scheduler.Scheduler(result_store, resolve_schedule_targets, borrow_session_transport,
+                                        workers=settings.get('schedule_workers', scheduler.SCHEDULER_WORKERS),
+                                        per_host=settings.get('schedule_per_host', scheduler.SCHEDULER_PER_HOST))
+
+def save_schedules():
+    with open(schedules_path, 'w') as f:
+        json.dump(schedules, f)
+    command_scheduler.set_schedules(schedules)
+
+def open_schedules():
+    window = tk.Toplevel(root)
+    window.title("Scheduled Commands")
+    window.geometry("800x300")
+    tree = ttk.Treeview(window, columns=('command', 'targets', 'every', 'jitter', 'next'), height=8)
+    for column, heading, width in (('#0', "Name", 140), ('command', "Command", 200), ('targets', "Targets", 160),
+                                   ('every', "Every (s)", 70), ('jitter', "Jitter (s)", 70), ('next', "Next Run", 120)):
+        tree.heading(column, text=heading)
+        tree.column(column, width=width)
+    tree.pack(fill='both', expand=True)
+
+    def refresh(event=None):
+        # Redraws the list; only the first call (event is None) polls, so edits
+        # redraw with refresh(True) without starting loops of their own
+        if not window.winfo_exists():
+            return
+        if event is None:
+            window.after(5000, refresh)  # Next run times move on as schedules fire
+        next_runs = command_scheduler.next_runs()
+        selected = tree.selection()
+        tree.delete(*tree.get_children())
+        for index, schedule in enumerate(schedules):
+            due = next_runs.get(schedule['name'])
+            tree.insert('', 'end', iid=str(index), text=schedule['name'],
+                        values=(schedule['command'], ', '.join(schedule.get('targets', [])), schedule['every'],
+                                schedule.get('jitter', 0),
+                                datetime.fromtimestamp(due).strftime('%H:%M:%S') if due else "disabled"))
+        tree.selection_set([iid for iid in selected if tree.exists(iid)])
+
+    def selected_index():
+        selected = tree.selection()
+        return int(selected[0]) if selected else None
+
+    def edit(index=None):
+        schedule = schedules[index] if index is not None else {'name': '', 'command': '', 'targets': [],
+                                                               'every': 300, 'jitter': 30,
+                                                               'timeout': scheduler.SCHEDULER_TIMEOUT, 'enabled': True}
+        dialog = tk.Toplevel(window)
+        dialog.title("Edit Schedule" if index is not None else "Add Schedule")
+        dialog.grab_set()
+        fields = {}
+        for row, (key, label, value) in enumerate((
+                ('name', "Name:", schedule['name']),
+                ('command', "Command:", schedule['command']),
+                ('targets', "Targets:", ', '.join(schedule.get('targets', []))),  # Names or patterns, e.g. db-*
+                ('every', "Every (s):", schedule['every']),
+                ('jitter', "Jitter (s):", schedule.get('jitter', 0)),
+                ('timeout', "Timeout (s):", schedule.get('timeout', scheduler.SCHEDULER_TIMEOUT)))):
+            tk.Label(dialog, text=label).grid(row=row, column=0, padx=5, pady=5)
+            fields[key] = tk.Entry(dialog, width=40)
+            fields[key].grid(row=row, column=1, padx=5, pady=5)
+            fields[key].insert(0, str(value))
+        enabled_var = tk.BooleanVar(value=schedule.get('enabled', True))
+        tk.Checkbutton(dialog, text="Enabled", variable=enabled_var).grid(row=6, column=0, columnspan=2, pady=5)
+
+        def save():
+            name = fields['name'].get().strip()
+            every, jitter, timeout = (fields[key].get().strip() for key in ('every', 'jitter', 'timeout'))
+            if not name or not fields['command'].get().strip() or not every.isdigit() or int(every) < 1 \
+                    or not jitter.isdigit() or not timeout.isdigit() or int(timeout) < 1:
+                messagebox.showwarning("Schedule", "Name, command and a whole number of seconds are required.",
+                                       parent=dialog)
+                return
+            if any(other['name'] == name for i, other in enumerate(schedules) if i != index):
+                messagebox.showwarning("Schedule", f"A schedule named {name} already exists.", parent=dialog)
+                return
+            updated = {'name': name, 'command': fields['command'].get().strip(),
+                       'targets': [t.strip() for t in fields['targets'].get().split(',') if t.strip()],
+                       'every': int(every), 'jitter': int(jitter), 'timeout': int(timeout),
+                       'enabled': enabled_var.get()}
+            if index is None:
+                schedules.append(updated)
+            else:
+                schedules[index] = updated
+            save_schedules()
+            refresh(True)
+            dialog.destroy()
+        tk.Button(dialog, text="Save", command=save).grid(row=7, column=0, columnspan=2, pady=10)
+
+    def edit_selected():
+        index = selected_index()
+        if index is not None:
+            edit(index)
+
+    def delete_selected():
+        index = selected_index()
+        if index is not None and messagebox.askyesno("Delete", f"Delete schedule {schedules[index]['name']}?",
+                                                     parent=window):
+            del schedules[index]
+            save_schedules()
+            refresh(True)
+
+    def run_selected():
+        index = selected_index()
+        if index is not None:
+            command_scheduler.run_now(schedules[index])
+
+    btn_frame = tk.Frame(window)
+    btn_frame.pack(fill='x')
+    tk.Button(btn_frame, text="Add", command=edit).pack(side='left')
+    tk.Button(btn_frame, text="Edit Selected", command=edit_selected).pack(side='left')
+    tk.Button(btn_frame, text="Delete Selected", command=delete_selected).pack(side='left')
+    tk.Button(btn_frame, text="Run Now", command=run_selected).pack(side='left')
+    tk.Button(btn_frame, text="Results", command=open_schedule_results).pack(side='left')
+    tree.bind('<Double-1>', lambda e: edit_selected())
+    refresh()
+
+def open_schedule_results():
+    # Last results per host, newest first; reads only the tail of each host's store
+    window = tk.Toplevel(root)
+    window.title("Schedule Results")
+    window.geometry("800x400")
+    hosts_list = tk.Listbox(window, width=30, exportselection=False)
+    hosts_list.pack(side='left', fill='y')
+    results_tree = ttk.Treeview(window, columns=('exit', 'duration', 'started'))
+    results_tree.heading('#0', text='Schedule / Command')
+    results_tree.heading('exit', text='Exit')
+    results_tree.heading('duration', text='Duration')
+    results_tree.heading('started', text='Started')
+    results_tree.column('exit', width=80, stretch=False)
+    results_tree.column('duration', width=80, stretch=False)
+    results_tree.column('started', width=140, stretch=False)
+    results_tree.pack(side='left', fill='both', expand=True)
+    results_tree.results = {}
+    results_tree.bind('<Double-1>', lambda e: open_exec_result(results_tree))
+    hosts = result_store.hosts()
+    for key in hosts:
+        hosts_list.insert(tk.END, key)
+
+    def show_host(event=None):
+        if not window.winfo_exists():
+            return
+        if event is None:
+            window.after(5000, show_host)  # New runs keep arriving while the view is open
+        selected = hosts_list.curselection()
+        if selected:
+            results_tree.delete(*results_tree.get_children())
+            results_tree.results = {}
+            for result in result_store.last(hosts[selected[0]], SCHEDULE_RESULTS_SHOWN):
+                iid = results_tree.insert('', 'end', text=f"{result['schedule']}: {result['cmd']}",
+                                          values=(result['error'] or result['exit_code'], f"{result['duration']:.3f}s",
+                                                  result['started'].strftime('%Y-%m-%d %H:%M:%S')))
+                results_tree.results[iid] = result
+
+    hosts_list.bind('<<ListboxSelect>>', show_host)
+    if hosts:
+        hosts_list.selection_set(0)
+    show_host()
+
+def set_worker_processes():
+    # Applies to sessions opened from now on; open tabs keep running where they are
+    count = simpledialog.askinteger("Session Workers",
+                                    "Worker processes for new sessions (0 runs them in this process):",
+                                    initialvalue=worker_process_count(), minvalue=0, maxvalue=os.cpu_count() or 8)
+    if count is None:
+        return
+    settings['worker_processes'] = count
+    save_settings()
+
+def set_commands_files():
+    # Personal commands file (blank for the default in the app data folder) and an
+    # optional read-only team file layered under it
+    dialog = tk.Toplevel(root)
+    dialog.title("Commands Files")
+    dialog.grab_set()
+    fields = {}
+    for row, (key, label, value) in enumerate((
+            ('commands_path', "Personal file:", settings.get('commands_path', '')),
+            ('team_commands_path', "Team file (read-only):", settings.get('team_commands_path', '')))):
+        tk.Label(dialog, text=label).grid(row=row, column=0, padx=5, pady=5)
+        fields[key] = tk.Entry(dialog, width=50)
+        fields[key].grid(row=row, column=1, padx=5, pady=5)
+        fields[key].insert(0, value)
+        def browse(entry=fields[key]):
+            path = filedialog.askopenfilename(parent=dialog, filetypes=[("JSON files", "*.json")])
+            if path:
+                entry.delete(0, tk.END)
+                entry.insert(0, path)
+        tk.Button(dialog, text="Browse", command=browse).grid(row=row, column=2, padx=5, pady=5)
+
+    def save():
+        global commands_path, team_commands_path
+        for key, entry in fields.items():
+            if entry.get().strip():
+                settings[key] = entry.get().strip()
+            else:
+                settings.pop(key, None)
+        save_settings()
+        commands_path = settings.get('commands_path') or os.path.join(base_dir, 'commands.json')
+        team_commands_path = settings.get('team_commands_path')
+        load_commands()
+        dialog.destroy()
+    tk.Button(dialog, text="Save", command=save).grid(row=2, column=0, columnspan=3, pady=10)
+
 def save_commands():
-    with open(commands_path, 'w') as f:
-        json.dump(commands, f)
-    rebuild_commands_notebook()
+    # Only the personal layer is written; the team file is never touched. If another
+    # instance saved the file since we read it, its version is kept for every
+    # category (and the category order) this instance hasn't changed itself
+    global personal_commands
+    personal = personal_layer(commands, team_commands)
+    if commands_file_changed(commands_path):
+        theirs = read_commands_file(commands_path)
+        if theirs is not None:
+            for key in set(personal) | set(personal_commands):
+                if (key in personal, personal.get(key)) == (key in personal_commands, personal_commands.get(key)):
+                    personal.pop(key, None)  # Unchanged here: take theirs
+                    if key in theirs:
+                        personal[key] = theirs[key]
+            personal.update({key: value for key, value in theirs.items()
+                             if key not in personal and key not in personal_commands})
+            commands.clear()  # In place, so open dialogs keep editing the live model
+            commands.update(merge_commands(team_commands, personal))
+    data = json.dumps(personal).encode('utf-8')
+    # Written beside the file and swapped in, so other instances never read half of it
+    temp_path = f"{commands_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, commands_path)
+    personal_commands = json.loads(data)
+    file_stat = os.stat(commands_path)
+    commands_files[commands_path] = (file_stat.st_mtime_ns, file_stat.st_size, hashlib.sha1(data).hexdigest())
+    sync_commands_notebook()
 
 def export_commands():
     file = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON files", "*.json")])
@@ -1016,10 +3612,12 @@ def import_commands():
     file = filedialog.askopenfilename(filetypes=[("JSON files", "*.json")])
     if file:
         with open(file, 'r') as f:
-            global commands
-            commands = json.load(f)
+            imported = json.load(f)
+        # Merged by category: imported categories replace ones of the same name
+        for category, data in imported.items():
+            commands[category] = normalize_category(data)
         save_commands()
-        messagebox.showinfo("Imported", "Commands imported successfully.")
+        messagebox.showinfo("Imported", f"{len(imported)} categories imported.")
 
 # Menu bar
 menu = tk.Menu(root)
@@ -1029,18 +3627,38 @@ menu.add_cascade(label="File", menu=file_menu)
 file_menu.add_command(label="New Connection", command=add_new_session)
 file_menu.add_command(label="Connect to Saved", command=connect_to_saved)
 file_menu.add_command(label="Save Current Connection", command=save_current_connection)
+file_menu.add_command(label="Save Workspace", command=save_workspace)
+file_menu.add_command(label="Restore Workspace", command=restore_workspace)
+restore_workspace_var = tk.BooleanVar(value=settings.get('restore_workspace', True))
+file_menu.add_checkbutton(label="Restore Workspace on Startup", variable=restore_workspace_var,
+                          command=set_restore_workspace)
 file_menu.add_command(label="Export Commands", command=export_commands)
 file_menu.add_command(label="Import Commands", command=import_commands)
+file_menu.add_command(label="Open Log Viewer", command=open_log_viewer)
 file_menu.add_separator()
-file_menu.add_command(label="Exit", command=root.quit)
+file_menu.add_command(label="Exit", command=exit_app)
+root.protocol("WM_DELETE_WINDOW", exit_app)
 
 settings_menu = tk.Menu(menu, tearoff=0)
 menu.add_cascade(label="Settings", menu=settings_menu)
 settings_menu.add_command(label="Manage Commands", command=open_settings)
+settings_menu.add_command(label="Commands Files...", command=set_commands_files)
 settings_menu.add_command(label="Manage Saved Connections", command=manage_saved_connections)
-
-# Apply initial theme
-apply_theme(root, current_theme)
-
-# Start the GUI loop
-root.mainloop()
\ No newline at end of file
+settings_menu.add_command(label="Highlight Rules", command=open_highlight_rules)
+settings_menu.add_command(label="Session Workers...", command=set_worker_processes)
+settings_menu.add_command(label="Port Forwards...", command=open_port_forwards)
+settings_menu.add_command(label="Scheduled Commands...", command=open_schedules)
+settings_menu.add_separator()
+metrics_var = tk.BooleanVar(value=settings.get('metrics', False))
+settings_menu.add_checkbutton(label="Collect Performance Metrics", variable=metrics_var,
+                              command=lambda: set_metrics_enabled(metrics_var.get()))
+settings_menu.add_command(label="Performance Metrics...", command=open_metrics_overlay)
+set_metrics_enabled(metrics_var.get())
+
+# Start the schedules and the GUI loop (importing the module, e.g. from the benchmarks,
+# builds a hidden-able root only and runs no schedules)
+if __name__ == '__main__':
+    command_scheduler.set_schedules(schedules)
+    if restore_workspace_var.get():
+        root.after_idle(restore_workspace)
+    root.mainloop()
\ No newline at end of file
@@ -0,0 +1,210 @@
+# Port forwarding benchmark for session_worker.ForwardPump against the stand-in
+# server. A data source (in its own process, like the server) answers each
+# connection with as many bytes as the client asks for. Local forwards pull from
+# it through the server with direct-tcpip; remote forwards go the other way, from
+# a listener on the server back through the pump to the source. Reports sustained
+# MB/s for one stream at several pump buffer sizes, and MB/s, connections/s and
+# per-connection p99 with hundreds of connections at once. Last, checks that two
+# remote forwards on one transport each get their own connections, also after one
+# of them is removed.
+#
+# Runs headless: it drives session_worker directly and does not import app.py.
+#
+# Usage: python benchmarks/bench_forward.py [--mb 64] [--buffers 16,64,256] [--connections 100,500] [--json out.json]
+import argparse
+import json
+import os
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import session_worker  # noqa: E402
+import stand_in_server  # noqa: E402
+
+REQUEST = struct.Struct('!Q')
+CHUNK = b'x' * (1024 * 1024)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def serve_source(conn):
+    # Send the number of bytes asked for, then close
+    try:
+        size, = REQUEST.unpack(conn.recv(REQUEST.size, socket.MSG_WAITALL))
+        while size > 0:
+            conn.sendall(CHUNK[:size])
+            size -= len(CHUNK)
+    except (OSError, struct.error):
+        pass
+    conn.close()
+
+
+def source_main():
+    listener = socket.create_server(('127.0.0.1', 0), backlog=1024)
+    print(f'PORT {listener.getsockname()[1]}', flush=True)
+    while True:
+        conn, _ = listener.accept()
+        threading.Thread(target=serve_source, args=(conn,), daemon=True).start()
+
+
+def start_source():
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--source'], stdout=subprocess.PIPE, text=True)
+    return process, int(process.stdout.readline().split()[1])
+
+
+def fetch(port, size):
+    # One forwarded connection: ask for size bytes and read them all; returns seconds
+    start = time.perf_counter()
+    with socket.create_connection(('127.0.0.1', port), timeout=120) as sock:
+        sock.sendall(REQUEST.pack(size))
+        received = 0
+        while True:
+            data = sock.recv(1 << 20)
+            if not data:
+                break
+            received += len(data)
+    if received != size:
+        raise RuntimeError(f"got {received} of {size} bytes")
+    return time.perf_counter() - start
+
+
+def run_case(name, port, forward, connections, size):
+    times, errors = [], []
+
+    def one():
+        try:
+            times.append(fetch(port, size))
+        except Exception as e:
+            errors.append(e)
+
+    before = forward.stats()
+    start = time.perf_counter()
+    threads = [threading.Thread(target=one) for _ in range(connections)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    after = forward.stats()
+    mb = size * len(times) / (1024 * 1024)
+    return {
+        'case': name,
+        'connections': connections,
+        'mb': round(mb, 1),
+        'seconds': round(elapsed, 3),
+        'mb_per_s': round(mb / elapsed, 2),
+        'connections_per_s': round(len(times) / elapsed, 1),
+        'conn_p50_ms': round(percentile(times, 0.5) * 1000, 1),
+        'conn_p99_ms': round(percentile(times, 0.99) * 1000, 1),
+        'errors': len(errors),
+        'pump_total': after['total'] - before['total'],
+        'pump_failed': after['failed'] - before['failed'],
+        'pump_mb': round((after['bytes_in'] + after['bytes_out'] - before['bytes_in'] - before['bytes_out'])
+                         / (1024 * 1024), 1),
+    }
+
+
+def run_two_remote(server_port, source_port):
+    # Two R forwards on one transport: a connection to each server port must go
+    # through its own forward, and removing one must leave the other working.
+    # A fresh transport, so cancels from the earlier pumps can't interfere
+    transport, _ = session_worker.connect_transport('127.0.0.1', server_port, stand_in_server.USER,
+                                                    stand_in_server.PASSWORD, {})
+    pump = session_worker.ForwardPump()
+    forwards = [pump.add(f'R 0:127.0.0.1:{source_port}', lambda: transport) for _ in range(2)]
+    for forward in forwards:
+        forward.ready.wait(30)
+        if forward.error:
+            raise RuntimeError(forward.error)
+    errors = 0
+    misrouted = 0
+    try:
+        for forward in forwards:
+            before = [other.stats()['total'] for other in forwards]
+            try:
+                fetch(forward.port, 64 * 1024)
+            except Exception:
+                errors += 1
+            after = [other.stats()['total'] for other in forwards]
+            misrouted += [b - a for a, b in zip(before, after)] != [int(other is forward) for other in forwards]
+        pump.remove(forwards[0])
+        time.sleep(0.5)  # Let the cancel reach the server
+        before = forwards[1].stats()['total']
+        try:
+            fetch(forwards[1].port, 64 * 1024)
+        except Exception:
+            errors += 1
+        after_cancel = forwards[1].stats()['total'] - before
+    finally:
+        pump.remove(forwards[1])
+        transport.close()
+    return {'case': 'R two forwards', 'errors': errors, 'misrouted': misrouted,
+            'ok': errors == 0 and misrouted == 0 and after_cancel == 1}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Port forward throughput and concurrency against a local paramiko server")
+    parser.add_argument('--mb', type=float, default=64, help="MB for the single-stream cases")
+    parser.add_argument('--buffers', default='16,64,256', help="comma-separated pump buffer sizes in KB")
+    parser.add_argument('--connections', default='100,500', help="comma-separated concurrent connection counts")
+    parser.add_argument('--conn-kb', type=int, default=256, help="KB fetched by each concurrent connection")
+    parser.add_argument('--json', help="write results to this JSON file")
+    parser.add_argument('--source', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.source:
+        source_main()
+        return
+
+    session_worker.known_hosts_path = os.path.join(tempfile.mkdtemp(prefix='cf-forward-'), 'known_hosts')
+    server, server_port = stand_in_server.start()
+    source, source_port = start_source()
+    transport, _ = session_worker.connect_transport('127.0.0.1', server_port, stand_in_server.USER,
+                                                    stand_in_server.PASSWORD, {'window_size': 4 << 20})
+    results = []
+    failed = False
+    try:
+        for kb in [int(n) for n in args.buffers.split(',')]:
+            for kind in ('L', 'R'):
+                pump = session_worker.ForwardPump(kb * 1024)
+                forward = pump.add(f'{kind} 0:127.0.0.1:{source_port}', lambda: transport)
+                forward.ready.wait(30)
+                if forward.error:
+                    raise RuntimeError(forward.error)
+                cases = [('stream', 1, int(args.mb * 1024 * 1024))]
+                if kb == FORWARD_KB:
+                    cases += [('concurrent', int(n), args.conn_kb * 1024) for n in args.connections.split(',')]
+                for name, connections, size in cases:
+                    case = run_case(f'{kind} {name}', forward.port, forward, connections, size)
+                    case['buffer_kb'] = kb
+                    failed = failed or case['errors'] > 0 or case['pump_failed'] > 0
+                    results.append(case)
+                    print(json.dumps(case), flush=True)
+                pump.remove(forward)
+        case = run_two_remote(server_port, source_port)
+        failed = failed or not case['ok']
+        results.append(case)
+        print(json.dumps(case), flush=True)
+    finally:
+        transport.close()
+        server.kill()
+        source.kill()
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if failed:
+        print("FAILED: some forwarded connections did not complete or went through the wrong forward")
+        sys.exit(1)
+
+
+FORWARD_KB = session_worker.FORWARD_BUFFER // 1024  # Concurrency cases run at the default buffer size
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+# Benchmark for highlight/alert rules over streaming output.
+# Measures the cost per MB of scanning output with 100 active rules, both for the
+# matcher alone and for the full path of inserting into a Text widget and applying
+# the batched tags the way process_queues does.
+#
+# Usage: python benchmarks/bench_highlight.py [--mb 8] [--rules 100] [--json out.json]
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app  # noqa: E402  (builds the Tk root, which is hidden below)
+
+CHUNK = 4096  # Same as the session reader's recv size
+CHUNKS_PER_TICK = 16  # Chunks drained per process_queues tick
+
+
+def make_rules(count):
+    rules = [
+        {'pattern': 'ERROR', 'fg': 'red', 'bold': True},
+        {'pattern': 'WARN', 'fg': 'orange'},
+        {'pattern': r'\b5\d\d\b', 'regex': True, 'fg': 'magenta'},
+        {'pattern': 'panic', 'ignore_case': True, 'fg': 'white', 'bg': 'red', 'notify': True},
+        {'pattern': r'\d+\.\d+\.\d+\.\d+', 'regex': True, 'fg': 'cyan'},
+    ]
+    for i in range(count - len(rules)):
+        rules.append({'pattern': f'db-host-{i:03d}', 'fg': 'yellow'})
+    return rules[:count]
+
+
+def make_output(size_mb, seed=1):
+    rng = random.Random(seed)
+    words = ['GET', '/api/v1/items', 'status', 'took', 'ms', 'user', 'request', 'ok', 'queue', 'flush']
+    lines = []
+    size = 0
+    while size < size_mb * 1024 * 1024:
+        parts = [f'{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}']
+        parts += rng.choices(words, k=8)
+        roll = rng.random()
+        if roll < 0.02:
+            parts.append('ERROR connection reset by db-host-%03d' % rng.randint(0, 120))
+        elif roll < 0.04:
+            parts.append(f'WARN status {rng.choice([200, 404, 500, 503])} from 10.0.{rng.randint(0, 255)}.{rng.randint(0, 255)}')
+        line = ' '.join(parts) + '\n'
+        lines.append(line)
+        size += len(line)
+    text = ''.join(lines)
+    return [text[i:i + CHUNK] for i in range(0, len(text), CHUNK)]
+
+
+def bench_matcher(rules, chunks):
+    stream = app.HighlightStream()
+    matches = 0
+    start = time.perf_counter()
+    for n, chunk in enumerate(chunks):
+        ranges, alerts = stream.feed(rules, chunk, f'{n + 1}.0')
+        matches += len(ranges)
+    return time.perf_counter() - start, matches
+
+
+def bench_widget(rules, chunks):
+    text = app.tk.Text(app.root)
+    for i, rule in enumerate(rules.rules):
+        text.tag_config(f'hl{i}', foreground=rule.get('fg', ''), background=rule.get('bg', ''))
+    stream = app.HighlightStream()
+    start = time.perf_counter()
+    for tick in range(0, len(chunks), CHUNKS_PER_TICK):
+        tag_ranges = {}
+        for chunk in chunks[tick:tick + CHUNKS_PER_TICK]:
+            text.insert('end', '[2024-01-01 00:00:00] Received:\n')
+            index = text.index('end-1c')
+            text.insert('end', chunk)
+            ranges, alerts = stream.feed(rules, chunk, index)
+            for tag, a, b in ranges:
+                tag_ranges.setdefault(tag, []).extend((a, b))
+        for tag, indices in tag_ranges.items():
+            text.tag_add(tag, *indices)
+    elapsed = time.perf_counter() - start
+    text.destroy()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Highlight rule cost per MB of streamed output")
+    parser.add_argument('--mb', type=float, default=8, help="MB of output to stream")
+    parser.add_argument('--rules', type=int, default=100, help="number of active rules")
+    parser.add_argument('--json', help="write results to this JSON file")
+    args = parser.parse_args()
+
+    app.root.withdraw()
+    rules = app.HighlightRules(make_rules(args.rules))
+    chunks = make_output(args.mb)
+    mb = sum(len(c) for c in chunks) / (1024 * 1024)
+
+    baseline = time.perf_counter()
+    text = app.tk.Text(app.root)
+    for chunk in chunks:
+        text.insert('end', chunk)
+    baseline = time.perf_counter() - baseline
+    text.destroy()
+
+    matcher_time, matches = bench_matcher(rules, chunks)
+    widget_time = bench_widget(rules, chunks)
+    results = {
+        'rules': args.rules,
+        'mb': round(mb, 2),
+        'matches': matches,
+        'matcher_ms_per_mb': round(matcher_time / mb * 1000, 2),
+        'matcher_mb_per_s': round(mb / matcher_time, 2),
+        'widget_ms_per_mb': round(widget_time / mb * 1000, 2),
+        'insert_only_ms_per_mb': round(baseline / mb * 1000, 2),
+    }
+    for key, value in results.items():
+        print(f'{key:>24}: {value}')
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+# Jump-host benchmark. Starts two stand-in servers, one as the bastion and one as
+# the target, and opens N target sessions through the bastion with
+# session_worker's pooled bastion transport: sequentially, concurrently, and
+# directly for comparison. Checks that every tunnelled session gets a working
+# shell and exec channel, that all of them shared one handshake per hop, and that
+# closing the last target closes the bastions too.
+# Exits nonzero if any check fails.
+#
+# Runs headless: it drives session_worker directly and does not import app.py.
+#
+# Usage: python benchmarks/bench_jump.py [--sessions 20] [--json out.json]
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import session_worker  # noqa: E402
+import stand_in_server  # noqa: E402
+
+
+def open_sessions(port, count, options, concurrent):
+    # Open count shells on the target; returns (seconds, [(transport, channel, phases)])
+    opened = [None] * count
+    errors = []
+
+    def open_one(i):
+        try:
+            opened[i] = session_worker.open_shell('127.0.0.1', port, stand_in_server.USER, stand_in_server.PASSWORD,
+                                                  options)
+        except Exception as e:
+            errors.append(e)
+
+    start = time.perf_counter()
+    if concurrent:
+        threads = [threading.Thread(target=open_one, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    else:
+        for i in range(count):
+            open_one(i)
+    elapsed = time.perf_counter() - start
+    if errors:
+        raise RuntimeError(f"{len(errors)} of {count} sessions failed, first: {errors[0]}")
+    return elapsed, opened
+
+
+def check_session(transport, channel):
+    # The shell answers a pattern and exec runs on the same tunnelled transport
+    channel.settimeout(10)
+    channel.sendall('drip 1 0\r\n')
+    output = ''
+    while '@@DONE@@' not in output:
+        data = channel.recv(4096)
+        if not data:
+            return False
+        output += data.decode('utf-8', errors='replace')
+    result = session_worker.exec_command(transport, 'drip 1 0')
+    return result['exit_code'] == 0 and '@@DONE@@' in result['stdout']
+
+
+def close_bastions():
+    for entry in session_worker.bastions.values():
+        if entry['transport']:
+            entry['transport'].close()
+    session_worker.bastions.clear()
+
+
+def run_case(name, port, count, options, concurrent):
+    close_bastions()  # Every case starts cold, so its timings include the bastion handshake
+    elapsed, opened = open_sessions(port, count, options, concurrent)
+    try:
+        ok = all(check_session(transport, channel) for transport, channel, _ in opened)
+        phases = {}
+        for _, _, session_phases in opened:
+            for phase, seconds in session_phases.items():
+                phases.setdefault(phase, []).append(seconds)
+        bastions = [entry['transport'] for entry in session_worker.bastions.values() if entry['transport']]
+    finally:
+        for transport, channel, _ in opened:
+            transport.close()
+    # With every target closed, nothing may keep a bastion open
+    left = [entry['transport'] for entry in session_worker.bastions.values()
+            if entry['transport'] and entry['transport'].is_active()]
+    return {
+        'case': name,
+        'sessions': count,
+        'seconds': round(elapsed, 3),
+        'ms_per_session': round(elapsed / count * 1000, 1),
+        'phase_ms': {phase: round(sum(values) / len(values) * 1000, 1) for phase, values in phases.items()},
+        'bastion_transports': len(bastions),
+        'bastions_left_open': len(left),
+        'ok': ok,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sessions through a pooled jump host vs direct")
+    parser.add_argument('--sessions', type=int, default=20, help="target sessions per case")
+    parser.add_argument('--json', help="write results to this JSON file")
+    args = parser.parse_args()
+
+    session_worker.known_hosts_path = os.path.join(tempfile.mkdtemp(prefix='cf-jump-'), 'known_hosts')
+    bastion, bastion_port = stand_in_server.start()
+    target, target_port = stand_in_server.start()
+    hop = {'host': '127.0.0.1', 'port': bastion_port, 'user': stand_in_server.USER,
+           'password': stand_in_server.PASSWORD, 'options': {}}
+    # A two-hop chain (bastion -> bastion) exercises recursive tunnelling too
+    cases = [
+        ('direct', {}, False),
+        ('jump sequential', {'jump': [hop]}, False),
+        ('jump concurrent', {'jump': [hop]}, True),
+        ('jump chain x2', {'jump': [hop, dict(hop, host='localhost')]}, True),
+    ]
+    results = []
+    failed = False
+    try:
+        for name, options, concurrent in cases:
+            case = run_case(name, target_port, args.sessions, options, concurrent)
+            expected = len(options.get('jump', []))  # One pooled transport per hop, however many targets
+            if not case['ok'] or case['bastion_transports'] != expected or case['bastions_left_open']:
+                failed = True
+            results.append(case)
+            print(json.dumps(case), flush=True)
+    finally:
+        close_bastions()
+        bastion.kill()
+        target.kill()
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if failed:
+        print("FAILED: a session did not work, or bastions were not pooled or not closed")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
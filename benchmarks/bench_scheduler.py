@@ -0,0 +1,146 @@
+# Scheduler benchmark. Starts stand-in servers as separate hosts and runs jittered
+# schedules on all of them for a while with scheduler.Scheduler, checking that no
+# host ever had more than per_host runs in flight, that each host was connected to
+# once (pooled transports) and that every run succeeded. A second run adds a
+# command that hangs, checking that it times out, that it is skipped while still
+# pending rather than queueing up behind itself, and that a healthy schedule keeps
+# running next to it. Then fills a ResultStore with months of synthetic df output
+# and times the "last N results" read the results view does, reporting bytes
+# stored per result. Exits nonzero if any check fails.
+#
+# Runs headless: it drives scheduler directly and does not import app.py.
+#
+# Usage: python benchmarks/bench_scheduler.py [--hosts 4] [--seconds 10] [--records 100000] [--json out.json]
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import scheduler  # noqa: E402
+import session_worker  # noqa: E402
+import stand_in_server  # noqa: E402
+
+DF_OUTPUT = """Filesystem      Size  Used Avail Use% Mounted on
+/dev/sda1        98G   {used}G   {avail}G  {pct}% /
+tmpfs           7.8G     0  7.8G   0% /dev/shm
+/dev/sdb1       1.8T  1.1T  {data}G  61% /var/lib/postgresql
+"""
+
+
+def run_schedules(name, hosts, seconds, per_host, schedules):
+    servers = [stand_in_server.start() for _ in range(hosts)]
+    targets = {f'db-{i}': {'host': '127.0.0.1', 'port': port, 'user': stand_in_server.USER,
+                           'password': stand_in_server.PASSWORD, 'options': {}}
+               for i, (_, port) in enumerate(servers)}
+    store = scheduler.ResultStore(tempfile.mkdtemp(prefix='cf-sched-'))
+    resolve = lambda schedule: list(targets.values())  # noqa: E731
+    command_scheduler = scheduler.Scheduler(store, resolve, per_host=per_host)
+    try:
+        command_scheduler.set_schedules(schedules)
+        time.sleep(seconds)
+        command_scheduler.set_schedules([])  # Let runs already due finish, then stop
+        time.sleep(3)
+        stats = dict(command_scheduler.stats)
+    finally:
+        command_scheduler.stop()
+        for process, _ in servers:
+            process.kill()
+    results = [result for key in store.hosts() for result in store.last(key, 10 ** 6)]
+    return {
+        'case': name,
+        'hosts': hosts,
+        'seconds': seconds,
+        'per_host': per_host,
+        **stats,
+        'stored': len(results),
+        'failed_by_schedule': {schedule['name']: sum(1 for result in results if result['schedule'] == schedule['name']
+                                                     and (result['error'] or result['exit_code']))
+                               for schedule in schedules},
+    }
+
+
+def check_steady(case):
+    # Every run succeeded, within the per-host limit, over one connection per host
+    return (case['runs'] > 0 and case['failed'] == 0 and case['max_per_host'] <= case['per_host']
+            and case['connects'] == case['hosts'] and case['stored'] == case['runs'])
+
+
+def check_hung(case):
+    # The hung command timed out instead of piling up, and didn't stall the healthy one
+    return (case['timed_out'] > 0 and case['skipped'] > 0 and case['failed'] == case['timed_out']
+            and case['failed_by_schedule']['drip'] == 0 and case['max_per_host'] <= case['per_host']
+            and case['stored'] == case['runs'])
+
+
+def time_store(records, count):
+    root = tempfile.mkdtemp(prefix='cf-store-')
+    store = scheduler.ResultStore(root)
+    key = 'bench@db-1:22'
+    started = datetime.now() - timedelta(minutes=5 * records)  # Every 5 minutes, about a year for 100k
+    raw = 0
+    start = time.perf_counter()
+    for i in range(records):
+        result = {'cmd': 'df -h', 'started': started + timedelta(minutes=5 * i), 'exit_code': 0,
+                  'duration': 0.05 + i % 7 / 100, 'error': None, 'stderr': '',
+                  'stdout': DF_OUTPUT.format(used=40 + i % 50, avail=58 - i % 50, pct=41 + i % 50, data=700 - i % 90)}
+        raw += len(json.dumps(result, default=str))
+        store.append(key, 'disk usage', result)
+    append_seconds = time.perf_counter() - start
+    size = sum(os.path.getsize(os.path.join(folder, name))
+               for folder, _, names in os.walk(root) for name in names if name.endswith('.dat'))
+    times = []
+    for _ in range(20):
+        start = time.perf_counter()
+        last = store.last(key, count)
+        times.append(time.perf_counter() - start)
+    newest_first = all(a['started'] >= b['started'] for a, b in zip(last, last[1:]))
+    return {
+        'case': 'result store',
+        'records': records,
+        'segments': len([name for name in os.listdir(store._folder(key)) if name.endswith('.dat')]),
+        'append_us': round(append_seconds / records * 1e6, 1),
+        'bytes_per_result': round(size / records, 1),
+        'raw_bytes_per_result': round(raw / records, 1),
+        f'last_{count}_ms': round(min(times) * 1000, 2),
+        'ok': len(last) == count and newest_first and last[0]['stdout'].startswith('Filesystem'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scheduled runs across hosts and result store reads")
+    parser.add_argument('--hosts', type=int, default=4, help="stand-in servers to schedule on")
+    parser.add_argument('--seconds', type=float, default=10, help="how long schedules run")
+    parser.add_argument('--per-host', type=int, default=2, help="runs in flight per host")
+    parser.add_argument('--records', type=int, default=100000, help="synthetic results in the store")
+    parser.add_argument('--last', type=int, default=50, help="results read back by last()")
+    parser.add_argument('--json', help="write results to this JSON file")
+    args = parser.parse_args()
+
+    session_worker.known_hosts_path = os.path.join(tempfile.mkdtemp(prefix='cf-sched-'), 'known_hosts')
+    # Every 1s with up to 2s of jitter, so runs on a host regularly pile past per_host
+    steady = [{'name': f'drip-{i}', 'command': 'drip 1 0', 'targets': ['db-*'], 'every': 1, 'jitter': 2}
+              for i in range(3)]
+    # A command that runs 100s, cut off after 2s, next to a healthy schedule
+    hung = [{'name': 'hang', 'command': 'drip 1000 100', 'targets': ['db-*'], 'every': 1, 'jitter': 0, 'timeout': 2},
+            {'name': 'drip', 'command': 'drip 1 0', 'targets': ['db-*'], 'every': 1, 'jitter': 1}]
+    results = [run_schedules('schedule run', args.hosts, args.seconds, args.per_host, steady),
+               run_schedules('hung command', args.hosts, args.seconds, args.per_host, hung),
+               time_store(args.records, args.last)]
+    results[0]['ok'] = check_steady(results[0])
+    results[1]['ok'] = check_hung(results[1])
+    for case in results:
+        print(json.dumps(case), flush=True)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if not all(case['ok'] for case in results):
+        print("FAILED: a run failed or hung, a limit was exceeded, or stored results did not read back")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+# End-to-end session benchmark. Starts the stand-in server in a subprocess, opens
+# 1..N real session tabs through app.create_session (hidden Tk root), makes the
+# server emit an output pattern, and runs the normal SSHSession reader ->
+# output_queue -> process_queues -> Text widget path until every session is done.
+#
+# Reports throughput, p50/p99 latency (server send to end of the GUI tick that
+# displayed it), CPU time and memory per scenario, and saves JSON results so runs
+# on different commits can be compared:
+#
+#   python benchmarks/bench_sessions.py [--sessions 1,10,50,200] [--patterns flood,ansi,tiny,drip]
+#   python benchmarks/bench_sessions.py --compare results/old.json results/new.json
+import argparse
+import json
+import os
+import platform
+import queue
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+MARKER = re.compile(r'@@T(\d+)@@')
+DONE = '@@DONE@@'
+
+
+# Output queue that notes the server's latency markers as process_queues
+# dequeues chunks. A short tail is kept so markers split across chunks count.
+class MarkerQueue(queue.Queue):
+    def __init__(self):
+        super().__init__()
+        self.tail = ''
+        self.seen = []  # Marker send times dequeued during the current tick
+        self.chars = 0
+        self.done = False
+
+    def get_nowait(self):
+        item = super().get_nowait()
+        self.chars += len(item)
+        text = self.tail + item
+        cut = max(0, len(text) - 40)
+        for match in MARKER.finditer(text):
+            self.seen.append(int(match.group(1)))
+            cut = max(cut, match.end())
+        if DONE in text:
+            self.done = True
+        self.tail = text[cut:]
+        return item
+
+
+def rss_bytes():
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def pump_until(app, condition, timeout):
+    # Run the real Tk event loop (so process_queues ticks as in the app) until done
+    deadline = time.monotonic() + timeout
+
+    def check():
+        if condition() or time.monotonic() > deadline:
+            app.root.quit()
+        else:
+            app.root.after(20, check)
+    app.root.after(20, check)
+    app.root.mainloop()
+    return condition()
+
+
+def pattern_command(pattern, count, args):
+    if pattern in ('flood', 'ansi'):
+        return f'{pattern} {max(64 * 1024, int(args.total_mb * 1024 * 1024 / count))}'
+    if pattern == 'tiny':
+        return f'tiny {max(500, args.tiny_chunks // count)}'
+    return f'drip {args.drip_lines} {args.drip_interval}'
+
+
+def run_scenario(app, stand_in_server, port, pattern, count, args, tick_state):
+    before = set(app.sessions)
+    for i in range(count):
+        app.create_session('127.0.0.1', port, stand_in_server.USER, stand_in_server.PASSWORD, f'{pattern}-{i}')
+    frames = [frame for frame in app.sessions if frame not in before]
+    if len(frames) < count:
+        raise RuntimeError(f"only {len(frames)} of {count} sessions connected")
+    queues = []
+    for frame in frames:
+        session = app.sessions[frame]
+        marker_queue = MarkerQueue()
+        old_queue, session.output_queue = session.output_queue, marker_queue
+        try:
+            while True:
+                marker_queue.put(old_queue.get_nowait())
+        except queue.Empty:
+            pass
+        queues.append(marker_queue)
+    pump_until(app, lambda: False, 0.3)  # Let banners and prompts drain
+    for marker_queue in queues:
+        marker_queue.seen.clear()
+        marker_queue.chars = 0
+
+    latencies = []
+    tick_state['queues'] = queues
+    tick_state['latencies'] = latencies
+    app.metrics.reset()
+    rss_before = rss_bytes()
+    command = pattern_command(pattern, count, args)
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    for frame in frames:
+        app.sessions[frame].send(command)
+    finished = pump_until(app, lambda: all(q.done for q in queues), args.timeout)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    rss_after = rss_bytes()
+    snapshot = app.metrics.snapshot()
+    tick = snapshot['timings'].get(('process_queues_tick', ''), {})
+    chars = sum(q.chars for q in queues)
+
+    for frame in frames:
+        app.close_session(frame)
+        frame.destroy()
+    tick_state['queues'] = []
+    return {
+        'pattern': pattern,
+        'sessions': count,
+        'command': command,
+        'completed': finished,
+        'seconds': round(elapsed, 3),
+        'mb': round(chars / (1024 * 1024), 3),
+        'mb_per_s': round(chars / (1024 * 1024) / elapsed, 3),
+        'latency_p50_ms': percentile(latencies, 0.5),
+        'latency_p99_ms': percentile(latencies, 0.99),
+        'latency_samples': len(latencies),
+        'cpu_seconds': round(cpu, 3),
+        'cpu_percent': round(cpu / elapsed * 100, 1),
+        'rss_mb': round(rss_after / (1024 * 1024), 1) if rss_after else None,
+        'rss_delta_mb': round((rss_after - rss_before) / (1024 * 1024), 1) if rss_after and rss_before else None,
+        'tick_p50_ms': round(tick.get('p50', 0) * 1000, 3),
+        'tick_p99_ms': round(tick.get('p99', 0) * 1000, 3),
+        'tick_max_ms': round(tick.get('max', 0) * 1000, 3),
+    }
+
+
+def install_tick_hook(app, tick_state):
+    # Stamp every marker dequeued in a tick with the time that tick finished,
+    # i.e. after the text was inserted into the widget
+    original = app.process_queues
+
+    def process_queues():
+        original()
+        now = time.time_ns()
+        for marker_queue in tick_state['queues']:
+            tick_state['latencies'].extend(round((now - sent) / 1e6, 3) for sent in marker_queue.seen)
+            marker_queue.seen.clear()
+    app.process_queues = process_queues  # process_queues reschedules itself through this global
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    old_runs = {(r['pattern'], r['sessions']): r for r in old['scenarios']}
+    keys = ('mb_per_s', 'latency_p50_ms', 'latency_p99_ms', 'cpu_seconds', 'rss_delta_mb', 'tick_p99_ms')
+    print(f"{old['commit']} -> {new['commit']}")
+    print(f"{'scenario':<16}" + ''.join(f'{key:>22}' for key in keys))
+    for run in new['scenarios']:
+        base = old_runs.get((run['pattern'], run['sessions']))
+        if base is None:
+            continue
+        cells = []
+        for key in keys:
+            if base.get(key) in (None, 0) or run.get(key) is None:
+                cells.append(f"{str(run.get(key)):>22}")
+            else:
+                change = (run[key] - base[key]) / base[key] * 100
+                cells.append(f"{run[key]:>12} ({change:+6.1f}%)")
+        print(f"{run['pattern'] + ' x' + str(run['sessions']):<16}" + ''.join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end session benchmark against a local paramiko server")
+    parser.add_argument('--sessions', default='1,10,50,200', help="comma-separated session counts")
+    parser.add_argument('--patterns', default='flood,ansi,tiny,drip', help="comma-separated output patterns")
+    parser.add_argument('--total-mb', type=float, default=32, help="flood/ansi MB per scenario, split across sessions")
+    parser.add_argument('--tiny-chunks', type=int, default=200000, help="tiny chunks per scenario, split across sessions")
+    parser.add_argument('--drip-lines', type=int, default=40, help="drip lines per session")
+    parser.add_argument('--drip-interval', type=int, default=50, help="ms between drip lines")
+    parser.add_argument('--timeout', type=float, default=180, help="seconds allowed per scenario")
+    parser.add_argument('--out', help="results file (default benchmarks/results/<commit>-<time>.json)")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="compare two results files and exit")
+    args = parser.parse_args()
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    import app
+    import stand_in_server
+    app.root.withdraw()
+    app.metrics.enabled = True
+    tick_state = {'queues': [], 'latencies': []}
+    install_tick_hook(app, tick_state)
+    process, port = stand_in_server.start()
+    scenarios = []
+    try:
+        for count in [int(n) for n in args.sessions.split(',')]:
+            for pattern in args.patterns.split(','):
+                result = run_scenario(app, stand_in_server, port, pattern, count, args, tick_state)
+                scenarios.append(result)
+                print(json.dumps(result), flush=True)
+    finally:
+        process.kill()
+
+    results = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'scenarios': scenarios,
+    }
+    out = args.out or os.path.join(BENCH_DIR, 'results', f"{results['commit']}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved {out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+# Benchmark for the SFTP transfer panel's engine (app.SFTPTransfers) against the
+# local stand-in server. Reports throughput for many small files and for one large
+# file, uploading and downloading, with 1 worker and with the default pool.
+#
+# Usage: python benchmarks/bench_sftp.py [--small 500] [--small-kb 8] [--large-mb 256] [--json out.json]
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import paramiko
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app  # noqa: E402  (builds the Tk root, which is hidden below)
+import stand_in_server  # noqa: E402
+
+
+def connect(port):
+    transport = paramiko.Transport(('127.0.0.1', port))
+    transport.connect(username=stand_in_server.USER, password=stand_in_server.PASSWORD)
+    return transport
+
+
+def run(transfers, queue_all):
+    start = time.perf_counter()
+    jobs = queue_all()
+    while any(job['status'] in ('queued', 'running') for job in jobs):
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    failed = [job for job in jobs if job['status'] != 'done']
+    if failed:
+        raise RuntimeError(f"{len(failed)} transfers failed, first: {failed[0]['error']}")
+    return elapsed, sum(job['size'] for job in jobs)
+
+
+def bench_case(port, workers, local_files, remote_dir, download_dir):
+    transport = connect(port)
+    transfers = app.SFTPTransfers(transport, workers=workers)
+    try:
+        transfers.browser.mkdir(remote_dir)
+        up_time, size = run(transfers, lambda: [transfers.upload(path, f'{remote_dir}/{os.path.basename(path)}')
+                                                for path in local_files])
+        os.makedirs(download_dir, exist_ok=True)
+        down_time, _ = run(transfers, lambda: [transfers.download(f'{remote_dir}/{os.path.basename(path)}',
+                                                                  os.path.join(download_dir, os.path.basename(path)))
+                                               for path in local_files])
+    finally:
+        transfers.close()
+        transport.close()
+    mb = size / (1024 * 1024)
+    return {
+        'workers': workers,
+        'files': len(local_files),
+        'mb': round(mb, 2),
+        'upload_mb_per_s': round(mb / up_time, 2),
+        'upload_files_per_s': round(len(local_files) / up_time, 1),
+        'download_mb_per_s': round(mb / down_time, 2),
+        'download_files_per_s': round(len(local_files) / down_time, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SFTP throughput against a local paramiko server")
+    parser.add_argument('--small', type=int, default=500, help="number of small files")
+    parser.add_argument('--small-kb', type=int, default=8, help="size of each small file in KB")
+    parser.add_argument('--large-mb', type=int, default=256, help="size of the large file in MB")
+    parser.add_argument('--json', help="write results to this JSON file")
+    args = parser.parse_args()
+
+    app.root.withdraw()
+    work = tempfile.mkdtemp(prefix='cf-sftp-')
+    served = os.path.join(work, 'served')
+    os.makedirs(served)
+    process, port = stand_in_server.start('--root', served)
+    try:
+        small_dir = os.path.join(work, 'small')
+        os.makedirs(small_dir)
+        small_files = []
+        for i in range(args.small):
+            path = os.path.join(small_dir, f'file{i:05d}.conf')
+            with open(path, 'wb') as f:
+                f.write(os.urandom(args.small_kb * 1024))
+            small_files.append(path)
+        large_file = os.path.join(work, 'large.bin')
+        with open(large_file, 'wb') as f:
+            for _ in range(args.large_mb):
+                f.write(os.urandom(1024 * 1024))
+
+        results = []
+        for workers in (1, app.SFTP_WORKERS):
+            for name, files in (('small', small_files), ('large', [large_file])):
+                case = bench_case(port, workers, files, f'/{name}-{workers}', os.path.join(work, f'down-{name}-{workers}'))
+                case['case'] = name
+                results.append(case)
+                print(json.dumps(case))
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(results, f, indent=2)
+    finally:
+        process.kill()
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
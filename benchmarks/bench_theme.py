@@ -0,0 +1,174 @@
+# Theme switching benchmark. Opens 100 session tabs (pointed at a closed port, so
+# they fail to connect at once but keep all their widgets) and a commands notebook
+# with 2000 buttons, then times toggling dark mode with app.switch_theme (option
+# database, ttk styles, one Tcl recolour pass) against the recursive Python walk
+# it replaced (legacy_apply_theme below). Also times building a 500-widget dialog
+# with and without that walk, the cost every dialog used to pay on opening.
+#
+# Needs a display: without $DISPLAY it starts Xvfb if that is installed, and exits
+# with a message if not. Saves and restores the theme setting it toggles.
+#
+# Usage: python benchmarks/bench_theme.py [--tabs 100] [--buttons 2000] [--rounds 5] [--json out.json]
+import argparse
+import atexit
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+
+
+def ensure_display():
+    # app builds its Tk root on import, so a display must exist before that
+    if os.environ.get('DISPLAY'):
+        return
+    if not shutil.which('Xvfb'):
+        sys.exit("bench_theme needs a display: set DISPLAY or install Xvfb")
+    read_fd, write_fd = os.pipe()
+    # -displayfd picks a free display number and writes it once the server is ready
+    server = subprocess.Popen(['Xvfb', '-displayfd', str(write_fd), '-screen', '0', '1920x1080x24', '-nolisten', 'tcp'],
+                              pass_fds=(write_fd,), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        display = f.readline().strip()
+    if not display:
+        sys.exit("Xvfb failed to start")
+    atexit.register(server.kill)
+    os.environ['DISPLAY'] = f':{display}'
+
+
+ensure_display()
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app  # noqa: E402  (builds the Tk root, which is hidden below)
+
+tk = app.tk
+ttk = app.ttk
+
+
+def legacy_apply_theme(widget, theme):
+    # The per-widget walk switch_theme used before named styles. As it was, it
+    # raised on ttk.Frame (session tabs) and ttk.Combobox, which have no bg
+    # options; those branches are left out so it can run at all.
+    colors = app.themes[theme]
+    if isinstance(widget, (tk.Tk, tk.Toplevel, tk.Frame)):
+        widget.config(bg=colors['bg'])
+    elif isinstance(widget, tk.Label):
+        widget.config(bg=colors['bg'], fg=colors['fg'])
+    elif isinstance(widget, tk.Button):
+        if 'Interrupt' in widget.cget('text'):
+            widget.config(bg=colors['interrupt_bg'], fg=colors['interrupt_fg'])
+        else:
+            widget.config(bg=colors['button_bg'], fg=colors['button_fg'])
+    elif isinstance(widget, tk.Entry):
+        widget.config(bg=colors['text_bg'], fg=colors['fg'], insertbackground=colors['fg'])
+    elif isinstance(widget, tk.Text):
+        widget.config(bg=colors['text_bg'], fg=colors['text_fg'], insertbackground=colors['fg'])
+    elif isinstance(widget, tk.Listbox):
+        widget.config(bg=colors['text_bg'], fg=colors['fg'])
+    elif isinstance(widget, tk.Checkbutton):
+        widget.config(bg=colors['bg'], fg=colors['fg'], selectcolor=colors['check_select'],
+                      activebackground=colors['bg'], activeforeground=colors['fg'])
+    elif isinstance(widget, ttk.Notebook):
+        style = ttk.Style()
+        style.theme_use('default')
+        style.configure("TNotebook", background=colors['notebook_bg'])
+        style.configure("TNotebook.Tab", background=colors['button_bg'], foreground=colors['button_fg'])
+        style.map("TNotebook.Tab", background=[("selected", colors['bg'])], foreground=[("selected", colors['fg'])])
+    for child in widget.winfo_children():
+        legacy_apply_theme(child, theme)
+
+
+def legacy_switch_theme(theme):
+    legacy_apply_theme(app.root, theme)
+    for win in app.root.winfo_children():
+        if isinstance(win, tk.Toplevel):
+            legacy_apply_theme(win, theme)
+    for tab in app.session_notebook.tabs():
+        legacy_apply_theme(app.root.nametowidget(tab), theme)
+
+
+def time_switches(switch, rounds):
+    times = []
+    for i in range(rounds * 2):
+        start = time.perf_counter()
+        switch('dark' if i % 2 == 0 else 'light')
+        app.root.update_idletasks()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def build_dialog(widgets):
+    dialog = tk.Toplevel(app.root)
+    for i in range(widgets // 2):
+        tk.Label(dialog, text=f"Field {i}:").grid(row=i, column=0)
+        tk.Entry(dialog).grid(row=i, column=1)
+    return dialog
+
+
+def time_dialogs(widgets, rounds, legacy):
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        dialog = build_dialog(widgets)
+        if legacy:
+            legacy_apply_theme(dialog, app.current_theme)
+        app.root.update_idletasks()
+        times.append(time.perf_counter() - start)
+        dialog.destroy()
+    return times
+
+
+def summary(name, times):
+    return {'case': name, 'mean_ms': round(sum(times) / len(times) * 1000, 2),
+            'max_ms': round(max(times) * 1000, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Theme switch cost, option database and styles vs widget walk")
+    parser.add_argument('--tabs', type=int, default=100, help="session tabs to open")
+    parser.add_argument('--buttons', type=int, default=2000, help="command buttons across 20 categories")
+    parser.add_argument('--rounds', type=int, default=5, help="dark/light toggles (and dialogs) to time")
+    parser.add_argument('--json', help="write results to this JSON file")
+    args = parser.parse_args()
+
+    app.root.withdraw()
+    original = app.current_theme
+    probe = socket.socket()
+    probe.bind(('127.0.0.1', 0))
+    closed_port = probe.getsockname()[1]
+    probe.close()
+    for i in range(args.tabs):
+        app.create_session('127.0.0.1', closed_port, 'bench', 'bench', f'tab-{i}', background=True)
+    app.commands.clear()  # Not saved, so the real commands files are left alone
+    app.commands.update({f'category-{c}': {'commands': {f'cmd-{c}-{i}': 'uptime' for i in range(args.buttons // 20)},
+                                           'reference': {'text': '', 'images': []}}
+                         for c in range(20)})
+    app.sync_commands_notebook()
+    app.root.update_idletasks()
+    app.root.tk.eval('''
+        proc count_widgets {w} {
+            set n 1
+            foreach child [winfo children $w] {incr n [count_widgets $child]}
+            return $n
+        }''')
+    widgets = int(app.root.tk.eval('count_widgets .'))
+
+    results = [
+        summary('switch legacy walk', time_switches(legacy_switch_theme, args.rounds)),
+        summary('switch styles + option db', time_switches(app.switch_theme, args.rounds)),
+        summary('dialog 500 widgets + legacy walk', time_dialogs(500, args.rounds, True)),
+        summary('dialog 500 widgets, option db', time_dialogs(500, args.rounds, False)),
+    ]
+    app.switch_theme(original)
+    for case in results:
+        case['widgets'] = widgets
+        print(json.dumps(case))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+# Scaling benchmark for session worker processes (session_worker.py). Busy sessions
+# flood output from the stand-in server while this process plays the GUI: it drains
+# every session's output and runs a 10 ms timer, the way Tk's after() loop would.
+# Compares all sessions in-process (today's threading model) against the same
+# sessions spread over 1, 2, 4, ... worker processes, reporting aggregate MB/s and
+# how late the timer fires (the stutter a GUI would show).
+#
+# Runs headless: it drives session_worker directly and does not import app.py.
+#
+# Usage: python benchmarks/bench_workers.py [--sessions 12] [--mb 8] [--workers 1,2,4] [--json out.json]
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import session_worker  # noqa: E402
+import stand_in_server  # noqa: E402
+
+TICK = 0.010
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def run_case(port, sessions, size, workers):
+    inbox = queue.Queue()
+    if workers == 0:
+        hosts = [session_worker.SessionHost(inbox.put)]
+        handles = []
+        request = lambda sid, *message: hosts[0].handle(message[:1] + (sid,) + message[1:])
+    else:
+        exited = []
+        handles = [session_worker.SessionWorker(inbox.put, exited.append) for _ in range(workers)]
+        request = lambda sid, *message: handles[sid % workers].request(message[0], sid, *message[1:])
+
+    try:
+        for sid in range(sessions):
+            request(sid, 'open', '127.0.0.1', port, stand_in_server.USER, stand_in_server.PASSWORD)
+        opened = set()
+        while len(opened) < sessions:
+            message = inbox.get(timeout=60)
+            if message[0] == 'error':
+                raise RuntimeError(message[2])
+            if message[0] == 'opened':
+                opened.add(message[1])
+        time.sleep(0.2)
+        while not inbox.empty():
+            inbox.get_nowait()  # Prompts
+
+        tails = {sid: '' for sid in range(sessions)}
+        done = set()
+        received = 0
+        lateness = []
+        start = time.perf_counter()
+        for sid in range(sessions):
+            request(sid, 'send', f'flood {size}\r\n')
+        # The "GUI" loop: sleep a tick, then drain everything that arrived
+        while len(done) < sessions:
+            before = time.perf_counter()
+            time.sleep(TICK)
+            lateness.append(time.perf_counter() - before - TICK)
+            try:
+                while True:
+                    message = inbox.get_nowait()
+                    if message[0] != 'output':
+                        continue
+                    sid, text = message[1], message[2]
+                    received += len(text)
+                    if '@@DONE@@' in tails[sid] + text:
+                        done.add(sid)
+                    tails[sid] = text[-16:]
+            except queue.Empty:
+                pass
+            if time.perf_counter() - start > 300:
+                raise RuntimeError("timed out")
+        elapsed = time.perf_counter() - start
+    finally:
+        if workers == 0:
+            hosts[0].close_all()
+        for handle in handles:
+            handle.stop()
+    mb = received / (1024 * 1024)
+    return {
+        'workers': workers,
+        'sessions': sessions,
+        'mb': round(mb, 2),
+        'mb_per_s': round(mb / elapsed, 2),
+        'timer_late_p50_ms': round(percentile(lateness, 0.5) * 1000, 2),
+        'timer_late_p99_ms': round(percentile(lateness, 0.99) * 1000, 2),
+        'timer_late_max_ms': round(max(lateness) * 1000, 2),
+    }
+
+
+def main():
+    cores = os.cpu_count() or 1
+    default_workers = ','.join(str(n) for n in (1, 2, 4, 8, 16) if n <= max(1, cores))
+    parser = argparse.ArgumentParser(description="Session throughput and GUI-loop stalls, in-process vs worker processes")
+    parser.add_argument('--sessions', type=int, default=12, help="busy sessions")
+    parser.add_argument('--mb', type=float, default=8, help="MB flooded per session")
+    parser.add_argument('--workers', default=default_workers, help="comma-separated worker process counts")
+    parser.add_argument('--json', help="write results to this JSON file")
+    args = parser.parse_args()
+
+    process, port = stand_in_server.start()
+    results = []
+    try:
+        for workers in [0] + [int(n) for n in args.workers.split(',')]:
+            case = run_case(port, args.sessions, int(args.mb * 1024 * 1024), workers)
+            results.append(case)
+            print(json.dumps(case), flush=True)
+    finally:
+        process.kill()
+    print(f"cores: {cores}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'cores': cores, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
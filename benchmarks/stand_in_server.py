@@ -0,0 +1,404 @@
+# Local paramiko SSH server standing in for real hosts in the benchmarks.
+# Accepts password logins, serves SFTP from a local folder, and runs a shell (or
+# exec command) that emits configurable output patterns:
+#
+#   flood <bytes>                plain text as fast as possible
+#   ansi <bytes>                 colour, cursor and title escape sequences
+#   tiny <chunks>                many 1-10 byte sends
+#   drip <lines> <interval_ms>   one line per interval
+#   seq 1 <n>                    like seq(1), without markers (the link probe)
+#
+# Every pattern embeds "@@T<time_ns>@@" markers (wall clock at send time) so
+# clients can measure latency, and ends with "@@DONE@@".
+#
+# It also forwards direct-tcpip channels, so a second instance can stand in for a
+# bastion in front of the first, and honours tcpip-forward requests (remote port
+# forwards), opening a forwarded-tcpip channel for each connection it accepts.
+#
+# Run standalone:  python benchmarks/stand_in_server.py --root DIR [--port 0]
+# It prints "PORT <n>" once listening, so benchmarks can start it as a subprocess
+# and keep its CPU and memory out of their own measurements.
+import argparse
+import os
+import random
+import select
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import paramiko
+
+USER = 'bench'
+PASSWORD = 'bench'
+PROMPT = 'bench$ '
+MARKER_EVERY = 64 * 1024  # Bytes between latency markers in bulk patterns
+SEND_SIZE = 32 * 1024
+
+ANSI_LINE = ('\x1b]0;bench title\x07\x1b[1;31mERROR\x1b[0m \x1b[32mok\x1b[0m \x1b[2K\x1b[1G'
+             '\x1b[38;5;208mcolour\x1b[0m \x1b[4munderline\x1b[24m progress [\x1b[7m####\x1b[27m    ]\r\n')
+TEXT_LINE = 'INFO request handled in 12ms status=200 path=/api/v1/items user=bench\r\n'
+
+
+def marker():
+    return f'@@T{time.time_ns()}@@\r\n'
+
+
+def bulk(line, size):
+    # Yield sends of up to SEND_SIZE bytes with a marker every MARKER_EVERY bytes
+    block = (line * (MARKER_EVERY // len(line) + 1))[:MARKER_EVERY - 40]
+    sent = 0
+    while sent < size:
+        payload = marker() + block
+        for i in range(0, len(payload), SEND_SIZE):
+            yield payload[i:i + SEND_SIZE]
+        sent += len(payload)
+
+
+def run_pattern(channel, words):
+    # Emit one output pattern on the channel; returns False for unknown commands
+    name, args = words[0], [int(w) for w in words[1:] if w.isdigit()]
+    if name == 'flood':
+        for data in bulk(TEXT_LINE, args[0] if args else 1 << 20):
+            channel.sendall(data)
+    elif name == 'ansi':
+        for data in bulk(ANSI_LINE, args[0] if args else 1 << 20):
+            channel.sendall(data)
+    elif name == 'tiny':
+        rng = random.Random(1)
+        pending = ''
+        for i in range(args[0] if args else 10000):
+            if not pending:
+                pending = marker() if i % 500 == 0 else TEXT_LINE
+            cut = rng.randint(1, 10)
+            channel.sendall(pending[:cut])
+            pending = pending[cut:]
+        channel.sendall(pending)
+    elif name == 'seq':
+        # seq 1 N, as used by the app's "measure link" probe
+        lines = args[-1] if args else 1000
+        for start in range(1, lines + 1, 4096):
+            channel.sendall(''.join(f'{n}\n' for n in range(start, min(lines, start + 4095) + 1)))
+        return True
+    elif name == 'drip':
+        count = args[0] if args else 100
+        interval = (args[1] if len(args) > 1 else 50) / 1000
+        for _ in range(count):
+            channel.sendall(marker())
+            time.sleep(interval)
+    else:
+        return False
+    channel.sendall('@@DONE@@\r\n')
+    return True
+
+
+def shell_loop(channel):
+    # Line-oriented fake shell: each line names a pattern; anything else is echoed
+    channel.sendall(PROMPT)
+    buffer = ''
+    try:
+        while True:
+            data = channel.recv(4096)
+            if not data:
+                break
+            buffer += data.decode('utf-8', errors='replace')
+            while '\r' in buffer or '\n' in buffer:
+                line, buffer = buffer.replace('\r\n', '\n').replace('\r', '\n').split('\n', 1)
+                words = line.split()
+                if words and not run_pattern(channel, words):
+                    channel.sendall(line + '\r\n')
+                channel.sendall(PROMPT)
+    except (EOFError, OSError):
+        pass
+    channel.close()
+
+
+def exec_command(channel, command):
+    # Give paramiko time to answer the exec request before output (and close) go out
+    time.sleep(0.05)
+    try:
+        words = command.decode('utf-8', errors='replace').split()
+        ok = bool(words) and run_pattern(channel, words)
+        channel.send_exit_status(0 if ok else 127)
+    except (EOFError, OSError):
+        pass
+    channel.close()
+
+
+def forward_channel(channel, destination):
+    # Pump a direct-tcpip channel to its destination until either side closes
+    try:
+        sock = socket.create_connection(destination)
+    except OSError:
+        channel.close()
+        return
+    pump_socket(channel, sock)
+
+
+def pump_socket(channel, sock):
+    # Copy both ways; EOF on one side is passed on as a half-close, so request/response
+    # clients that shut down their sending side still get the reply
+    open_ends = [sock, channel]
+    try:
+        while open_ends:
+            readable, _, _ = select.select(open_ends, [], [])
+            if sock in readable:
+                data = sock.recv(65536)
+                if data:
+                    channel.sendall(data)
+                else:
+                    channel.shutdown_write()
+                    open_ends.remove(sock)
+            if channel in readable:
+                data = channel.recv(65536)
+                if data:
+                    sock.sendall(data)
+                else:
+                    sock.shutdown(socket.SHUT_WR)
+                    open_ends.remove(channel)
+    except (OSError, EOFError):
+        pass
+    sock.close()
+    channel.close()
+
+
+def remote_forward_loop(transport, listener, address):
+    # Accept connections on a tcpip-forward listener and tunnel each back to the client
+    while True:
+        try:
+            sock, origin = listener.accept()
+        except OSError:
+            return
+        try:
+            channel = transport.open_forwarded_tcpip_channel(origin, address)
+        except (paramiko.SSHException, OSError):
+            sock.close()
+            continue
+        threading.Thread(target=pump_socket, args=(channel, sock), daemon=True).start()
+
+
+class StandInServer(paramiko.ServerInterface):
+    def __init__(self, options, transport):
+        self.options = options
+        self.transport = transport
+        self.forwards = {}  # {channel id: destination} for accepted direct-tcpip opens
+        self.listeners = {}  # {(address, port): listening socket} for remote forwards
+        self.sessions = {}  # {channel id: channel} accepted and waiting for their shell or exec request
+
+    def get_allowed_auths(self, username):
+        return 'password,publickey'
+
+    def check_auth_publickey(self, username, key):
+        # Any key is accepted for the bench user, so key-auth profiles can be measured
+        return paramiko.AUTH_SUCCESSFUL if username == USER else paramiko.AUTH_FAILED
+
+    def check_auth_password(self, username, password):
+        if username == USER and password == PASSWORD:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_channel_request(self, kind, chanid):
+        if kind == 'session':
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_direct_tcpip_request(self, chanid, origin, destination):
+        self.forwards[chanid] = destination
+        return paramiko.OPEN_SUCCEEDED
+
+    def check_port_forward_request(self, address, port):
+        try:
+            listener = socket.create_server((address or '127.0.0.1', port), backlog=512)
+        except OSError:
+            return False
+        port = listener.getsockname()[1]
+        self.listeners[(address, port)] = listener
+        threading.Thread(target=remote_forward_loop, args=(self.transport, listener, (address, port)),
+                         daemon=True).start()
+        return port
+
+    def cancel_port_forward_request(self, address, port):
+        listener = self.listeners.pop((address, port), None)
+        if listener is not None:
+            listener.close()
+
+    def check_channel_pty_request(self, channel, term, width, height, pixelwidth, pixelheight, modes):
+        return True
+
+    def check_channel_shell_request(self, channel):
+        self.sessions.pop(channel.get_id(), None)  # shell_loop holds it from here
+        threading.Thread(target=shell_loop, args=(channel,), daemon=True).start()
+        return True
+
+    def check_channel_exec_request(self, channel, command):
+        self.sessions.pop(channel.get_id(), None)
+        threading.Thread(target=exec_command, args=(channel, command), daemon=True).start()
+        return True
+
+    def check_channel_subsystem_request(self, channel, name):
+        self.sessions.pop(channel.get_id(), None)
+        return super().check_channel_subsystem_request(channel, name)
+
+
+class StandInSFTPHandle(paramiko.SFTPHandle):
+    def stat(self):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def chattr(self, attr):
+        return paramiko.SFTP_OK
+
+
+# SFTP server backed by a local folder, modelled on paramiko's own test stub
+class StandInSFTPServer(paramiko.SFTPServerInterface):
+    def __init__(self, server, root, *args, **kwargs):
+        super().__init__(server, *args, **kwargs)
+        self.root = root
+
+    def _local(self, path):
+        return os.path.join(self.root, self.canonicalize(path).lstrip('/'))
+
+    def canonicalize(self, path):
+        path = path if path.startswith('/') else '/' + path
+        return os.path.normpath(path).replace('\\', '/')
+
+    def list_folder(self, path):
+        local = self._local(path)
+        try:
+            result = []
+            for name in os.listdir(local):
+                attr = paramiko.SFTPAttributes.from_stat(os.stat(os.path.join(local, name)))
+                attr.filename = name
+                result.append(attr)
+            return result
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def stat(self, path):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.stat(self._local(path)))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    lstat = stat
+
+    def open(self, path, flags, attr):
+        local = self._local(path)
+        try:
+            fd = os.open(local, flags | getattr(os, 'O_BINARY', 0), 0o644)
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        if flags & os.O_WRONLY:
+            mode = 'ab' if flags & os.O_APPEND else 'wb'
+        elif flags & os.O_RDWR:
+            mode = 'a+b' if flags & os.O_APPEND else 'r+b'
+        else:
+            mode = 'rb'
+        handle = StandInSFTPHandle(flags)
+        handle.filename = local
+        handle.readfile = handle.writefile = os.fdopen(fd, mode)
+        return handle
+
+    def remove(self, path):
+        try:
+            os.remove(self._local(path))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+    def rename(self, oldpath, newpath):
+        if os.path.exists(self._local(newpath)):
+            return paramiko.SFTP_FAILURE
+        try:
+            os.rename(self._local(oldpath), self._local(newpath))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+    def posix_rename(self, oldpath, newpath):
+        try:
+            os.replace(self._local(oldpath), self._local(newpath))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+    def mkdir(self, path, attr):
+        try:
+            os.mkdir(self._local(path))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+    def rmdir(self, path):
+        try:
+            os.rmdir(self._local(path))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+    def chattr(self, path, attr):
+        return paramiko.SFTP_OK
+
+
+def serve_connection(sock, host_key, options):
+    transport = paramiko.Transport(sock)
+    transport.add_server_key(host_key)
+    transport.use_compression(True)  # Offer zlib so compressed links can be measured
+    transport.set_subsystem_handler('sftp', paramiko.SFTPServer, StandInSFTPServer, options.root)
+    server = StandInServer(options, transport)
+    transport.start_server(server=server)
+    # Keep the connection alive until the client goes away, forwarding tunnels as they open
+    while transport.is_active():
+        channel = transport.accept(1)
+        if channel is not None and channel.get_id() in server.forwards:
+            destination = server.forwards.pop(channel.get_id())
+            threading.Thread(target=forward_channel, args=(channel, destination), daemon=True).start()
+        elif channel is not None:
+            # A channel nothing refers to is closed when collected, and the next accept
+            # would drop this one before its request arrives when sessions open together
+            server.sessions[channel.get_id()] = channel
+    for listener in server.listeners.values():
+        listener.close()
+
+
+def serve(options, ready=None):
+    host_key = paramiko.RSAKey.generate(2048)
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(('127.0.0.1', options.port))
+    listener.listen(512)
+    port = listener.getsockname()[1]
+    if ready is not None:
+        ready(port)
+    while True:
+        sock, addr = listener.accept()
+        threading.Thread(target=serve_connection, args=(sock, host_key, options), daemon=True).start()
+
+
+def start(*args):
+    # Start the server in a subprocess; returns (process, port)
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), *args], stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line.startswith('PORT '):
+        process.kill()
+        raise RuntimeError(f"stand-in server failed to start: {line!r}")
+    return process, int(line.split()[1])
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Local paramiko stand-in server for benchmarks")
+    parser.add_argument('--port', type=int, default=0, help="port to listen on (0 picks a free one)")
+    parser.add_argument('--root', default=os.getcwd(), help="folder served over SFTP")
+    return parser.parse_args(argv)
+
+
+def main():
+    options = parse_args()
+    serve(options, ready=lambda port: print(f'PORT {port}', flush=True))
+
+
+if __name__ == '__main__':
+    main()
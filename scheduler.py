@@ -0,0 +1,339 @@
+# Scheduled commands. A schedule runs one command every N seconds on each of its
+# targets (saved connections, resolved when it fires). Runs start at a random
+# offset of up to "jitter" seconds so a fleet isn't hit all at once, go through
+# a bounded thread pool, and never overlap more than per_host times on one host.
+# A run still pending (waiting to start, queued or running) when its schedule fires
+# again on that host is not doubled up; the new run is skipped. Runs that outlast
+# the schedule's timeout are cut off, so a hung command can't hold a slot forever.
+# Hosts keep one pooled transport between runs, and results are appended to a
+# ResultStore.
+#
+# Like session_worker, this module must stay importable without Tk.
+import heapq
+import itertools
+import json
+import os
+import random
+import re
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from session_worker import connect_transport, exec_command
+
+SCHEDULER_WORKERS = 8  # Runs in flight across all hosts
+SCHEDULER_PER_HOST = 2  # Runs in flight on any one host
+SCHEDULER_IDLE = 900  # Seconds a pooled transport may sit unused before it is closed
+SCHEDULER_TIMEOUT = 300  # Default seconds a run may take before its channel is closed
+
+# Results are kept per host in one append-only segment file per month:
+#   <root>/<host key>/<YYYY-MM>.dat
+# Every record is framed as a 4-byte length, the data, and the length again, so
+# last() can walk a segment backwards from its end: the newest N results cost N
+# short reads however many months have piled up. A segment's first record is the
+# JSON of its first result, kept as is; the rest are the JSON list
+# [time, schedule, cmd, exit_code, duration, error, stdout, stderr] deflated with
+# that first record as the zlib dictionary. Scheduled output mostly repeats from
+# run to run, so most records come down to a few dozen bytes.
+RECORD_LENGTH = struct.Struct('!I')
+
+def host_key(target):
+    return f"{target['user']}@{target['host']}:{target.get('port', 22)}"
+
+def frame_record(data):
+    return RECORD_LENGTH.pack(len(data)) + data + RECORD_LENGTH.pack(len(data))
+
+class ResultStore:
+    def __init__(self, root, retention_months=12):
+        self.root = root
+        self.retention_months = retention_months
+        self.lock = threading.Lock()
+        self.dictionaries = {}  # {segment path: its first record}
+
+    def _folder(self, key):
+        return os.path.join(self.root, re.sub(r'[^\w.@-]', '_', key))
+
+    def _dictionary(self, f):
+        # The segment's first record, or None if a crash cut it short
+        f.seek(0)
+        header = f.read(RECORD_LENGTH.size)
+        if len(header) < RECORD_LENGTH.size:
+            return None
+        length, = RECORD_LENGTH.unpack(header)
+        record = f.read(length + RECORD_LENGTH.size)
+        if len(record) < length + RECORD_LENGTH.size or RECORD_LENGTH.unpack_from(record, length)[0] != length:
+            return None
+        return record[:length]
+
+    def append(self, key, schedule, result):
+        started = result['started'].timestamp() if isinstance(result['started'], datetime) else result['started']
+        data = json.dumps([started, schedule, result['cmd'], result['exit_code'], result['duration'],
+                           result['error'], result['stdout'], result['stderr']]).encode('utf-8')
+        folder = self._folder(key)
+        path = os.path.join(folder, time.strftime('%Y-%m.dat', time.localtime(started)))
+        with self.lock:
+            records = b''
+            dictionary = self.dictionaries.get(path)
+            if dictionary is None:
+                exists = os.path.exists(path)
+                if exists:
+                    with open(path, 'r+b') as f:
+                        dictionary = self._dictionary(f)
+                        if dictionary is None:
+                            f.truncate(0)  # The first record is torn; start the segment over
+                        else:
+                            self._truncate_torn(f)
+                else:
+                    os.makedirs(folder, exist_ok=True)
+                    with open(os.path.join(folder, 'host'), 'w') as f:
+                        f.write(key)  # Folder names are sanitized; this keeps the real key
+                    self._prune(folder)
+                if dictionary is None:
+                    dictionary = data
+                    records = frame_record(dictionary)
+                self.dictionaries[path] = dictionary
+            compressor = zlib.compressobj(zdict=dictionary)
+            records += frame_record(compressor.compress(data) + compressor.flush())
+            with open(path, 'ab') as f:
+                f.write(records)
+
+    def _truncate_torn(self, f):
+        # Drop a record cut short by a crash, so records appended after it stay readable
+        end = f.seek(0, os.SEEK_END)
+        position = f.seek(0)
+        while position + RECORD_LENGTH.size <= end:
+            f.seek(position)
+            length, = RECORD_LENGTH.unpack(f.read(RECORD_LENGTH.size))
+            following = position + length + 2 * RECORD_LENGTH.size
+            if following > end:
+                break
+            f.seek(following - RECORD_LENGTH.size)
+            if RECORD_LENGTH.unpack(f.read(RECORD_LENGTH.size))[0] != length:
+                break
+            position = following
+        if position < end:
+            f.truncate(position)
+
+    def _prune(self, folder):
+        segments = sorted(name for name in os.listdir(folder) if name.endswith('.dat'))
+        for name in segments[:max(0, len(segments) - self.retention_months + 1)]:
+            os.remove(os.path.join(folder, name))
+            self.dictionaries.pop(os.path.join(folder, name), None)
+
+    def hosts(self):
+        keys = []
+        try:
+            folders = os.listdir(self.root)
+        except FileNotFoundError:
+            return keys
+        for name in sorted(folders):
+            try:
+                with open(os.path.join(self.root, name, 'host')) as f:
+                    keys.append(f.read())
+            except OSError:
+                pass
+        return keys
+
+    def last(self, key, count):
+        # The newest count results for a host, newest first, as exec_command-style dicts
+        results = []
+        folder = self._folder(key)
+        try:
+            segments = sorted((name for name in os.listdir(folder) if name.endswith('.dat')), reverse=True)
+        except FileNotFoundError:
+            return results
+        for name in segments:
+            with open(os.path.join(folder, name), 'rb') as f:
+                dictionary = self._dictionary(f)
+                if dictionary is None:
+                    continue
+                first = len(dictionary) + 2 * RECORD_LENGTH.size
+                end = f.seek(0, os.SEEK_END)
+                while end > first and len(results) < count:
+                    f.seek(end - RECORD_LENGTH.size)
+                    length, = RECORD_LENGTH.unpack(f.read(RECORD_LENGTH.size))
+                    start = end - length - 2 * RECORD_LENGTH.size
+                    if start < first:
+                        break  # Torn write at the end of the segment
+                    f.seek(start)
+                    record = f.read(end - start)
+                    if RECORD_LENGTH.unpack_from(record)[0] != length:
+                        break
+                    try:
+                        decompressor = zlib.decompressobj(zdict=dictionary)
+                        started, schedule, cmd, exit_code, duration, error, stdout, stderr = json.loads(
+                            decompressor.decompress(record[RECORD_LENGTH.size:-RECORD_LENGTH.size])
+                            + decompressor.flush())
+                    except (zlib.error, ValueError):
+                        break  # Corrupt record: keep what was read and go on to the older segment
+                    results.append({'started': datetime.fromtimestamp(started), 'schedule': schedule, 'cmd': cmd,
+                                    'exit_code': exit_code, 'duration': duration, 'error': error,
+                                    'stdout': stdout, 'stderr': stderr})
+                    end = start
+            if len(results) >= count:
+                break
+        return results
+
+# A schedule is a dict: {'name', 'command', 'targets': [saved connection names or
+# fnmatch patterns], 'every': seconds, 'jitter': seconds, 'timeout': seconds,
+# 'enabled': bool}.
+# resolve(schedule) turns it into targets: dicts with host, port, user, password
+# and options, as connect_transport takes them. A target that could not be
+# resolved carries an 'error' instead and is recorded as a failed run without
+# connecting; if resolve itself raises, the firing counts in stats['unresolved'].
+# borrow(target), if given, may return an already open transport (e.g. a session
+# tab's) to run on instead.
+class Scheduler:
+    def __init__(self, store, resolve, borrow=None, workers=SCHEDULER_WORKERS, per_host=SCHEDULER_PER_HOST):
+        self.store = store
+        self.resolve = resolve
+        self.borrow = borrow
+        self.per_host = per_host
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix='scheduled-run')
+        self.wakeup = threading.Condition()
+        self.timers = []  # Heap of (due, seq, kind, payload); kind is 'schedule' or 'run'
+        self.sequence = itertools.count()
+        self.schedules = {}  # {name: schedule}
+        self.running = {}  # {host key: runs in flight}
+        self.waiting = {}  # {host key: deque of runs held back by the per-host limit}
+        self.pending = set()  # {(schedule name, host key)} fired and not finished yet
+        self.transports = {}  # {host key: {'lock', 'transport', 'used'}}
+        self.transports_lock = threading.Lock()
+        self.stats = {'runs': 0, 'failed': 0, 'skipped': 0, 'timed_out': 0, 'unresolved': 0, 'connects': 0,
+                      'max_per_host': 0}
+        self.listeners = []  # Called with (key, schedule name, result) after each run
+        self.stopped = False
+        threading.Thread(target=self._timer_loop, name='scheduler', daemon=True).start()
+
+    def set_schedules(self, schedules):
+        # Replace every schedule; each first fires after a random part of its interval
+        with self.wakeup:
+            self.schedules = {schedule['name']: schedule for schedule in schedules if schedule.get('enabled', True)}
+            self.timers = [timer for timer in self.timers if timer[2] == 'run']
+            now = time.time()
+            for schedule in self.schedules.values():
+                self._push(now + random.uniform(0, schedule['every']), 'schedule', schedule)
+            heapq.heapify(self.timers)
+            self.wakeup.notify()
+
+    def run_now(self, schedule):
+        with self.wakeup:
+            self._fire(schedule, time.time())
+            self.wakeup.notify()
+
+    def next_runs(self):
+        with self.wakeup:
+            return {payload['name']: due for due, _, kind, payload in self.timers if kind == 'schedule'}
+
+    def stop(self):
+        with self.wakeup:
+            self.stopped = True
+            self.wakeup.notify()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        with self.transports_lock:
+            for entry in self.transports.values():
+                if entry['transport'] is not None:
+                    entry['transport'].close()
+
+    def _push(self, due, kind, payload):
+        heapq.heappush(self.timers, (due, next(self.sequence), kind, payload))
+
+    def _timer_loop(self):
+        with self.wakeup:
+            while not self.stopped:
+                now = time.time()
+                while self.timers and self.timers[0][0] <= now:
+                    due, _, kind, payload = heapq.heappop(self.timers)
+                    if kind == 'schedule':
+                        if self.schedules.get(payload['name']) is payload:  # Not replaced or removed since
+                            self._fire(payload, now)
+                            # Missed intervals (sleep, suspend) are skipped, not run back to back
+                            self._push(max(due + payload['every'], now), 'schedule', payload)
+                    else:
+                        self._dispatch(payload)
+                self.wakeup.wait(min(self.timers[0][0] - now, SCHEDULER_IDLE) if self.timers else SCHEDULER_IDLE)
+                self._close_idle()
+
+    def _fire(self, schedule, now):
+        try:
+            targets = self.resolve(schedule)
+        except Exception:
+            self.stats['unresolved'] += 1
+            targets = []
+        for target in targets:
+            key = host_key(target)
+            if (schedule['name'], key) in self.pending:
+                self.stats['skipped'] += 1  # The last run here hasn't finished
+                continue
+            self.pending.add((schedule['name'], key))
+            run = {'schedule': schedule['name'], 'command': schedule['command'], 'target': target, 'key': key,
+                   'timeout': schedule.get('timeout', SCHEDULER_TIMEOUT)}
+            self._push(now + random.uniform(0, schedule.get('jitter', 0)), 'run', run)
+
+    def _dispatch(self, run):
+        # Called with self.wakeup held
+        key = run['key']
+        if self.running.get(key, 0) >= self.per_host:
+            self.waiting.setdefault(key, deque()).append(run)
+            return
+        self.running[key] = self.running.get(key, 0) + 1
+        self.stats['max_per_host'] = max(self.stats['max_per_host'], self.running[key])
+        self.pool.submit(self._execute, run)
+
+    def _execute(self, run):
+        result = None
+        try:
+            result = self._run_on_host(run)
+            self.store.append(run['key'], run['schedule'], result)
+            for listener in self.listeners:
+                listener(run['key'], run['schedule'], result)
+        finally:
+            with self.wakeup:
+                self.stats['runs'] += 1
+                if result is None or result['error'] or result['exit_code']:
+                    self.stats['failed'] += 1
+                if result is not None and (result['error'] or '').startswith('Timed out'):
+                    self.stats['timed_out'] += 1
+                self.running[run['key']] -= 1
+                self.pending.discard((run['schedule'], run['key']))
+                waiting = self.waiting.get(run['key'])
+                if waiting:
+                    self._dispatch(waiting.popleft())
+
+    def _run_on_host(self, run):
+        if run['target'].get('error'):
+            return {'cmd': run['command'], 'started': datetime.now(), 'stdout': '', 'stderr': '',
+                    'exit_code': None, 'duration': 0.0, 'error': run['target']['error']}
+        transport = self.borrow(run['target']) if self.borrow else None
+        if transport is not None and transport.is_active():
+            return exec_command(transport, run['command'], run['timeout'])
+        try:
+            transport = self._pooled_transport(run['target'], run['key'])
+        except Exception as e:
+            return {'cmd': run['command'], 'started': datetime.now(), 'stdout': '', 'stderr': '',
+                    'exit_code': None, 'duration': 0.0, 'error': str(e)}
+        return exec_command(transport, run['command'], run['timeout'])
+
+    def _pooled_transport(self, target, key):
+        with self.transports_lock:
+            entry = self.transports.setdefault(key, {'lock': threading.Lock(), 'transport': None, 'used': 0})
+        with entry['lock']:  # Concurrent runs on one host share a single connect
+            if entry['transport'] is None or not entry['transport'].is_active():
+                entry['transport'], phases = connect_transport(target['host'], target.get('port', 22), target['user'],
+                                                               target.get('password', ''), target.get('options'))
+                with self.wakeup:
+                    self.stats['connects'] += 1
+            entry['used'] = time.monotonic()
+            return entry['transport']
+
+    def _close_idle(self):
+        with self.transports_lock:
+            for key, entry in list(self.transports.items()):
+                if (entry['transport'] is not None and not self.running.get(key)
+                        and time.monotonic() - entry['used'] > SCHEDULER_IDLE):
+                    entry['transport'].close()
+                    entry['transport'] = None
@@ -0,0 +1,955 @@
+# Session worker processes. Groups of SSH sessions can run in separate Python
+# processes so that their paramiko crypto, decoding and output sanitizing don't
+# compete with the GUI for one GIL. Processed output reaches the GUI process over
+# the worker's stdout pipe in batched frames; opens, sends, interrupts and exec
+# requests go to the worker over its stdin.
+#
+# A frame is a 4-byte big-endian length followed by a pickled list of messages.
+# Each message is a tuple of (kind, session id, ...):
+#
+#   GUI -> worker:  open(host, port, user, passw, options), send(text), exec(request, cmd), close
+#   worker -> GUI:  opened(phases), error(message), output(text, bytes, recv_time), lost,
+#                   exec_result(request, result)
+#
+# This module must stay importable without Tk: it is the worker's main script
+# (python session_worker.py) and is also imported by app.py and the benchmarks.
+import os
+import pickle
+import queue
+import re
+import select
+import selectors
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import paramiko
+
+FRAME_HEADER = struct.Struct('!I')
+BATCH_BYTES = 256 * 1024  # Upper bound on output coalesced into one frame
+RECV_SIZE = 4096
+CONNECT_TIMEOUT = 15  # Seconds allowed for the TCP connect and for key exchange
+DNS_TTL = 300  # Seconds a resolved address is reused
+
+def clean_output(decoded):
+    # Strip OSC sequences (like title sets ending with \x07 or ST)
+    decoded = re.sub(r'\x1b\].*?(\x07|\x1b\\)', '', decoded)
+    # Strip other ANSI escape sequences
+    decoded = re.sub(r'\x1b(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])', '', decoded)
+    # Remove non-printable characters except \n, \t, \r
+    decoded = ''.join(c for c in decoded if c.isprintable() or c == '\n' or c == '\t' or c == '\r')
+    # Handle line endings: replace CRLF with LF, and standalone CR with LF
+    return decoded.replace('\r\n', '\n').replace('\r', '\n')
+
+# Resolved addresses, so reconnects and many tabs to one host skip DNS
+dns_cache = {}  # {(host, port): (expiry, getaddrinfo result)}
+dns_lock = threading.Lock()
+
+def resolve(host, port):
+    now = time.monotonic()
+    with dns_lock:
+        cached = dns_cache.get((host, port))
+        if cached and cached[0] > now:
+            return cached[1]
+    addresses = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+    with dns_lock:
+        dns_cache[(host, port)] = (now + DNS_TTL, addresses)
+    return addresses
+
+def open_socket(host, port, addresses):
+    error = None
+    for family, socktype, proto, _, address in addresses:
+        sock = socket.socket(family, socktype, proto)
+        sock.settimeout(CONNECT_TIMEOUT)
+        try:
+            sock.connect(address)
+            return sock
+        except OSError as e:
+            sock.close()
+            error = e
+    with dns_lock:
+        dns_cache.pop((host, port), None)  # The host may have moved
+    raise error or OSError(f"No addresses for {host}")
+
+# Host keys persist in known_hosts under the app's data folder (set by app.py, and
+# passed to workers with --known-hosts). Hosts with no entry at all are trusted on
+# first use and remembered; a changed key refuses the connection, and so does a key
+# of a type not on file for a known host, which could otherwise slip a new key in.
+known_hosts_path = None
+known_hosts = None
+known_hosts_lock = threading.Lock()
+
+def host_key_name(host, port):
+    return host if port == 22 else f'[{host}]:{port}'
+
+def load_known_hosts():
+    global known_hosts
+    with known_hosts_lock:
+        if known_hosts is None:
+            known_hosts = paramiko.HostKeys()
+            if known_hosts_path and os.path.exists(known_hosts_path):
+                try:
+                    known_hosts.load(known_hosts_path)
+                except (OSError, paramiko.SSHException):
+                    pass
+        return known_hosts
+
+def prefer_known_key_types(transport, host, port):
+    # Ask for the host key type we already hold, so the key can be checked
+    # against known_hosts instead of being negotiated and stored again
+    known = load_known_hosts().lookup(host_key_name(host, port))
+    if not known:
+        return
+    preferred = set(known.keys())
+    if 'ssh-rsa' in preferred:
+        preferred.update(('rsa-sha2-512', 'rsa-sha2-256'))
+    options = transport.get_security_options()
+    options.key_types = sorted(options.key_types, key=lambda key_type: key_type not in preferred)
+
+def check_host_key(transport, host, port):
+    key = transport.get_remote_server_key()
+    name = host_key_name(host, port)
+    keys = load_known_hosts()
+    with known_hosts_lock:
+        known = keys.lookup(name)
+        if known is not None:
+            expected = known.get(key.get_name())
+            if expected != key:
+                raise paramiko.BadHostKeyException(name, key, expected or known[next(iter(known))])
+            return
+        keys.add(name, key.get_name(), key)
+        if known_hosts_path:
+            # Merge with what other processes saved since we loaded, then swap in
+            merged = paramiko.HostKeys()
+            try:
+                merged.load(known_hosts_path)
+            except (OSError, paramiko.SSHException):
+                pass
+            merged.add(name, key.get_name(), key)
+            try:
+                merged.save(known_hosts_path + f'.{os.getpid()}.tmp')
+                os.replace(known_hosts_path + f'.{os.getpid()}.tmp', known_hosts_path)
+            except OSError:
+                pass
+
+def load_private_key(path, passphrase=None):
+    error = None
+    for key_class in (paramiko.Ed25519Key, paramiko.ECDSAKey, paramiko.RSAKey):
+        try:
+            return key_class.from_private_key_file(os.path.expanduser(path), password=passphrase)
+        except paramiko.PasswordRequiredException:
+            raise
+        except paramiko.SSHException as e:
+            error = e
+    raise error
+
+def authenticate(transport, user, passw, options):
+    # Saved profiles choose one method, so the server sees no speculative attempts:
+    #   password (default), key (key_file; the password unlocks it if encrypted),
+    #   agent (keys from the running SSH agent, then the password if one is set)
+    auth = options.get('auth') or 'password'
+    if auth == 'key':
+        transport.auth_publickey(user, load_private_key(options['key_file'], passw or None))
+        return
+    if auth == 'agent':
+        agent = paramiko.Agent()
+        try:
+            for key in agent.get_keys():
+                try:
+                    transport.auth_publickey(user, key)
+                    return
+                except paramiko.AuthenticationException:
+                    pass
+        finally:
+            agent.close()
+        if not passw:
+            raise paramiko.AuthenticationException("No agent key was accepted")
+    transport.auth_password(user, passw)
+
+def prefer(available, wanted):
+    # Reorder an algorithm list so the wanted ones (that this paramiko supports) come first
+    wanted = [name for name in wanted if name in available]
+    return tuple(wanted) + tuple(name for name in available if name not in wanted)
+
+def apply_link_options(transport, options):
+    # Per-profile link tuning, applied before key exchange:
+    #   compression (bool), ciphers / kex (preferred names, first wins if the server
+    #   supports them), keepalive (seconds, set after auth by connect_transport)
+    if options.get('compression'):
+        transport.use_compression(True)
+    security = transport.get_security_options()
+    if options.get('ciphers'):
+        security.ciphers = prefer(security.ciphers, options['ciphers'])
+    if options.get('kex'):
+        security.kex = prefer(security.kex, options['kex'])
+
+def describe_phases(phases):
+    return ', '.join(f"{name.replace('_', ' ')} {seconds * 1000:.0f} ms" for name, seconds in phases.items())
+
+class ConnectError(paramiko.SSHException):
+    def __init__(self, phase, phases, error):
+        super().__init__(f"{error} (during {phase.replace('_', ' ')}; {describe_phases(phases)})")
+        self.phase = phase
+        self.phases = phases
+
+# Jump hosts: options['jump'] is the chain of hops to tunnel through, each a dict
+# with host, port, user, password and its own options. Hop transports are pooled
+# per chain, so any number of targets behind one bastion share a single bastion
+# handshake; every target is a direct-tcpip channel on the pooled transport. The
+# pool counts the targets using each bastion and closes it when the last one goes.
+bastions = {}  # {chain key: {'lock': Lock, 'transport': Transport or None, 'users': targets on it}}
+bastions_lock = threading.Lock()
+
+def chain_key(chain):
+    return tuple((hop['host'], hop.get('port', 22), hop['user']) for hop in chain)
+
+def bastion_transport(chain):
+    # Returns the pooled transport for chain, counting one more user; every call
+    # needs a release_bastion(chain) once that user is done with it
+    with bastions_lock:
+        entry = bastions.setdefault(chain_key(chain), {'lock': threading.Lock(), 'transport': None, 'users': 0})
+    # Targets opening at the same time wait here for the one bastion handshake
+    with entry['lock']:
+        if entry['transport'] is None or not entry['transport'].is_active():
+            hop = chain[-1]
+            entry['transport'], phases = connect_transport(hop['host'], hop.get('port', 22), hop['user'],
+                                                           hop.get('password', ''),
+                                                           dict(hop.get('options', {}), jump=chain[:-1]))
+        entry['users'] += 1
+        return entry['transport']
+
+def release_bastion(chain):
+    with bastions_lock:
+        entry = bastions.get(chain_key(chain))
+    if entry is None:
+        return
+    with entry['lock']:
+        entry['users'] = max(0, entry['users'] - 1)
+        if entry['users'] == 0 and entry['transport'] is not None:
+            entry['transport'].close()  # Releases the hops before it in turn, through its own Tunnel
+            entry['transport'] = None
+
+class Tunnel:
+    # The socket a target behind a jump chain talks over: its direct-tcpip channel
+    # on the pooled bastion. paramiko closes it when the target's transport ends,
+    # for whatever reason, which is when the target stops using the bastion.
+    def __init__(self, channel, chain):
+        self.channel = channel
+        self.chain = chain
+        self.released = False
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.channel, name)
+
+    def close(self):
+        try:
+            self.channel.close()
+        except (EOFError, OSError, paramiko.SSHException):
+            pass  # The bastion has already gone away
+        with self.lock:
+            if self.released:
+                return
+            self.released = True
+        release_bastion(self.chain)
+
+def open_tunnel(chain, bastion, host, port):
+    try:
+        channel = bastion.open_channel('direct-tcpip', (host, port), ('127.0.0.1', 0), timeout=CONNECT_TIMEOUT)
+    except Exception:
+        release_bastion(chain)
+        raise
+    return Tunnel(channel, chain)
+
+def connect_transport(host, port, user, passw, options=None):
+    # Connect and authenticate in timed phases; returns (transport, phases) where
+    # phases is {'dns': seconds, 'tcp': ..., 'kex': ..., 'host_key': ..., 'auth': ...},
+    # or starts with 'jump' (getting the pooled bastion) and 'tunnel' for jump hosts
+    options = options or {}
+    phases = {}
+    phase, started = 'jump' if options.get('jump') else 'dns', time.perf_counter()
+    sock = transport = None
+
+    def next_phase(name):
+        nonlocal phase, started
+        now = time.perf_counter()
+        phases[phase] = now - started
+        phase, started = name, now
+
+    try:
+        if options.get('jump'):
+            bastion = bastion_transport(options['jump'])
+            next_phase('tunnel')
+            sock = open_tunnel(options['jump'], bastion, host, port)  # The bastion resolves and connects
+        else:
+            addresses = resolve(host, port)
+            next_phase('tcp')
+            sock = open_socket(host, port, addresses)
+        next_phase('kex')
+        # window_size and max_packet_size set the default for every channel on the transport
+        transport = paramiko.Transport(sock, default_window_size=options.get('window_size', paramiko.common.DEFAULT_WINDOW_SIZE),
+                                       default_max_packet_size=options.get('max_packet_size', paramiko.common.DEFAULT_MAX_PACKET_SIZE))
+        apply_link_options(transport, options)
+        prefer_known_key_types(transport, host, port)
+        transport.start_client(timeout=CONNECT_TIMEOUT)
+        next_phase('host_key')
+        check_host_key(transport, host, port)
+        next_phase('auth')
+        authenticate(transport, user, passw, options)
+        next_phase(None)
+        if options.get('keepalive'):
+            transport.set_keepalive(options['keepalive'])
+    except Exception as e:
+        phases[phase] = time.perf_counter() - started
+        if transport is not None:
+            transport.close()
+        elif sock is not None:
+            sock.close()
+        raise ConnectError(phase, phases, e)
+    return transport, phases
+
+def open_shell(host, port, user, passw, options=None):
+    # Connect and invoke the interactive shell every session uses; returns
+    # (transport, channel, phases)
+    transport, phases = connect_transport(host, port, user, passw, options)
+    started = time.perf_counter()
+    try:
+        channel = transport.open_session()
+        channel.get_pty(term='vt100', width=80, height=24)
+        channel.invoke_shell()
+    except Exception as e:
+        phases['shell'] = time.perf_counter() - started
+        transport.close()
+        raise ConnectError('shell', phases, e)
+    phases['shell'] = time.perf_counter() - started
+    return transport, channel, phases
+
+# "Measure link": RTT from global-request round trips, then bulk throughput of an
+# exec command under the profile's current settings and a few alternatives. Any
+# alternative that beats the current settings by PROBE_MARGIN is suggested.
+PROBE_COMMAND = 'seq 1 {lines}'  # Log-like, compressible text on any POSIX host
+PROBE_MARGIN = 1.1
+PROBE_RTT_SAMPLES = 5
+PROBE_ALTERNATIVES = (
+    ('compression', {'compression': True}),
+    ('large window', {'window_size': 8 << 20, 'max_packet_size': 65536}),
+    ('gcm cipher', {'ciphers': ['aes128-gcm@openssh.com']}),
+)
+
+def measure_rtt(transport):
+    samples = []
+    for _ in range(PROBE_RTT_SAMPLES):
+        started = time.perf_counter()
+        transport.global_request('keepalive@openssh.com', wait=True)  # Any reply is a round trip
+        samples.append(time.perf_counter() - started)
+    return sorted(samples)[len(samples) // 2]
+
+def measure_throughput(host, port, user, passw, options, probe_bytes):
+    transport, phases = connect_transport(host, port, user, passw, options)
+    try:
+        channel = transport.open_session()
+        channel.exec_command(PROBE_COMMAND.format(lines=max(1000, probe_bytes // 7)))
+        received = 0
+        started = time.perf_counter()
+        while True:
+            data = channel.recv(65536)
+            if not data:
+                break
+            received += len(data)
+        elapsed = time.perf_counter() - started
+        security = transport.remote_cipher, transport.remote_compression
+    finally:
+        transport.close()
+    return {'mb_per_s': received / (1024 * 1024) / elapsed if elapsed else 0.0, 'bytes': received,
+            'seconds': elapsed, 'phases': phases, 'cipher': security[0], 'compression': security[1]}
+
+def measure_link(host, port, user, passw, options=None, probe_bytes=4 << 20, progress=None):
+    # Returns {'rtt': seconds, 'runs': [{'name', 'options', 'mb_per_s', ...}], 'suggested': options}
+    options = dict(options or {})
+    transport, phases = connect_transport(host, port, user, passw, options)
+    try:
+        rtt = measure_rtt(transport)
+    finally:
+        transport.close()
+    runs = []
+    for name, change in (('current', {}),) + PROBE_ALTERNATIVES:
+        if progress:
+            progress(name)
+        run_options = dict(options, **change)
+        try:
+            run = measure_throughput(host, port, user, passw, run_options, probe_bytes)
+        except Exception as e:
+            run = {'mb_per_s': 0.0, 'error': str(e)}
+        run.update(name=name, options=change)
+        runs.append(run)
+    suggested = dict(options)
+    baseline = runs[0]['mb_per_s']
+    for run in runs[1:]:
+        if baseline and run['mb_per_s'] > baseline * PROBE_MARGIN:
+            suggested.update(run['options'])
+    if rtt > 0.05 and not options.get('keepalive'):
+        suggested['keepalive'] = 30  # Long paths tend to cross NATs that drop idle flows
+    return {'rtt': rtt, 'runs': runs, 'suggested': suggested}
+
+def exec_command(transport, cmd, timeout=None):
+    # Run cmd on its own exec channel over the session's transport and capture
+    # stdout, stderr, exit code and duration; after timeout seconds the channel is
+    # closed and whatever output arrived is kept
+    result = {'cmd': cmd, 'started': datetime.now(), 'stdout': '', 'stderr': '',
+              'exit_code': None, 'duration': 0.0, 'error': None}
+    start = time.monotonic()
+    try:
+        channel = transport.open_session()
+        channel.exec_command(cmd)
+        stdout, stderr = [], []
+        # Drain stdout and stderr together so neither can stall the channel window
+        while True:
+            select.select([channel], [], [], 0.1)
+            while channel.recv_ready():
+                stdout.append(channel.recv(32768))
+            while channel.recv_stderr_ready():
+                stderr.append(channel.recv_stderr(32768))
+            if channel.exit_status_ready() and not channel.recv_ready() and not channel.recv_stderr_ready():
+                result['exit_code'] = channel.recv_exit_status()
+                break
+            if timeout is not None and time.monotonic() - start > timeout:
+                result['error'] = f"Timed out after {timeout}s"
+                break
+        channel.close()
+        result['stdout'] = clean_output(b''.join(stdout).decode('utf-8', errors='replace'))
+        result['stderr'] = clean_output(b''.join(stderr).decode('utf-8', errors='replace'))
+    except Exception as e:
+        result['error'] = str(e)
+    result['duration'] = time.monotonic() - start
+    return result
+
+# Port forwards over a session's transport. "L [bind:]port:host:hostport" listens
+# locally and opens a direct-tcpip channel to host:hostport for each connection;
+# "R [bind:]port:host:hostport" has the server listen and connects each forwarded
+# channel to host:hostport from here. Every forwarded connection of every session
+# is pumped by one ForwardPump thread around a selector. Each direction reads at
+# most buffer_size bytes and stops reading while they wait to be written, so a slow
+# side pushes back instead of piling up memory. Channels can't signal that their
+# window reopened, so data waiting on one is retried every FORWARD_RETRY seconds.
+FORWARD_BUFFER = 64 * 1024
+FORWARD_OPENERS = 16  # Threads that open channels and local connections, off the pump loop
+FORWARD_RETRY = 0.005
+FORWARD_RECHECK = 2.0  # Seconds between checks that remote forwards' transports are still up
+
+def parse_forward(spec):
+    kind, _, rest = spec.strip().partition(' ')
+    parts = rest.strip().split(':')
+    if kind.upper() not in ('L', 'R') or len(parts) not in (3, 4) or not (parts[-3].isdigit() and parts[-1].isdigit()):
+        raise ValueError(f"Bad forward {spec!r}, expected L|R [bind:]port:host:hostport")
+    bind = parts[0] if len(parts) == 4 else ('127.0.0.1' if kind.upper() == 'L' else '')
+    return {'kind': kind.upper(), 'bind': bind, 'port': int(parts[-3]), 'host': parts[-2], 'host_port': int(parts[-1])}
+
+# One configured forward and its counters; bytes_out is what the local sockets sent
+# over the SSH connection, bytes_in what came back
+class Forward:
+    def __init__(self, spec, get_transport):
+        self.spec = spec
+        self.__dict__.update(parse_forward(spec))
+        self.listen_port = self.port  # As configured; port becomes the bound one (for port 0)
+        self.get_transport = get_transport
+        self.listener = None
+        self.transport = None  # Transport a remote forward was requested on
+        self.requesting = False
+        self.ready = threading.Event()  # Set once listening, or once that failed
+        self.links = set()
+        self.active = self.total = self.failed = 0
+        self.bytes_in = self.bytes_out = 0
+        self.error = None
+        self.closed = False
+
+    def stats(self):
+        return {'spec': self.spec, 'port': self.port, 'active': self.active, 'total': self.total,
+                'failed': self.failed, 'bytes_in': self.bytes_in, 'bytes_out': self.bytes_out, 'error': self.error}
+
+# A forwarded connection: ends[0] is the local socket, ends[1] the channel.
+# pending[i] holds data read from the other end that end i hasn't taken yet.
+class ForwardLink:
+    __slots__ = ('forward', 'ends', 'pending', 'eof', 'masks')
+
+    def __init__(self, forward, sock, channel):
+        self.forward = forward
+        self.ends = (sock, channel)
+        self.pending = [b'', b'']
+        self.eof = [False, False]
+        self.masks = [0, 0]
+
+class ForwardPump:
+    def __init__(self, buffer_size=FORWARD_BUFFER):
+        self.buffer_size = buffer_size
+        self.selector = selectors.DefaultSelector()
+        self.openers = ThreadPoolExecutor(FORWARD_OPENERS, thread_name_prefix='forward-open')
+        self.calls = queue.SimpleQueue()  # (function, args) to run on the pump thread
+        self.wake_recv, self.wake_send = socket.socketpair()
+        self.wake_recv.setblocking(False)
+        self.wake_send.setblocking(False)
+        self.selector.register(self.wake_recv, selectors.EVENT_READ)
+        self.remote = set()  # Remote forwards, rechecked every FORWARD_RECHECK
+        # paramiko keeps one forwarded-tcpip handler per transport, so _accept_remote
+        # serves them all and finds the forward by the server port it arrived on
+        self.remote_ports = {}  # {(transport, server port): remote forward}
+        self.remote_lock = threading.Lock()
+        self.stalled = set()  # Links with data waiting on a channel window
+        self.start_lock = threading.Lock()
+        self.thread = None
+
+    def add(self, spec, get_transport):
+        # Start forwarding spec over get_transport() (called whenever a channel or a
+        # remote listener is needed, so reconnects are picked up). Never blocks on
+        # the network: a local forward only binds its listener here
+        forward = Forward(spec, get_transport)
+        if forward.kind == 'L':
+            forward.listener = socket.create_server((forward.bind, forward.port), backlog=512)
+            forward.listener.setblocking(False)
+            forward.port = forward.listener.getsockname()[1]
+            forward.ready.set()
+            self.call(self.selector.register, forward.listener, selectors.EVENT_READ, forward)
+        else:
+            forward.requesting = True
+            self.call(self.remote.add, forward)
+            self.openers.submit(self._request_remote, forward)
+        return forward
+
+    def remove(self, forward):
+        self.call(self._remove, forward)
+
+    def call(self, function, *args):
+        with self.start_lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='forward-pump', daemon=True)
+                self.thread.start()
+        self.calls.put((function, args))
+        try:
+            self.wake_send.send(b'\0')
+        except OSError:
+            pass  # Wakeup bytes already waiting
+
+    def _run(self):
+        last_check = time.monotonic()
+        while True:
+            timeout = FORWARD_RETRY if self.stalled else (FORWARD_RECHECK if self.remote else None)
+            for key, events in self.selector.select(timeout):
+                if key.fileobj is self.wake_recv:
+                    self._run_calls()
+                elif isinstance(key.data, Forward):
+                    self._accept(key.data)
+                else:
+                    link, i = key.data
+                    if events & selectors.EVENT_WRITE and link.masks[i] & selectors.EVENT_WRITE:
+                        self._flush(link, i)
+                    if events & selectors.EVENT_READ and link.masks[i] & selectors.EVENT_READ:
+                        self._read(link, i)
+            for link in list(self.stalled):
+                self._flush(link, 1)
+            if self.remote and time.monotonic() - last_check > FORWARD_RECHECK:
+                last_check = time.monotonic()
+                for forward in self.remote:
+                    if not forward.requesting and (forward.transport is None or not forward.transport.is_active()):
+                        forward.requesting = True
+                        self.openers.submit(self._request_remote, forward)
+
+    def _run_calls(self):
+        try:
+            while self.wake_recv.recv(4096):
+                pass
+        except OSError:
+            pass
+        while True:
+            try:
+                function, args = self.calls.get_nowait()
+            except queue.Empty:
+                return
+            function(*args)
+
+    def _accept(self, forward):
+        for _ in range(64):  # Take a burst of connections, then let the links run
+            try:
+                sock, origin = forward.listener.accept()
+            except OSError:
+                return
+            self.openers.submit(self._open_local, forward, sock, origin)
+
+    def _open_local(self, forward, sock, origin):
+        try:
+            channel = forward.get_transport().open_channel('direct-tcpip', (forward.host, forward.host_port),
+                                                           origin[:2], timeout=CONNECT_TIMEOUT)
+        except Exception as e:
+            sock.close()
+            self.call(self._failed, forward, str(e))
+            return
+        self.call(self._link, forward, sock, channel)
+
+    def _request_remote(self, forward):
+        try:
+            transport = forward.get_transport()
+            with self.remote_lock:
+                self.remote_ports.pop((forward.transport, forward.port), None)  # Before a reconnect
+            forward.port = transport.request_port_forward(forward.bind, forward.listen_port, self._accept_remote)
+            with self.remote_lock:
+                self.remote_ports[(transport, forward.port)] = forward
+                transport._tcp_handler = self._accept_remote  # In case a cancel cleared it meanwhile
+            forward.transport = transport
+            forward.error = None
+        except Exception as e:
+            forward.error = str(e)
+        forward.requesting = False
+        forward.ready.set()
+
+    def _accept_remote(self, channel, origin, server):
+        # Called on the transport's thread for every forwarded connection
+        with self.remote_lock:
+            forward = self.remote_ports.get((channel.get_transport(), server[1]))
+        if forward is None or forward.closed:
+            channel.close()
+            return
+        self.openers.submit(self._open_remote, forward, channel)
+
+    def _open_remote(self, forward, channel):
+        try:
+            sock = socket.create_connection((forward.host, forward.host_port), CONNECT_TIMEOUT)
+        except OSError as e:
+            channel.close()
+            self.call(self._failed, forward, str(e))
+            return
+        self.call(self._link, forward, sock, channel)
+
+    def _failed(self, forward, error):
+        forward.failed += 1
+        forward.error = error
+
+    def _link(self, forward, sock, channel):
+        if forward.closed:
+            sock.close()
+            channel.close()
+            return
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        channel.setblocking(False)
+        link = ForwardLink(forward, sock, channel)
+        forward.links.add(link)
+        forward.active += 1
+        forward.total += 1
+        self._update(link)
+
+    def _update(self, link):
+        # Read from an end only while the other end has taken everything; watch the
+        # socket for writability while it has data pending
+        for i in (0, 1):
+            mask = 0
+            if not link.eof[i] and not link.pending[1 - i]:
+                mask |= selectors.EVENT_READ
+            if i == 0 and link.pending[0]:
+                mask |= selectors.EVENT_WRITE
+            if mask != link.masks[i]:
+                if not link.masks[i]:
+                    self.selector.register(link.ends[i], mask, (link, i))
+                elif not mask:
+                    self.selector.unregister(link.ends[i])
+                else:
+                    self.selector.modify(link.ends[i], mask, (link, i))
+                link.masks[i] = mask
+        if link.pending[1]:
+            self.stalled.add(link)
+        else:
+            self.stalled.discard(link)
+
+    def _read(self, link, i):
+        try:
+            data = link.ends[i].recv(self.buffer_size)
+        except (BlockingIOError, socket.timeout):
+            return
+        except OSError:
+            self._close(link)
+            return
+        if not data:
+            link.eof[i] = True
+            self._flush(link, 1 - i)  # Passes the EOF on
+            return
+        if i == 0:
+            link.forward.bytes_out += len(data)
+        else:
+            link.forward.bytes_in += len(data)
+        link.pending[1 - i] = data
+        self._flush(link, 1 - i)
+
+    def _flush(self, link, i):
+        data = link.pending[i]
+        try:
+            while data:
+                sent = link.ends[i].send(data)
+                if not sent:
+                    raise OSError("channel closed")
+                data = data[sent:]
+            if link.eof[1 - i]:
+                if i == 0:
+                    link.ends[0].shutdown(socket.SHUT_WR)
+                else:
+                    link.ends[1].shutdown_write()
+        except (BlockingIOError, socket.timeout):
+            pass
+        except OSError:
+            self._close(link)
+            return
+        link.pending[i] = data
+        if link.eof[0] and link.eof[1] and not data:
+            self._close(link)
+        else:
+            self._update(link)
+
+    def _close(self, link):
+        if link not in link.forward.links:
+            return
+        link.forward.links.discard(link)
+        link.forward.active -= 1
+        self.stalled.discard(link)
+        for i in (0, 1):
+            if link.masks[i]:
+                self.selector.unregister(link.ends[i])
+            link.ends[i].close()
+        link.masks = [0, 0]  # Events already selected for it are skipped
+
+    def _remove(self, forward):
+        forward.closed = True
+        self.remote.discard(forward)
+        if forward.listener is not None:
+            self.selector.unregister(forward.listener)
+            forward.listener.close()
+        for link in list(forward.links):
+            self._close(link)
+        if forward.transport is not None and forward.transport.is_active():
+            self.openers.submit(self._cancel_remote, forward)
+
+    def _cancel_remote(self, forward):
+        transport = forward.transport
+        with self.remote_lock:
+            self.remote_ports.pop((transport, forward.port), None)
+        try:
+            transport.cancel_port_forward(forward.bind, forward.port)
+        except Exception:
+            pass
+        with self.remote_lock:
+            # Any cancel clears paramiko's one handler; the transport's other forwards need it back
+            if any(other is transport for other, _ in self.remote_ports):
+                transport._tcp_handler = self._accept_remote
+
+def write_frame(stream, messages):
+    data = pickle.dumps(messages, pickle.HIGHEST_PROTOCOL)
+    stream.write(FRAME_HEADER.pack(len(data)) + data)
+    stream.flush()
+
+def read_frames(stream):
+    # Yield message lists until the pipe closes
+    while True:
+        header = stream.read(FRAME_HEADER.size)
+        if len(header) < FRAME_HEADER.size:
+            return
+        size, = FRAME_HEADER.unpack(header)
+        data = stream.read(size)
+        if len(data) < size:
+            return
+        yield pickle.loads(data)
+
+# Collects outgoing messages and writes them in batches: the writer blocks for the
+# first message, then takes whatever else is already waiting, merging consecutive
+# output for the same session. A quiet session's output goes out at once; busy
+# sessions share frames instead of paying a write and a wakeup per recv.
+class Outbox:
+    def __init__(self, write):
+        self.write = write
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._writer, daemon=True)
+        self.thread.start()
+
+    def put(self, message):
+        self.queue.put(message)
+
+    def _writer(self):
+        while True:
+            batch = [self.queue.get()]
+            size = 0
+            try:
+                while size < BATCH_BYTES:
+                    message = self.queue.get_nowait()
+                    last = batch[-1]
+                    if message[0] == 'output' and last[0] == 'output' and last[1] == message[1]:
+                        # Keep the earliest receive time so latency isn't understated
+                        batch[-1] = ('output', last[1], last[2] + message[2], last[3] + message[3], last[4])
+                    else:
+                        batch.append(message)
+                    if message[0] == 'output':
+                        size += message[3]
+            except queue.Empty:
+                pass
+            try:
+                self.write(batch)
+            except (OSError, ValueError):
+                return  # The other side is gone
+
+# The sessions of one process: shell channels, reader threads and exec requests.
+# Everything it has to report goes through emit(message), so the same class runs
+# inside a worker process (emitting into an Outbox) or in-process.
+class SessionHost:
+    def __init__(self, emit):
+        self.emit = emit
+        self.sessions = {}  # {session id: {'transport', 'channel', 'connected', 'outgoing'}}
+        self.lock = threading.Lock()
+
+    def handle(self, message):
+        kind, sid = message[0], message[1]
+        if kind == 'open':
+            threading.Thread(target=self._open, args=(sid,) + tuple(message[2:]), daemon=True).start()
+        elif kind == 'send':
+            # Queued for the session's writer: a channel whose window is full would
+            # otherwise block this loop, and with it every other session's input
+            session = self.sessions.get(sid)
+            if session and session['connected']:
+                session['outgoing'].put(message[2])
+        elif kind == 'exec':
+            threading.Thread(target=self._exec, args=(sid, message[2], message[3]), daemon=True).start()
+        elif kind == 'close':
+            self.close(sid)
+
+    def _open(self, sid, host, port, user, passw, options=None):
+        # Connects run in their own thread so a slow host doesn't hold up the others
+        self.close(sid)  # Reopening a session id reconnects it
+        try:
+            transport, channel, phases = open_shell(host, port, user, passw, options)
+        except Exception as e:
+            self.emit(('error', sid, str(e)))
+            return
+        session = {'transport': transport, 'channel': channel, 'connected': True, 'outgoing': queue.Queue()}
+        with self.lock:
+            self.sessions[sid] = session
+        self.emit(('opened', sid, phases))
+        threading.Thread(target=self._reader, args=(sid, session), daemon=True).start()
+        threading.Thread(target=self._writer, args=(session,), daemon=True).start()
+
+    def _reader(self, sid, session):
+        channel = session['channel']
+        while session['connected']:
+            r, w, e = select.select([channel], [], [channel], 0.1)
+            if channel in r:
+                data = channel.recv(RECV_SIZE)
+                if not data:
+                    break
+                received = time.time()
+                self.emit(('output', sid, clean_output(data.decode('utf-8', errors='replace')), len(data), received))
+            if channel in e:
+                break
+        if session['connected']:
+            session['connected'] = False
+            self.emit(('lost', sid))
+
+    def _writer(self, session):
+        while True:
+            data = session['outgoing'].get()
+            if data is None or not session['connected']:
+                return
+            try:
+                session['channel'].sendall(data)
+            except Exception:
+                return  # The reader reports the loss
+
+    def _exec(self, sid, request, cmd):
+        session = self.sessions.get(sid)
+        if session and session['connected']:
+            result = exec_command(session['transport'], cmd)
+        else:
+            result = {'cmd': cmd, 'started': datetime.now(), 'stdout': '', 'stderr': '',
+                      'exit_code': None, 'duration': 0.0, 'error': "Not connected"}
+        self.emit(('exec_result', sid, request, result))
+
+    def close(self, sid):
+        with self.lock:
+            session = self.sessions.pop(sid, None)
+        if session:
+            session['connected'] = False  # Stops the reader without a 'lost' message
+            session['outgoing'].put(None)
+            session['transport'].close()
+
+    def close_all(self):
+        for sid in list(self.sessions):
+            self.close(sid)
+
+def worker_main():
+    # Worker process: commands arrive on stdin, batched output leaves on stdout
+    global known_hosts_path
+    if '--known-hosts' in sys.argv:
+        known_hosts_path = sys.argv[sys.argv.index('--known-hosts') + 1]
+    stdin, stdout = sys.stdin.buffer, sys.stdout.buffer
+    sys.stdout = sys.stderr  # Keep stray prints out of the frame stream
+    outbox = Outbox(lambda messages: write_frame(stdout, messages))
+    host = SessionHost(outbox.put)
+    for messages in read_frames(stdin):
+        for message in messages:
+            host.handle(message)
+    # The GUI process closed the pipe (or died): drop every connection
+    host.close_all()
+
+def worker_command():
+    # A frozen build has no separate script, so it re-runs its own executable with
+    # --session-worker, which app.py hands straight to worker_main
+    command = [sys.executable, '--session-worker'] if getattr(sys, 'frozen', False) else \
+        [sys.executable, os.path.abspath(__file__)]
+    if known_hosts_path:
+        command += ['--known-hosts', known_hosts_path]
+    return command
+
+# GUI-side handle for one worker process. on_message(message) is called from the
+# handle's reader thread for every message the worker sends; on_exit(worker) once
+# the worker's pipe closes, whether it was stopped or crashed.
+class SessionWorker:
+    def __init__(self, on_message, on_exit):
+        self.on_message = on_message
+        self.on_exit = on_exit
+        self.sessions = set()  # Session ids hosted by this worker
+        self.chains = set()  # Jump chains it has pooled bastions for, so targets can share them
+        self.write_lock = threading.Lock()
+        self.process = subprocess.Popen(worker_command(), stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0))
+        self.reader_thread = threading.Thread(target=self._reader, daemon=True)
+        self.reader_thread.start()
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def request(self, *message):
+        # Send one message; raises OSError if the worker has gone away
+        with self.write_lock:
+            try:
+                write_frame(self.process.stdin, [message])
+            except ValueError:  # stdin already closed
+                raise OSError("session worker stopped")
+
+    def _reader(self):
+        try:
+            for messages in read_frames(self.process.stdout):
+                for message in messages:
+                    self.on_message(message)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            pass
+        self.process.wait()
+        self.on_exit(self)
+
+    def stop(self):
+        with self.write_lock:
+            try:
+                self.process.stdin.close()  # The worker closes its sessions and exits
+            except OSError:
+                pass
+        try:
+            self.process.wait(5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+if __name__ == '__main__':
+    worker_main()